@@ -12,9 +12,30 @@ with DAG(
 ) as dag:
     
     # PySpark 스크립트를 실행하는 Spark Submit 작업을 정의
-    aggregate_summary_monthly = SparkSubmitOperator(
-        task_id='aggregate_summary_stats_monthly',
+    aggregate_summary_all_periods = SparkSubmitOperator(
+        task_id='aggregate_summary_stats_all_periods',
         application='/opt/spark/scripts/aggregate_summary_stats.py', # Docker 컨테이너 내부 경로
         conn_id='spark_default', # Airflow는 기본적으로 Spark Master를 찾도록 설정됨
+        # 마지막 실행 이후 새 주문이 들어온 날만 orders에서 다시 집계하고, 일/주/월/연 요약은 저장된 일 단위 기본 집계에서 롤업
+        application_args=['--period-type', 'all', '--mode', 'incremental'],
         verbose=True
-    )
\ No newline at end of file
+    )
+
+    # user-rag-api가 질문마다 조합하던 사용자 컨텍스트(프로필, 최근 주문, 선호 메뉴, 결제 통계)를 미리 계산해
+    # MongoDB user_context 컬렉션에 저장 (요약 집계와 원본이 달라 서로 독립적으로 실행)
+    materialize_user_context = SparkSubmitOperator(
+        task_id='materialize_user_context',
+        application='/opt/spark/scripts/materialize_user_context.py', # Docker 컨테이너 내부 경로
+        conn_id='spark_default',
+        packages='org.mongodb.spark:mongo-spark-connector_2.12:10.3.0',
+        # 접속 정보는 Airflow Variable(mongo_uri, mongo_database)에서 읽음
+        env_vars={
+            'MONGO_URI': '{{ var.value.mongo_uri }}',
+            'MONGO_DATABASE': '{{ var.value.get("mongo_database", "test") }}',
+        },
+        # 평소에는 마지막 실행 이후 새 주문이 있거나 컨텍스트가 없는 사용자만 다시 계산하고,
+        # 매주 일요일에는 프로필만 바뀐 사용자까지 반영되도록 전체 사용자를 다시 계산
+        # (user-rag-api는 USER_CONTEXT_MAX_AGE_SECONDS보다 오래된 컨텍스트를 쓰지 않음)
+        application_args=['--mode', '{{ "full" if logical_date.weekday() == 6 else "incremental" }}'],
+        verbose=True
+    )
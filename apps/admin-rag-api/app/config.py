@@ -30,7 +30,99 @@ CLICKHOUSE_PASSWORD = os.getenv("CLICKHOUSE_PASSWORD")
 CLICKHOUSE_DATABASE = os.getenv("CLICKHOUSE_DATABASE")
 CLICKHOUSE_TABLE = os.getenv("CLICKHOUSE_TABLE")
 
+# 요약 테이블을 keyset 페이지네이션으로 읽을 때의 페이지 크기
+CLICKHOUSE_PAGE_SIZE = int(os.getenv("CLICKHOUSE_PAGE_SIZE", "1000"))
+# 지정하면 ClickHouse 대신 이 JSONL 파일(한 줄에 요약 테이블 한 행)에서 문서를 읽습니다. (테스트/벤치마크용)
+CLICKHOUSE_FIXTURE_PATH = os.getenv("CLICKHOUSE_FIXTURE_PATH")
+
 # 필수값 체크
 for var_name in ["CLICKHOUSE_HOST", "CLICKHOUSE_USERNAME", "CLICKHOUSE_PASSWORD", "CLICKHOUSE_DATABASE", "CLICKHOUSE_TABLE"]:
     if not globals()[var_name]:
         raise ValueError(f"{var_name}가 .env 파일에 없습니다.")
+
+# -----------------------------
+# FAISS 인덱스 저장소 설정
+# -----------------------------
+# 버전별 인덱스 파일(index.<버전>.faiss)과 문서 저장소(docstore.sqlite3)가 저장될 디렉토리
+RAG_INDEX_DIR = os.getenv(
+    "RAG_INDEX_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "faiss_index"),
+)
+# 인덱스 갱신 시 한 번에 분할/임베딩할 문서 수
+RAG_INDEX_BATCH_SIZE = int(os.getenv("RAG_INDEX_BATCH_SIZE", "1000"))
+
+# -----------------------------
+# 임베딩 캐시 설정
+# -----------------------------
+# user-rag-api와 같은 경로를 지정하면 캐시를 공유합니다.
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "models/embedding-001")
+# google: Gemini 임베딩 API / fake: 네트워크 없이 동작하는 로컬 임베딩 (테스트/벤치마크용)
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "google")
+FAKE_EMBEDDING_LATENCY_MS = float(os.getenv("FAKE_EMBEDDING_LATENCY_MS", "0"))
+# 0보다 크면 fake 임베딩 공급자가 이 횟수의 호출마다 429 오류를 냅니다. (재시도 경로 확인용)
+FAKE_EMBEDDING_RATE_LIMIT_EVERY = int(os.getenv("FAKE_EMBEDDING_RATE_LIMIT_EVERY", "0"))
+# google: Gemini / fake: 네트워크 없이 지연 시간만 흉내 내는 로컬 LLM (테스트/벤치마크용)
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "google")
+FAKE_LLM_LATENCY_MS = float(os.getenv("FAKE_LLM_LATENCY_MS", "0"))
+EMBEDDING_CACHE_PATH = os.getenv(
+    "EMBEDDING_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "embedding_cache.sqlite3"),
+)
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+EMBEDDING_CACHE_LRU_SIZE = int(os.getenv("EMBEDDING_CACHE_LRU_SIZE", "4096"))
+
+# -----------------------------
+# LLM 동시 호출 제한 설정
+# -----------------------------
+# 초과 요청은 대기열에서 기다리고, 대기열이 가득 차면 429를 반환합니다.
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "32"))
+LLM_QUEUE_TIMEOUT_SECONDS = float(os.getenv("LLM_QUEUE_TIMEOUT_SECONDS", "30"))
+
+# -----------------------------
+# 답변 캐시 설정
+# -----------------------------
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000"))
+# 표현만 다른 유사 질문도 캐시된 답변을 재사용할지 여부와 코사인 유사도 기준값
+ANSWER_CACHE_SEMANTIC = os.getenv("ANSWER_CACHE_SEMANTIC", "true").lower() == "true"
+ANSWER_CACHE_SIMILARITY_THRESHOLD = float(os.getenv("ANSWER_CACHE_SIMILARITY_THRESHOLD", "0.95"))
+
+# -----------------------------
+# 임베딩 파이프라인 설정
+# -----------------------------
+# 한 번의 임베딩 요청에 담을 최대 텍스트 수 (Gemini 배치 임베딩 최대값 100)
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "100"))
+# 동시에 보낼 배치 요청 수와 분당 최대 요청 수 (할당량에 맞게 조정)
+EMBEDDING_MAX_CONCURRENCY = int(os.getenv("EMBEDDING_MAX_CONCURRENCY", "4"))
+EMBEDDING_REQUESTS_PER_MINUTE = float(os.getenv("EMBEDDING_REQUESTS_PER_MINUTE", "1500"))
+# 429(할당량 초과) 응답 시 최대 재시도 횟수
+EMBEDDING_MAX_RETRIES = int(os.getenv("EMBEDDING_MAX_RETRIES", "5"))
+# 재시도 대기 시간의 기준값(초). attempt번째 재시도는 기준값 * 2^attempt * (1~2) 초를 기다립니다.
+EMBEDDING_RETRY_BACKOFF_SECONDS = float(os.getenv("EMBEDDING_RETRY_BACKOFF_SECONDS", "1.0"))
+
+# -----------------------------
+# 프롬프트 컨텍스트 설정
+# -----------------------------
+# 검색된 요약 행을 프롬프트에 넣을 때 사용할 최대 토큰 수 (추정치 기준)
+RAG_CONTEXT_TOKEN_BUDGET = int(os.getenv("RAG_CONTEXT_TOKEN_BUDGET", "1500"))
+
+# -----------------------------
+# 로깅 설정
+# -----------------------------
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
+# -----------------------------
+# RAG 체인 갱신 설정
+# -----------------------------
+# 서버는 바로 요청을 받기 시작하고, 인덱스/체인은 백그라운드에서 만들어집니다. (준비 전에는 503)
+# 이 주기(초)마다 ClickHouse 변경분을 반영한 새 체인으로 교체합니다. 0이면 주기적 갱신을 하지 않습니다.
+RAG_REFRESH_INTERVAL_SECONDS = float(os.getenv("RAG_REFRESH_INTERVAL_SECONDS", "3600"))
+# 체인 생성에 실패했거나 아직 저장된 인덱스가 없을 때 다시 시도하기까지의 대기 시간(초)
+RAG_BUILD_RETRY_SECONDS = float(os.getenv("RAG_BUILD_RETRY_SECONDS", "10"))
+
+# -----------------------------
+# 배치 질의(/query/batch) 설정
+# -----------------------------
+# 한 번에 받을 수 있는 최대 질문 수와, 그중 동시에 답변을 생성할 최대 개수
+QUERY_BATCH_MAX_SIZE = int(os.getenv("QUERY_BATCH_MAX_SIZE", "50"))
+QUERY_BATCH_MAX_CONCURRENCY = int(os.getenv("QUERY_BATCH_MAX_CONCURRENCY", str(LLM_MAX_CONCURRENCY)))
@@ -0,0 +1,12 @@
+# app/logger.py
+import logging
+
+from rag_common.logger import configure_logging
+
+from app import config
+
+
+def get_logger(name: str) -> logging.Logger:
+    """'app' 하위 로거를 반환합니다. 모듈에서는 get_logger(__name__)으로 사용합니다. (출력 형식은 rag_common.logger 참고)"""
+    configure_logging(config.LOG_LEVEL)
+    return logging.getLogger(name)
@@ -1,6 +1,7 @@
 # app/main.py
 import sys
 import os
+import time
 
 # ⭐️ [핵심 수정] 프로젝트 루트 디렉토리를 Python 경로에 직접 추가합니다.
 # 이 코드는 다른 import 구문들보다 항상 맨 위에 있어야 합니다.
@@ -8,20 +9,50 @@ project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(project_root)
 
 # --- 이제 기존 import 시작 ---
+import asyncio
+from contextlib import asynccontextmanager
+from typing import List
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 import uvicorn
-from app.rag.chain import create_rag_chain # RAG 체인 생성 함수를 import
+from app import config
+from app.rag.chain import create_rag_chain, get_embeddings # RAG 체인 생성 함수를 import
+from app.rag.answer_cache import AnswerCache
+from app.rag.chain_manager import RagChainManager
+from rag_common.limiter import ConcurrencyLimiter, LimiterSaturatedError
+from rag_common.streaming import SlotReleasingStream, stream_rag_answer
+from app.logger import get_logger
+from rag_common.metrics import metrics_response, observe_http_request, register_stats, stage_metrics_callback, time_stage
 
 # ⭐️ [CORS] CORS 미들웨어를 import 합니다.
 from fastapi.middleware.cors import CORSMiddleware
 
 
+logger = get_logger(__name__)
+
+# RAG 체인은 서버 시작 후 백그라운드에서 저장된 인덱스로 먼저 만들어지고, ClickHouse 변경분을 반영한 뒤와
+# RAG_REFRESH_INTERVAL_SECONDS마다 새 체인으로 교체됩니다.
+chain_manager = RagChainManager(
+    create_rag_chain,
+    refresh_interval=config.RAG_REFRESH_INTERVAL_SECONDS,
+    retry_seconds=config.RAG_BUILD_RETRY_SECONDS,
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 인덱스 로드/동기화를 기다리지 않고 바로 요청을 받습니다. 준비 상태는 /readyz로 확인합니다.
+    logger.info("RAG 체인을 백그라운드에서 초기화합니다...")
+    task = asyncio.create_task(chain_manager.run())
+    yield
+    task.cancel()
+
 # --- FastAPI 앱 설정 ---
 app = FastAPI(
     title="RAG Agent API",
     description="ClickHouse 데이터를 기반으로 질문에 답변하는 AI 에이전트 서버",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # ⭐️ [CORS] 허용할 출처(origin)를 정의합니다.
@@ -39,39 +70,199 @@ app.add_middleware(
     allow_headers=["*"], # 모든 헤더 허용
 )
 
+# 엔드포인트별 요청 처리 시간을 Prometheus 히스토그램으로 기록합니다.
+app.middleware("http")(observe_http_request)
+
+# Gemini 호출 동시 실행 수 제한 (이벤트 루프는 막지 않고, 초과 요청은 대기열에서 기다립니다)
+llm_limiter = ConcurrencyLimiter(
+    max_concurrency=config.LLM_MAX_CONCURRENCY,
+    max_queue=config.LLM_MAX_QUEUE,
+    queue_timeout=config.LLM_QUEUE_TIMEOUT_SECONDS,
+)
+
+# 같은 질문(또는 유사한 질문)에 대한 답변 캐시. 인덱스 버전이 바뀌면 자동으로 비워집니다.
+answer_cache = AnswerCache(
+    get_embeddings(),
+    max_entries=config.ANSWER_CACHE_MAX_ENTRIES,
+    semantic=config.ANSWER_CACHE_SEMANTIC,
+    similarity_threshold=config.ANSWER_CACHE_SIMILARITY_THRESHOLD,
+)
+
+# /metrics 스크레이프 시점에 캐시/리미터 통계(hit_rate 등)를 게이지로 노출합니다.
+register_stats({
+    "answer_cache": answer_cache.stats,
+    "embedding_cache": lambda: get_embeddings().stats(),
+    "embedding_pipeline": lambda: get_embeddings().underlying.stats(),
+    "llm_limiter": llm_limiter.stats,
+    "rag_chain": chain_manager.stats,
+})
+
+def get_ready_chain():
+    """현재 사용 중인 RAG 체인을 반환합니다. 아직 준비되지 않았으면 503을 반환합니다."""
+    rag_chain = chain_manager.chain
+    if rag_chain is None:
+        raise HTTPException(status_code=503, detail="RAG chain is not ready yet.", headers={"Retry-After": "5"})
+    return rag_chain
 
-# RAG 체인을 전역 변수로 로드 (서버 시작 시 한 번만 실행)
-print("RAG 체인을 초기화합니다...")
-rag_chain = create_rag_chain()
-if rag_chain is None:
-    print("🚨 오류: RAG 체인 초기화에 실패했습니다. 서버를 시작할 수 없습니다.")
-else:
-    print("✅ RAG 체인이 성공적으로 준비되었습니다.")
+def answer_scope(rag_chain, question: str):
+    """질문의 매장/주기/기간 조건입니다. 조건이 다른 질문끼리는 답변 캐시를 공유하지 않습니다."""
+    return rag_chain.retriever.query_scope(question)
 
 # 요청 본문(request body)의 데이터 타입을 정의
 class QueryRequest(BaseModel):
     question: str
 
+class BatchQueryRequest(BaseModel):
+    questions: List[str]
+
 # API 엔드포인트(Endpoint) 생성
 @app.post("/query", summary="RAG 에이전트에게 질문하기")
 async def process_query(request: QueryRequest):
-    if not rag_chain:
-        raise HTTPException(status_code=503, detail="RAG chain is not initialized. Please check server logs.")
+    rag_chain = get_ready_chain()
     if not request.question:
         raise HTTPException(status_code=400, detail="Question cannot be empty")
 
     try:
-        print(f"질문 수신: {request.question}")
-        result = rag_chain.invoke(request.question)
+        logger.info("질문 수신", extra={"question": request.question})
+        index_version = rag_chain.metadata["index_version"]
+        scope = answer_scope(rag_chain, request.question)
+        cached = await answer_cache.lookup(request.question, index_version, scope)
+        if cached is not None:
+            logger.info("캐시된 답변을 반환합니다.", extra={"index_version": index_version})
+            return cached
+
+        started_at = time.perf_counter()
+        async with llm_limiter.slot():
+            result = await rag_chain.ainvoke(request.question, config={"callbacks": [stage_metrics_callback]})
         
-        return {
+        response = {
             "answer": result.get("result", "답변을 생성하지 못했습니다."),
             "source_documents": result.get("source_documents", [])
         }
+        await answer_cache.store(request.question, index_version, response, time.perf_counter() - started_at, scope)
+        return response
+    except LimiterSaturatedError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
     except Exception as e:
-        print(f"쿼리 처리 중 오류 발생: {e}")
+        logger.exception("쿼리 처리 중 오류 발생")
         raise HTTPException(status_code=500, detail=f"Error processing the query: {e}")
 
+@app.post("/query/stream", summary="RAG 에이전트에게 질문하고 답변을 스트리밍으로 받기")
+async def process_query_stream(request: QueryRequest):
+    """생성되는 토큰을 Server-Sent Events로 전달하고, 마지막에 참고 문서를 보냅니다."""
+    rag_chain = get_ready_chain()
+    if not request.question:
+        raise HTTPException(status_code=400, detail="Question cannot be empty")
+
+    try:
+        slot = await llm_limiter.lease()
+    except LimiterSaturatedError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+
+    logger.info("스트리밍 질문 수신", extra={"question": request.question})
+    return StreamingResponse(
+        # 응답 본문을 읽기 시작하기 전에 연결이 끊겨도 슬롯이 반납되도록 스트림을 감쌉니다.
+        SlotReleasingStream(stream_rag_answer(rag_chain, request.question), slot),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.post("/query/batch", summary="여러 질문을 한 번에 보내고 답변 받기")
+async def process_query_batch(request: BatchQueryRequest):
+    """
+    질문 여러 개를 한 번의 요청으로 처리하고, 결과를 질문 순서대로 반환합니다.
+    캐시에 없는 질문들은 한 번에 검색하고(배치 임베딩 + FAISS 행렬 검색),
+    답변 생성은 최대 QUERY_BATCH_MAX_CONCURRENCY개씩 동시에 실행합니다.
+    실패한 질문은 해당 항목에만 error와 status_code가 담깁니다.
+    """
+    rag_chain = get_ready_chain()
+    questions = request.questions
+    if not questions or not all(questions):
+        raise HTTPException(status_code=400, detail="Questions cannot be empty")
+    if len(questions) > config.QUERY_BATCH_MAX_SIZE:
+        raise HTTPException(status_code=400, detail=f"Too many questions (max {config.QUERY_BATCH_MAX_SIZE})")
+
+    logger.info("배치 질문 수신", extra={"questions": len(questions)})
+    index_version = rag_chain.metadata["index_version"]
+    if answer_cache.semantic:
+        # 유사 질문 캐시 조회가 질문마다 임베딩을 요청하지 않도록 질의 임베딩을 한 번에 만들어 캐시에 넣어 둡니다.
+        # 미리 만들지 못해도 캐시 조회와 검색이 질문별로 임베딩하므로 경고만 남기고 계속합니다.
+        try:
+            await asyncio.to_thread(get_embeddings().embed_queries, questions)
+        except Exception as e:
+            logger.warning("배치 질의 임베딩을 미리 만들지 못했습니다.", extra={"questions": len(questions), "error": str(e)})
+    scopes = {question: answer_scope(rag_chain, question) for question in questions}
+    cached = await asyncio.gather(*(answer_cache.lookup(question, index_version, scopes[question]) for question in questions))
+    results = [{"question": question, **hit, "cached": True} if hit is not None else None for question, hit in zip(questions, cached)]
+    # 같은 질문이 여러 번 들어오면 한 번만 검색/생성합니다.
+    pending = list(dict.fromkeys(question for question, result in zip(questions, results) if result is None))
+    if not pending:
+        return {"results": results}
+
+    try:
+        with time_stage("retrieve"):
+            documents = await asyncio.to_thread(rag_chain.retriever.retrieve_batch, pending)
+    except Exception as e:
+        # 배치 검색이 실패하면 질문마다 다시 검색해, 실패한 질문만 해당 항목에 오류로 남깁니다.
+        logger.warning("배치 검색 실패, 질문별로 다시 검색합니다.", extra={"questions": len(pending), "error": str(e)})
+        documents = await asyncio.gather(
+            *(asyncio.to_thread(rag_chain.retriever.invoke, question) for question in pending), return_exceptions=True
+        )
+
+    semaphore = asyncio.Semaphore(config.QUERY_BATCH_MAX_CONCURRENCY)
+
+    async def generate(question: str, input_documents) -> dict:
+        if isinstance(input_documents, Exception):
+            logger.error("배치 검색 중 오류 발생", extra={"question": question, "error": str(input_documents)})
+            return {"question": question, "error": f"Error processing the query: {input_documents}", "status_code": 500}
+        async with semaphore:
+            started_at = time.perf_counter()
+            try:
+                async with llm_limiter.slot():
+                    output = await rag_chain.combine_documents_chain.ainvoke(
+                        {"input_documents": input_documents, "question": question},
+                        config={"callbacks": [stage_metrics_callback]},
+                    )
+            except LimiterSaturatedError as e:
+                return {"question": question, "error": str(e), "status_code": 429}
+            except Exception as e:
+                logger.exception("배치 답변 생성 중 오류 발생")
+                return {"question": question, "error": f"Error processing the query: {e}", "status_code": 500}
+
+        response = {
+            "answer": output.get("output_text", "답변을 생성하지 못했습니다."),
+            "source_documents": input_documents,
+        }
+        await answer_cache.store(question, index_version, response, time.perf_counter() - started_at, scopes[question])
+        return {"question": question, **response, "cached": False}
+
+    generated = await asyncio.gather(*(generate(question, docs) for question, docs in zip(pending, documents)))
+    answers = dict(zip(pending, generated))
+    return {"results": [result if result is not None else answers[question] for question, result in zip(questions, results)]}
+
+@app.get("/cache/stats", summary="답변 캐시 및 임베딩 캐시 통계 조회")
+async def cache_stats():
+    return {
+        "answer_cache": answer_cache.stats(),
+        "embedding_cache": get_embeddings().stats(),
+        "embedding_pipeline": get_embeddings().underlying.stats(),
+        "llm_limiter": llm_limiter.stats(),
+        "rag_chain": chain_manager.stats(),
+    }
+
+@app.get("/healthz", summary="프로세스 생존 여부 확인")
+async def healthz():
+    return {"status": "ok"}
+
+@app.get("/readyz", summary="RAG 체인 준비 여부 확인")
+async def readyz():
+    """첫 RAG 체인이 준비되면 200, 그 전에는 503을 반환합니다."""
+    return JSONResponse(status_code=200 if chain_manager.ready else 503, content=chain_manager.stats())
+
+@app.get("/metrics", summary="Prometheus 메트릭", include_in_schema=False)
+async def metrics():
+    return metrics_response()
+
 # 서버 실행 (개발용)
 if __name__ == "__main__":
     # ⭐️ uvicorn 실행 시 app 경로를 문자열로 지정
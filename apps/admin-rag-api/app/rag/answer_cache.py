@@ -0,0 +1,133 @@
+# app/rag/answer_cache.py
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Hashable, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from app.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def normalize_question(question: str) -> str:
+    """대소문자, 공백, 끝의 문장부호 차이를 무시하도록 질문을 정규화합니다."""
+    normalized = re.sub(r"\s+", " ", question.strip().lower())
+    return normalized.rstrip("?!.。 ")
+
+
+@dataclass
+class _AnswerEntry:
+    result: dict
+    vector: Optional[np.ndarray]
+    latency: float
+    scope: Hashable = None
+
+
+class AnswerCache:
+    """
+    /query 답변을 (정규화된 질문, 인덱스 버전) 기준으로 캐싱합니다.
+
+    semantic=True이면 질문 임베딩의 코사인 유사도가 similarity_threshold 이상인
+    기존 질문의 답변도 재사용합니다. 단, 질문의 검색 범위(scope, 예: 매장/주기/기간 조건)가
+    정확히 같은 항목만 재사용하므로 "store3 지난달 매출"의 답변이 "store4 지난달 매출"에 쓰이지 않습니다. 질문 임베딩은 CachedEmbeddings를 거치므로
+    이후 리트리버가 같은 질문을 임베딩할 때는 캐시에서 바로 가져옵니다.
+    인덱스 버전이 바뀌면 캐시 전체를 비웁니다.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        max_entries: int,
+        semantic: bool = True,
+        similarity_threshold: float = 0.95,
+    ):
+        self.embeddings = embeddings
+        self.max_entries = max_entries
+        self.semantic = semantic
+        self.similarity_threshold = similarity_threshold
+        self._entries: "OrderedDict[str, _AnswerEntry]" = OrderedDict()
+        self._index_version: Optional[str] = None
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "semantic_hits": 0, "misses": 0, "invalidations": 0}
+        self._saved_seconds = 0.0
+
+    async def lookup(self, question: str, index_version: str, scope: Hashable = None) -> Optional[dict]:
+        key = normalize_question(question)
+        with self._lock:
+            self._sync_version(index_version)
+            entry = self._entries.get(key)
+            # "지난달"처럼 날짜에 따라 범위가 바뀌는 질문은 글자가 같아도 범위가 다를 수 있습니다.
+            if entry is not None and entry.scope == scope:
+                self._entries.move_to_end(key)
+                self._record_hit(entry, "hits")
+                return entry.result
+            has_vectors = any(e.vector is not None and e.scope == scope for e in self._entries.values())
+
+        vector = await self._embed(question) if self.semantic and has_vectors else None
+        with self._lock:
+            if vector is None or self._index_version != index_version:
+                self._counters["misses"] += 1
+                return None
+            best_key, best_score = None, -1.0
+            for entry_key, entry in self._entries.items():
+                if entry.vector is None or entry.scope != scope:
+                    continue
+                score = float(np.dot(vector, entry.vector))
+                if score > best_score:
+                    best_key, best_score = entry_key, score
+            if best_key is not None and best_score >= self.similarity_threshold:
+                entry = self._entries[best_key]
+                self._entries.move_to_end(best_key)
+                self._record_hit(entry, "semantic_hits")
+                return entry.result
+            self._counters["misses"] += 1
+            return None
+
+    async def store(
+        self, question: str, index_version: str, result: dict, latency: float, scope: Hashable = None
+    ) -> None:
+        vector = await self._embed(question) if self.semantic else None
+        with self._lock:
+            self._sync_version(index_version)
+            self._entries[normalize_question(question)] = _AnswerEntry(result, vector, latency, scope)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            counters = dict(self._counters)
+            hits = counters["hits"] + counters["semantic_hits"]
+            lookups = hits + counters["misses"]
+            counters.update({
+                "entries": len(self._entries),
+                "index_version": self._index_version,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "saved_latency_seconds": round(self._saved_seconds, 3),
+            })
+            return counters
+
+    def _sync_version(self, index_version: str) -> None:
+        """인덱스가 갱신되어 버전이 바뀌었으면 기존 답변을 모두 버립니다."""
+        if self._index_version == index_version:
+            return
+        if self._entries:
+            self._counters["invalidations"] += 1
+        self._entries.clear()
+        self._index_version = index_version
+
+    def _record_hit(self, entry: _AnswerEntry, counter: str) -> None:
+        self._counters[counter] += 1
+        self._saved_seconds += entry.latency
+
+    async def _embed(self, question: str) -> Optional[np.ndarray]:
+        try:
+            vector = np.asarray(await self.embeddings.aembed_query(question), dtype=np.float32)
+        except Exception as e:
+            logger.warning("질문 임베딩 실패로 유사 질문 캐시를 건너뜁니다.", extra={"error": str(e)})
+            return None
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
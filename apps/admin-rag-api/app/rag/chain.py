@@ -1,32 +1,79 @@
 # app/rag/chain.py
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_community.vectorstores import FAISS
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.chains import RetrievalQA
 from langchain.prompts import PromptTemplate
-from app.rag.loader import load_documents_from_clickhouse # 데이터 로더 함수를 import
+from app import config
+from app.rag.loader import iter_documents_from_clickhouse # 데이터 로더 함수를 import
+from app.rag.index_store import SummaryIndexStore
+from rag_common.embedding_cache import CachedEmbeddings
+from app.rag.embedding_pipeline import EmbeddingPipeline
+from app.rag.providers import create_embedding_provider, create_llm, embedding_model_name
+from app.rag.retriever import MetadataFilteredRetriever, SummaryMetadataIndex
+from app.rag.context import CONTEXT_HEADER, CompactContextRetriever
+from app.logger import get_logger
 
-def create_rag_chain():
-    """RAG 체인을 생성합니다."""
-    documents = load_documents_from_clickhouse()
-    if not documents:
-        return None
+logger = get_logger(__name__)
+
+_embeddings = None
 
+def get_embeddings() -> CachedEmbeddings:
+    """캐시가 적용된 임베딩 객체를 반환합니다. 프로세스 전체에서 하나만 생성합니다."""
+    global _embeddings
+    if _embeddings is None:
+        # 캐시에 없는 텍스트만 배치/동시 실행/속도 제한이 적용된 파이프라인을 거쳐 공급자에게 요청합니다.
+        pipeline = EmbeddingPipeline(
+            create_embedding_provider(),
+            batch_size=config.EMBEDDING_BATCH_SIZE,
+            max_concurrency=config.EMBEDDING_MAX_CONCURRENCY,
+            requests_per_minute=config.EMBEDDING_REQUESTS_PER_MINUTE,
+            max_retries=config.EMBEDDING_MAX_RETRIES,
+            base_backoff_seconds=config.EMBEDDING_RETRY_BACKOFF_SECONDS,
+        )
+        _embeddings = CachedEmbeddings(
+            pipeline,
+            model_name=embedding_model_name(),
+            db_path=config.EMBEDDING_CACHE_PATH,
+            max_entries=config.EMBEDDING_CACHE_MAX_ENTRIES,
+            lru_size=config.EMBEDDING_CACHE_LRU_SIZE,
+        )
+    return _embeddings
+
+def create_rag_chain(sync: bool = True):
+    """
+    RAG 체인을 생성합니다.
+    sync=True이면 ClickHouse 변경분을 인덱스에 반영한 뒤 체인을 만듭니다. 단, 다른 워커가 이미 같은 인덱스를
+    갱신 중이면 기다리지 않고 디스크에 저장된 인덱스를 불러옵니다. sync=False이면 저장된 인덱스만 불러옵니다.
+    """
     text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
-    docs = text_splitter.split_documents(documents)
-    if not docs:
-        print("경고: 문서를 분할한 후 내용이 없습니다.")
+    embeddings = get_embeddings()
+
+    # 디스크에 저장된 인덱스를 불러온 뒤, 새로 추가되거나 바뀐 행만 임베딩해서 반영합니다.
+    index_store = SummaryIndexStore(config.RAG_INDEX_DIR, embeddings, text_splitter)
+    with index_store.build_lock() as owner:
+        if sync and owner:
+            # 문서는 페이지 단위로 스트리밍되어 배치마다 분할/임베딩되므로 테이블 크기와 무관하게 메모리 사용량이 일정합니다.
+            vector_store = index_store.sync(iter_documents_from_clickhouse(), batch_size=config.RAG_INDEX_BATCH_SIZE)
+        else:
+            if sync:
+                logger.info("다른 워커가 인덱스를 갱신 중이므로 저장된 인덱스를 불러옵니다.")
+            # 이 체인은 인덱스를 고치지 않으므로 벡터를 메모리 매핑으로 읽습니다.
+            vector_store = index_store.load(read_only=True)
+    if vector_store is None:
+        if sync:
+            logger.warning("사용할 수 있는 인덱스가 없습니다.")
         return None
 
-    embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
-    vector_store = FAISS.from_documents(docs, embeddings)
-    retriever = vector_store.as_retriever()
+    # 질문의 매장/주기/기간 조건으로 후보를 먼저 좁힌 뒤 벡터 검색합니다.
+    filtered_retriever = MetadataFilteredRetriever(vector_store=vector_store, metadata_index=SummaryMetadataIndex(vector_store))
+    # 검색된 행을 문장 대신 표 한 줄씩으로 압축하고, 토큰 예산을 넘는 행은 잘라냅니다.
+    retriever = CompactContextRetriever(retriever=filtered_retriever, token_budget=config.RAG_CONTEXT_TOKEN_BUDGET)
 
     prompt_template = """
     주어진 데이터베이스 정보를 바탕으로 질문에 답변해주세요.
 
     [데이터베이스 정보]
+    매장별 기간 요약 (| 로 구분)
+    {header}
     {context}
 
     [질문]
@@ -34,14 +81,19 @@ def create_rag_chain():
 
     [답변]
     """
-    prompt = PromptTemplate(template=prompt_template, input_variables=["context", "question"])
-    llm = ChatGoogleGenerativeAI(model="gemini-1.5-flash-latest", temperature=0.3, convert_system_message_to_human=True)
+    prompt = PromptTemplate(
+        template=prompt_template,
+        input_variables=["context", "question"],
+        partial_variables={"header": CONTEXT_HEADER},
+    )
+    llm = create_llm()
     
     rag_chain = RetrievalQA.from_chain_type(
         llm=llm,
         chain_type="stuff",
         retriever=retriever,
-        chain_type_kwargs={"prompt": prompt},
-        return_source_documents=True
+        chain_type_kwargs={"prompt": prompt, "document_separator": "\n"},
+        return_source_documents=True,
+        metadata={"index_version": index_store.version},
     )
     return rag_chain
@@ -0,0 +1,102 @@
+# app/rag/chain_manager.py
+import asyncio
+import time
+from typing import Callable, Optional
+
+from app.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class RagChainManager:
+    """
+    RAG 체인을 백그라운드에서 만들고 주기적으로 다시 만들어 교체합니다.
+
+    - 서버는 체인 생성을 기다리지 않고 바로 요청을 받으며, 첫 체인이 준비되기 전까지 chain은 None입니다.
+    - 첫 체인은 디스크에 저장된 인덱스만 불러와(build(sync=False)) 만들므로 원본 테이블 크기와 무관하게 준비됩니다.
+      원본 변경분 반영(build(sync=True))은 그 뒤에 백그라운드에서 실행해 교체하며,
+      저장된 인덱스가 없을 때만 첫 체인을 동기화하면서 만듭니다.
+    - 생성에 실패하면 retry_seconds 후 다시 시도하고, 갱신에 실패하면 기존 체인을 계속 사용합니다.
+    - 새 체인은 완성된 뒤 참조만 바꿔 끼우므로, 처리 중인 요청은 이전 체인으로 끝까지 실행됩니다.
+    """
+
+    def __init__(self, build: Callable, refresh_interval: float, retry_seconds: float):
+        self.build = build
+        self.refresh_interval = refresh_interval
+        self.retry_seconds = retry_seconds
+        self.chain = None
+        self.last_error: Optional[str] = None
+        self.ready_at: Optional[float] = None
+        self.built_at: Optional[float] = None
+        self.synced_at: Optional[float] = None
+        self._started_at = time.time()
+        self._counters = {"builds": 0, "failures": 0}
+
+    @property
+    def ready(self) -> bool:
+        return self.chain is not None
+
+    @property
+    def index_version(self) -> Optional[str]:
+        return self.chain.metadata["index_version"] if self.chain is not None else None
+
+    async def run(self) -> None:
+        """
+        저장된 인덱스로 바로 준비한 뒤 원본 변경분을 반영한 체인으로 교체하고, 이후 refresh_interval마다 다시 만듭니다.
+        동기화한 체인이 하나도 없으면 만들어질 때까지 retry_seconds마다 재시도합니다.
+        """
+        await self.rebuild(sync=False)
+        while not await self.rebuild(sync=True) and not self.ready:
+            await asyncio.sleep(self.retry_seconds)
+        while self.refresh_interval > 0:
+            await asyncio.sleep(self.refresh_interval)
+            await self.rebuild(sync=True)
+
+    async def rebuild(self, sync: bool = True) -> bool:
+        """
+        체인을 새로 만들어 교체합니다. 인덱스 읽기/동기화는 블로킹 작업이므로 스레드에서 실행합니다.
+        sync=False이면 저장된 인덱스만 불러오며, 저장된 인덱스가 없으면 실패로 세지 않고 False를 반환합니다.
+        """
+        started_at = time.perf_counter()
+        try:
+            chain = await asyncio.to_thread(self.build, sync)
+        except Exception as e:
+            chain = None
+            self.last_error = str(e)
+            logger.exception("RAG 체인 생성 중 오류 발생")
+        if chain is None and not sync:
+            logger.info("저장된 인덱스가 없어 원본 데이터로 첫 체인을 만듭니다.")
+            return False
+        if chain is None:
+            self._counters["failures"] += 1
+            if self.ready:
+                logger.warning("새 RAG 체인을 만들지 못해 기존 체인을 계속 사용합니다.", extra={"index_version": self.index_version})
+            return False
+
+        previous_version = self.index_version
+        self.chain = chain
+        self.last_error = None
+        self.built_at = time.time()
+        if sync:
+            self.synced_at = self.built_at
+        if self.ready_at is None:
+            self.ready_at = self.built_at
+        self._counters["builds"] += 1
+        logger.info("RAG 체인 준비 완료", extra={
+            "index_version": self.index_version,
+            "synced": sync,
+            "previous_index_version": previous_version,
+            "seconds": round(time.perf_counter() - started_at, 2),
+        })
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "index_version": self.index_version,
+            "seconds_to_ready": round(self.ready_at - self._started_at, 2) if self.ready_at else None,
+            "last_built_at": self.built_at,
+            "last_synced_at": self.synced_at,
+            "last_error": self.last_error,
+            **self._counters,
+        }
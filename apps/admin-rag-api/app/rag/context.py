@@ -0,0 +1,103 @@
+# app/rag/context.py
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForRetrieverRun,
+    CallbackManagerForRetrieverRun,
+)
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from app.rag.index_store import row_key
+from rag_common.tokens import estimate_tokens
+
+# 표 형식 컨텍스트의 컬럼 (메타데이터 키, 프롬프트에 표시할 이름)
+CONTEXT_COLUMNS = [
+    ("store_id", "매장"),
+    ("period_type", "주기"),
+    ("period_start", "시작일"),
+    ("total_sales", "총판매액(원)"),
+    ("total_orders", "주문수"),
+    ("avg_order_value", "평균주문액(원)"),
+    ("unique_visitors", "순방문자"),
+    ("top_1_menu_id", "인기메뉴1"),
+    ("top_2_menu_id", "인기메뉴2"),
+    ("top_3_menu_id", "인기메뉴3"),
+    ("top_1_path", "주요경로"),
+    ("top_1_path_users", "경로고객수"),
+]
+CONTEXT_HEADER = " | ".join(label for _, label in CONTEXT_COLUMNS)
+
+
+def _compact_value(value) -> str:
+    if value is None or value == "" or value == "None":
+        return "-"
+    text = str(value)
+    if text.endswith(".0"):
+        text = text[:-2]
+    if text.endswith(" 00:00:00"):
+        text = text[:-9]
+    return text
+
+
+def render_compact_row(metadata: Dict[str, str]) -> str:
+    """요약 테이블 한 행의 메타데이터를 CONTEXT_HEADER 순서의 한 줄로 만듭니다."""
+    return " | ".join(_compact_value(metadata.get(key)) for key, _ in CONTEXT_COLUMNS)
+
+
+def assemble_context(documents: List[Document], token_budget: int) -> List[Document]:
+    """
+    검색된 청크를 행 단위로 합쳐(청크 overlap으로 생긴 중복 제거) 표 한 줄씩의 Document로 바꾸고,
+    누적 토큰 추정치가 token_budget을 넘기 전까지만 남깁니다. 검색 순위가 높은 행이 먼저 들어갑니다.
+    """
+    used_tokens = estimate_tokens(CONTEXT_HEADER)
+    seen = set()
+    assembled = []
+    for document in documents:
+        if not isinstance(document, Document):
+            continue  # 문서 저장소에서 지워진 청크의 "ID ... not found." 결과
+        key = row_key(document.metadata)
+        if key in seen:
+            continue
+        seen.add(key)
+
+        line = render_compact_row(document.metadata)
+        line_tokens = estimate_tokens(line)
+        if assembled and used_tokens + line_tokens > token_budget:
+            break
+        used_tokens += line_tokens
+        assembled.append(Document(page_content=line, metadata=document.metadata))
+    return assembled
+
+
+class CompactContextRetriever(BaseRetriever):
+    """다른 리트리버의 결과를 표 형식으로 압축하고 토큰 예산에 맞게 자르는 리트리버입니다."""
+
+    retriever: BaseRetriever
+    token_budget: int
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        documents = self.retriever.invoke(query, config={"callbacks": run_manager.get_child()})
+        return assemble_context(documents, self.token_budget)
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        documents = await self.retriever.ainvoke(query, config={"callbacks": run_manager.get_child()})
+        return assemble_context(documents, self.token_budget)
+
+    def query_scope(self, query: str) -> Optional[Tuple]:
+        """감싼 리트리버가 질문의 검색 조건을 알려 주면 그대로 전달합니다."""
+        if hasattr(self.retriever, "query_scope"):
+            return self.retriever.query_scope(query)
+        return None
+
+    def retrieve_batch(self, queries: List[str]) -> List[List[Document]]:
+        """감싼 리트리버의 배치 검색 결과를 질문마다 압축합니다."""
+        if hasattr(self.retriever, "retrieve_batch"):
+            batches = self.retriever.retrieve_batch(queries)
+        else:
+            batches = self.retriever.batch(queries)
+        return [assemble_context(documents, self.token_budget) for documents in batches]
@@ -0,0 +1,132 @@
+# app/rag/embedding_pipeline.py
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from langchain_core.embeddings import Embeddings
+
+from app.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class TokenBucket:
+    """초당 rate개의 토큰이 채워지는 토큰 버킷입니다. 토큰이 없으면 채워질 때까지 기다립니다."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """429 / 할당량 초과 오류인지 판별합니다."""
+    if getattr(error, "code", None) == 429 or getattr(error, "status_code", None) == 429:
+        return True
+    message = str(error).lower()
+    return any(marker in message for marker in ("429", "resource_exhausted", "resourceexhausted", "quota", "rate limit"))
+
+
+class EmbeddingPipeline(Embeddings):
+    """
+    임베딩 요청을 공급자 최대 크기(batch_size)로 나누어 최대 max_concurrency개씩 동시에 보내는 Embeddings 래퍼입니다.
+
+    - 모든 요청(배치/질의)은 분당 requests_per_minute개로 제한되는 토큰 버킷을 거칩니다.
+    - 429(할당량 초과) 오류는 지수 백오프 + 지터로 최대 max_retries번 재시도합니다.
+    - 배치 처리량(건/초)과 재시도 횟수를 기록합니다.
+    """
+
+    def __init__(
+        self,
+        provider: Embeddings,
+        batch_size: int = 100,
+        max_concurrency: int = 4,
+        requests_per_minute: float = 1500,
+        max_retries: int = 5,
+        base_backoff_seconds: float = 1.0,
+    ):
+        self.provider = provider
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_backoff_seconds = base_backoff_seconds
+        self._bucket = TokenBucket(rate=requests_per_minute / 60.0, capacity=max_concurrency)
+        self._lock = threading.Lock()
+        self._counters = {"requests": 0, "texts": 0, "retries": 0, "rate_limited": 0, "seconds": 0.0}
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed_batches(texts, self.provider.embed_documents)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._call_with_retry(self.provider.embed_query, text)
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """여러 질문을 질의용으로 임베딩합니다. 공급자가 배치 질의 임베딩을 지원하지 않으면 질문마다 요청합니다."""
+        embed_queries = getattr(self.provider, "embed_queries", None)
+        if embed_queries is None:
+            embed_queries = lambda batch: [self.provider.embed_query(text) for text in batch]
+        return self._embed_batches(texts, embed_queries)
+
+    def _embed_batches(self, texts: List[str], embed_fn) -> List[List[float]]:
+        if not texts:
+            return []
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+
+        started_at = time.perf_counter()
+        if len(batches) == 1:
+            results = [self._call_with_retry(embed_fn, batches[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(batches))) as executor:
+                results = list(executor.map(lambda batch: self._call_with_retry(embed_fn, batch), batches))
+        elapsed = time.perf_counter() - started_at
+
+        with self._lock:
+            self._counters["texts"] += len(texts)
+            self._counters["seconds"] += elapsed
+        if len(batches) > 1:
+            logger.info("배치 임베딩 완료", extra={
+                "texts": len(texts), "batches": len(batches),
+                "seconds": round(elapsed, 3), "texts_per_second": round(len(texts) / elapsed, 1),
+            })
+        return [vector for batch_result in results for vector in batch_result]
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            counters = dict(self._counters)
+        counters["texts_per_second"] = counters["texts"] / counters["seconds"] if counters["seconds"] else 0.0
+        return counters
+
+    def _call_with_retry(self, fn, payload):
+        for attempt in range(self.max_retries + 1):
+            self._bucket.acquire()
+            with self._lock:
+                self._counters["requests"] += 1
+            try:
+                return fn(payload)
+            except Exception as e:
+                if not is_rate_limit_error(e) or attempt == self.max_retries:
+                    raise
+                backoff = self.base_backoff_seconds * (2 ** attempt) * (1 + random.random())
+                with self._lock:
+                    self._counters["rate_limited"] += 1
+                    self._counters["retries"] += 1
+                logger.warning("임베딩 할당량 초과, 재시도합니다.", extra={
+                    "backoff_seconds": round(backoff, 1), "attempt": attempt + 1, "max_retries": self.max_retries,
+                })
+                time.sleep(backoff)
@@ -0,0 +1,372 @@
+# app/rag/index_store.py
+import fcntl
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+import faiss
+from langchain_community.docstore.base import AddableMixin, Docstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from rag_common.metrics import time_stage
+
+from app.logger import get_logger
+
+logger = get_logger(__name__)
+
+DOCSTORE_FILE_NAME = "docstore.sqlite3"
+LOCK_FILE_NAME = ".build.lock"
+
+# 평면(Flat) 인덱스의 벡터 배열을 메모리 매핑으로 읽는 플래그 (faiss 1.11+, 읽기 전용). 없으면 전체를 메모리로 읽습니다.
+MMAP_FLAT_FLAG = getattr(faiss, "IO_FLAG_MMAP_IFC", 0)
+
+# chunks: 청크 본문/메타데이터 (removed_version: 이 버전의 인덱스부터 빠진 청크, 이전 버전을 읽는 워커를 위해 한 버전 더 보관)
+# rows: 원본 행 키별 content hash와 청크 ID 목록
+# meta: 현재 인덱스 버전
+DOCSTORE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunks (
+    chunk_id TEXT PRIMARY KEY,
+    page_content TEXT NOT NULL,
+    metadata TEXT NOT NULL,
+    removed_version INTEGER
+);
+CREATE TABLE IF NOT EXISTS rows (
+    row_key TEXT PRIMARY KEY,
+    hash TEXT NOT NULL,
+    chunk_ids TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def _batched(items: Iterable, size: int) -> Iterator[List]:
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def row_key(metadata: Dict[str, str]) -> str:
+    """summary_stats_by_period 한 행을 식별하는 키 (store_id/period_type/period_start)를 만듭니다."""
+    return f"{metadata.get('store_id')}|{metadata.get('period_type')}|{metadata.get('period_start')}"
+
+
+def content_hash(page_content: str) -> str:
+    return hashlib.sha256(page_content.encode("utf-8")).hexdigest()
+
+
+class SqliteDocstore(Docstore, AddableMixin):
+    """
+    청크 ID로 조회하는 SQLite 문서 저장소입니다. 문서 본문은 검색 결과에 필요할 때 한 건씩 읽습니다.
+
+    add/delete는 메모리에 모아 두었다가 SummaryIndexStore가 인덱스를 저장할 때 한 트랜잭션으로 반영합니다.
+    따라서 같은 파일을 읽는 다른 체인(이전 버전 인덱스)은 저장 전까지 변경분의 영향을 받지 않습니다.
+    """
+
+    def __init__(self, connection: sqlite3.Connection, lock: threading.Lock):
+        self._connection = connection
+        self._lock = lock
+        self._pending: Dict[str, Optional[Document]] = {}
+
+    def search(self, search: str) -> Union[str, Document]:
+        if search in self._pending:
+            document = self._pending[search]
+            return document if document is not None else f"ID {search} not found."
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT page_content, metadata FROM chunks WHERE chunk_id = ?", (search,)
+            ).fetchone()
+        if row is None:
+            return f"ID {search} not found."
+        return Document(id=search, page_content=row[0], metadata=json.loads(row[1]))
+
+    def add(self, texts: Dict[str, Document]) -> None:
+        self._pending.update(texts)
+
+    def delete(self, ids: List) -> None:
+        for chunk_id in ids:
+            self._pending[chunk_id] = None
+
+    def metadata_by_id(self) -> Dict[str, dict]:
+        """모든 청크의 메타데이터를 본문 없이 한 번에 읽습니다. (메타데이터 색인 생성용)"""
+        with self._lock:
+            rows = self._connection.execute("SELECT chunk_id, metadata FROM chunks").fetchall()
+        metadata = {chunk_id: json.loads(value) for chunk_id, value in rows}
+        for chunk_id, document in self._pending.items():
+            if document is None:
+                metadata.pop(chunk_id, None)
+            else:
+                metadata[chunk_id] = document.metadata
+        return metadata
+
+    def flush(self, connection: sqlite3.Connection, version: int) -> int:
+        """모아 둔 변경분을 현재 트랜잭션에 씁니다. 삭제된 청크는 removed_version만 기록합니다."""
+        added = [
+            (chunk_id, document.page_content, json.dumps(document.metadata, ensure_ascii=False))
+            for chunk_id, document in self._pending.items() if document is not None
+        ]
+        removed = [(version, chunk_id) for chunk_id, document in self._pending.items() if document is None]
+        connection.executemany(
+            "INSERT OR REPLACE INTO chunks (chunk_id, page_content, metadata, removed_version) VALUES (?, ?, ?, NULL)",
+            added,
+        )
+        connection.executemany("UPDATE chunks SET removed_version = ? WHERE chunk_id = ?", removed)
+        self._pending.clear()
+        return len(added) + len(removed)
+
+
+class SummaryIndexStore:
+    """
+    디스크에 저장되는 FAISS 인덱스와 SQLite 문서 저장소를 관리합니다.
+
+    - 인덱스는 버전별 파일(index.<버전>.faiss)과 위치별 청크 ID 목록(index.<버전>.ids.json)으로 저장되고,
+      SQLite의 meta 테이블이 현재 버전을 가리킵니다. 새 버전은 파일을 다 쓴 뒤 meta를 바꾸는 트랜잭션으로 공개합니다.
+    - 청크 본문/메타데이터와 행 키별 content hash는 SQLite에 키 단위로 저장되어, 저장할 때는 바뀐 행만 씁니다.
+    - 불러올 때는 본문을 읽지 않고, 검색 결과에 필요한 청크만 조회합니다.
+    재시작 시에는 새로 추가되거나 바뀐 행만 임베딩합니다.
+    """
+
+    def __init__(self, index_dir: str, embeddings: Embeddings, text_splitter):
+        self.index_dir = index_dir
+        self.embeddings = embeddings
+        self.text_splitter = text_splitter
+        self.docstore_path = os.path.join(index_dir, DOCSTORE_FILE_NAME)
+        # 행 키 -> {"hash", "chunk_ids"}. sync 중에만 채웁니다.
+        self.rows: Dict[str, dict] = {}
+        self._version = 0
+        self._changed_rows: Set[str] = set()
+        self._removed_rows: Set[str] = set()
+        self._rebuild = False
+        self._connection: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def build_lock(self, blocking: bool = False):
+        """
+        인덱스 디렉토리의 파일 락을 잡습니다. 같은 디렉토리를 쓰는 여러 워커 중 하나만 sync 하도록 할 때 사용합니다.
+        blocking=False이면 기다리지 않고, 락을 잡았는지 여부(bool)를 돌려줍니다.
+        """
+        os.makedirs(self.index_dir, exist_ok=True)
+        with open(os.path.join(self.index_dir, LOCK_FILE_NAME), "w") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @property
+    def version(self) -> str:
+        """인덱스가 갱신될 때마다 증가하는 버전입니다. 답변 캐시 무효화에 사용됩니다."""
+        return str(self._version)
+
+    def load(self, read_only: bool = False) -> Optional[FAISS]:
+        """
+        현재 버전의 인덱스를 읽어 FAISS 벡터 스토어를 복원합니다. 문서 본문은 읽지 않습니다.
+        read_only=True이면 벡터를 메모리 매핑으로 읽으므로, 반환된 인덱스에 벡터를 추가/삭제하면 안 됩니다.
+        """
+        version = self._read_version()
+        if version is None:
+            logger.info("저장된 인덱스가 없습니다.", extra={"index_dir": self.index_dir})
+            return None
+
+        index_path, ids_path = self._index_paths(version)
+        try:
+            index = faiss.read_index(index_path, MMAP_FLAT_FLAG if read_only else 0)
+            with open(ids_path, "r", encoding="utf-8") as f:
+                index_to_docstore_id = json.load(f)
+        except Exception as e:
+            logger.warning("저장된 인덱스를 읽지 못했습니다. 새로 생성합니다.", extra={"error": str(e)})
+            return None
+
+        if index.ntotal != len(index_to_docstore_id):
+            logger.warning("인덱스와 청크 ID 목록이 일치하지 않습니다. 새로 생성합니다.")
+            return None
+
+        self._version = version
+        docstore = SqliteDocstore(self._connect(), self._lock)
+        logger.info("저장된 인덱스 로드 완료", extra={"index_version": version, "vectors": index.ntotal, "mmap": read_only})
+        return FAISS(self.embeddings, index, docstore, dict(enumerate(index_to_docstore_id)))
+
+    def sync(self, documents: Iterable[Document], batch_size: int = 256) -> Optional[FAISS]:
+        """
+        원본 문서를 batch_size개씩 읽으면서 저장된 content hash와 비교해 변경분만 분할/임베딩하여 인덱스에 반영하고,
+        마지막에 한 번 디스크에 저장합니다. 원본 문서는 제너레이터로 받아도 되며 한 배치씩만 메모리에 올립니다.
+
+        원본을 끝까지 읽지 못한 경우에는 읽은 만큼만 반영하고, 원본에서 사라진 행의 삭제는 건너뜁니다.
+        원본을 하나도 읽지 못한 경우에는 기존 인덱스를 그대로 사용합니다.
+        """
+        vector_store = self.load()
+        # 읽을 수 있는 인덱스가 없으면 저장된 행 정보도 믿을 수 없으므로 처음부터 다시 만듭니다.
+        self._rebuild = vector_store is None
+        self.rows = {} if self._rebuild else self._read_rows()
+        rows = self.rows
+        seen_keys = set()
+        counts = {"new": 0, "updated": 0, "removed": 0}
+
+        complete = True
+        try:
+            for batch in _batched(documents, batch_size):
+                vector_store = self._apply_batch(vector_store, batch, seen_keys, counts)
+        except Exception as e:
+            complete = False
+            logger.warning("원본 데이터를 끝까지 읽지 못했습니다. 삭제된 행은 반영하지 않습니다.", extra={"error": str(e)})
+
+        if not seen_keys:
+            if vector_store is None:
+                return None
+            logger.warning("원본 데이터를 불러오지 못해 기존 인덱스를 그대로 사용합니다.")
+            return vector_store
+
+        if complete:
+            removed_keys = [key for key in rows if key not in seen_keys]
+            stale_chunk_ids = [chunk_id for key in removed_keys for chunk_id in rows.pop(key)["chunk_ids"]]
+            if vector_store is not None and stale_chunk_ids:
+                vector_store.delete(stale_chunk_ids)
+            self._removed_rows.update(removed_keys)
+            counts["removed"] = len(removed_keys)
+
+        logger.info("인덱스 변경분 반영", extra=counts)
+        if vector_store is None:
+            return None
+        if any(counts.values()):
+            self._save(vector_store)
+        return vector_store
+
+    def _apply_batch(self, vector_store: Optional[FAISS], batch: List[Document], seen_keys: set, counts: Dict[str, int]) -> Optional[FAISS]:
+        rows = self.rows
+
+        # 같은 키가 여러 번 나오면 마지막 행을 기준으로 합니다.
+        changed: Dict[str, Document] = {}
+        for doc in batch:
+            key = row_key(doc.metadata)
+            seen_keys.add(key)
+            entry = rows.get(key)
+            if entry and entry["hash"] == content_hash(doc.page_content):
+                changed.pop(key, None)
+                continue
+            changed[key] = doc
+        if not changed:
+            return vector_store
+
+        updated_keys = [key for key in changed if key in rows]
+        counts["updated"] += len(updated_keys)
+        counts["new"] += len(changed) - len(updated_keys)
+
+        stale_chunk_ids = [chunk_id for key in updated_keys for chunk_id in rows.pop(key)["chunk_ids"]]
+        if vector_store is not None and stale_chunk_ids:
+            vector_store.delete(stale_chunk_ids)
+
+        chunk_ids: List[str] = []
+        chunks: List[Document] = []
+        with time_stage("split"):
+            for key, doc in changed.items():
+                doc_chunks = self.text_splitter.split_documents([doc])
+                ids = [f"{key}#{i}" for i in range(len(doc_chunks))]
+                rows[key] = {"hash": content_hash(doc.page_content), "chunk_ids": ids}
+                self._changed_rows.add(key)
+                chunk_ids.extend(ids)
+                chunks.extend(doc_chunks)
+        if not chunks:
+            return vector_store
+
+        # 임베딩과 FAISS 추가를 나누어 각 단계의 소요 시간을 따로 기록합니다.
+        texts = [chunk.page_content for chunk in chunks]
+        metadatas = [chunk.metadata for chunk in chunks]
+        with time_stage("embed"):
+            vectors = self.embeddings.embed_documents(texts)
+        with time_stage("index_build"):
+            if vector_store is None:
+                vector_store = FAISS(
+                    self.embeddings, faiss.IndexFlatL2(len(vectors[0])), SqliteDocstore(self._connect(), self._lock), {}
+                )
+            vector_store.add_embeddings(list(zip(texts, vectors)), metadatas=metadatas, ids=chunk_ids)
+        return vector_store
+
+    def _save(self, vector_store: FAISS) -> None:
+        """새 버전의 인덱스 파일을 쓴 뒤, 바뀐 청크/행과 현재 버전을 한 트랜잭션으로 반영합니다."""
+        with time_stage("index_save"):
+            self._write(vector_store)
+
+    def _write(self, vector_store: FAISS) -> None:
+        version = self._version + 1
+        index_to_docstore_id = [
+            vector_store.index_to_docstore_id[i] for i in range(len(vector_store.index_to_docstore_id))
+        ]
+        index_path, ids_path = self._index_paths(version)
+        faiss.write_index(vector_store.index, index_path)
+        with open(ids_path, "w", encoding="utf-8") as f:
+            json.dump(index_to_docstore_id, f, ensure_ascii=False)
+
+        connection = self._connect()
+        with self._lock, connection:
+            if self._rebuild:
+                connection.execute("DELETE FROM rows")
+                connection.execute("UPDATE chunks SET removed_version = ? WHERE removed_version IS NULL", (version,))
+            chunks = vector_store.docstore.flush(connection, version)
+            # 이전 버전 인덱스(아직 읽는 워커가 있을 수 있음)가 참조하지 않는, 그 전에 빠진 청크만 지웁니다.
+            connection.execute("DELETE FROM chunks WHERE removed_version < ?", (version,))
+            connection.executemany(
+                "INSERT OR REPLACE INTO rows (row_key, hash, chunk_ids) VALUES (?, ?, ?)",
+                [(key, self.rows[key]["hash"], json.dumps(self.rows[key]["chunk_ids"]))
+                 for key in self._changed_rows if key in self.rows],
+            )
+            connection.executemany("DELETE FROM rows WHERE row_key = ?", [(key,) for key in self._removed_rows])
+            connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('version', ?)", (str(version),))
+
+        self._version = version
+        self._changed_rows.clear()
+        self._removed_rows.clear()
+        self._rebuild = False
+        self._remove_old_files(keep_from=version - 1)
+        logger.info("인덱스 저장 완료", extra={
+            "index_version": version, "vectors": len(index_to_docstore_id), "written_chunks": chunks,
+        })
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            os.makedirs(self.index_dir, exist_ok=True)
+            connection = sqlite3.connect(self.docstore_path, check_same_thread=False)
+            # 다른 워커가 저장하는 동안에도 읽을 수 있도록 WAL 모드를 사용합니다.
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(DOCSTORE_SCHEMA)
+            self._connection = connection
+        return self._connection
+
+    def _read_version(self) -> Optional[int]:
+        if not os.path.exists(self.docstore_path):
+            return None
+        with self._lock:
+            row = self._connect().execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        return int(row[0]) if row else None
+
+    def _read_rows(self) -> Dict[str, dict]:
+        with self._lock:
+            rows = self._connect().execute("SELECT row_key, hash, chunk_ids FROM rows").fetchall()
+        return {key: {"hash": value, "chunk_ids": json.loads(chunk_ids)} for key, value, chunk_ids in rows}
+
+    def _index_paths(self, version: int) -> Tuple[str, str]:
+        base = os.path.join(self.index_dir, f"index.{version}")
+        return f"{base}.faiss", f"{base}.ids.json"
+
+    def _remove_old_files(self, keep_from: int) -> None:
+        """keep_from 이전 버전의 인덱스 파일을 지웁니다. 직전 버전은 아직 읽는 워커가 있을 수 있어 남겨 둡니다."""
+        for name in os.listdir(self.index_dir):
+            match = re.fullmatch(r"index\.(\d+)\.(faiss|ids\.json)", name)
+            if match and int(match.group(1)) < keep_from:
+                os.remove(os.path.join(self.index_dir, name))
@@ -1,54 +1,117 @@
 # app/rag/loader.py
-from typing import List
+import json
+from itertools import islice
+from typing import Dict, Iterator, List, Optional
 from langchain_core.documents import Document
 import clickhouse_connect
 from app import config
+from app.logger import get_logger
+from rag_common.metrics import time_stage
 from urllib.parse import urlparse
-from pymongo import MongoClient
+
+logger = get_logger(__name__)
+
+# 문서 생성에 사용하는 컬럼 (테이블에 있는 컬럼만 조회합니다)
+SUMMARY_COLUMNS = [
+    "store_id", "period_type", "period_start",
+    "total_sales", "total_orders", "avg_order_value", "unique_visitors",
+    "top_1_menu_id", "top_2_menu_id", "top_3_menu_id",
+    "top_1_path", "top_1_path_users",
+]
+# keyset 페이지네이션 정렬 키 (행을 고유하게 식별하는 컬럼)
+KEYSET_COLUMNS = ["period_start", "store_id", "period_type"]
+
+def get_clickhouse_client():
+    parsed_url = urlparse(config.CLICKHOUSE_HOST)
+    return clickhouse_connect.get_client(
+        host=parsed_url.hostname,
+        port=config.CLICKHOUSE_PORT or parsed_url.port,
+        username=config.CLICKHOUSE_USERNAME,
+        password=config.CLICKHOUSE_PASSWORD,
+        database=config.CLICKHOUSE_DATABASE,
+        secure=(parsed_url.scheme == 'https')
+    )
+
+def render_summary_document(row: Dict) -> Document:
+    """요약 테이블의 한 행을 Document로 변환합니다."""
+    page_content = (
+        f"'{row.get('store_id')}' 매장의 '{row.get('period_start')}'부터 시작하는 "
+        f"'{row.get('period_type')}' 데이터 요약 보고서입니다.\n"
+        f" - 기본 실적: 총 판매액 {row.get('total_sales', 0)}원, 총 주문 수 {row.get('total_orders', 0)}건, "
+        f"평균 주문액 {row.get('avg_order_value', 0)}원, 순 방문자 {row.get('unique_visitors', 0)}명\n"
+        f" - 인기 메뉴 Top3: 1위 '{row.get('top_1_menu_id', '없음')}', 2위 '{row.get('top_2_menu_id', '없음')}', "
+        f"3위 '{row.get('top_3_menu_id', '없음')}'\n"
+        f" - 주요 고객 행동: 가장 많은 고객({row.get('top_1_path_users', 0)}명)이 이용한 경로 {row.get('top_1_path', '없음')}"
+    )
+    metadata = {key: str(value) for key, value in row.items()}
+    return Document(page_content=page_content, metadata=metadata)
+
+def iter_documents_from_fixture(path: str) -> Iterator[Document]:
+    """요약 테이블 행을 한 줄에 하나씩 담은 JSONL 파일에서 Document를 읽습니다. (테스트/벤치마크용)"""
+    logger.info("픽스처 파일에서 문서 로딩 시작", extra={"path": path})
+    total = 0
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                total += 1
+                yield render_summary_document(json.loads(line))
+    logger.info("픽스처 파일 문서 로딩 완료", extra={"records": total})
 
 # -----------------------------
 # ClickHouse 문서 로딩
 # -----------------------------
-def load_documents_from_clickhouse(limit: int = 1000) -> List[Document]:
+def iter_documents_from_clickhouse(page_size: int = config.CLICKHOUSE_PAGE_SIZE) -> Iterator[Document]:
     """
-    clickhouse-connect를 사용해 ClickHouse에서 문서를 로드합니다.
+    ClickHouse 요약 테이블 전체를 (period_start, store_id, period_type) keyset 페이지 단위로 읽으며
+    Document를 하나씩 반환합니다. 한 번에 한 페이지만 메모리에 올라갑니다.
+    조회 중 오류가 발생하면 예외를 그대로 전달하므로, 호출하는 쪽에서 읽기가 끝까지 완료되었는지 알 수 있습니다.
+    CLICKHOUSE_FIXTURE_PATH가 지정되어 있으면 ClickHouse 대신 픽스처 파일을 읽습니다.
     """
-    print(f"'{config.CLICKHOUSE_HOST}'의 ClickHouse('{config.CLICKHOUSE_TABLE}' 테이블)에서 문서 로딩 중...")
+    if config.CLICKHOUSE_FIXTURE_PATH:
+        yield from iter_documents_from_fixture(config.CLICKHOUSE_FIXTURE_PATH)
+        return
 
-    try:
-        parsed_url = urlparse(config.CLICKHOUSE_HOST)
-
-        client = clickhouse_connect.get_client(
-            host=parsed_url.hostname,
-            port=config.CLICKHOUSE_PORT or parsed_url.port,
-            username=config.CLICKHOUSE_USERNAME,
-            password=config.CLICKHOUSE_PASSWORD,
-            database=config.CLICKHOUSE_DATABASE,
-            secure=(parsed_url.scheme == 'https')
-        )
-        print("  - ✅ ClickHouse 클라이언트 생성 및 연결 성공!")
-
-        query = f"SELECT * FROM {config.CLICKHOUSE_TABLE} LIMIT {limit}"
-        print(f"  - 실행할 쿼리: {query}")
-
-        results = client.query(query).named_results()
-        documents = []
-        for row in results:
-            page_content = (
-                f"'{row.get('store_id')}' 매장의 '{row.get('period_start')}'부터 시작하는 "
-                f"'{row.get('period_type')}' 데이터 요약 보고서입니다.\n"
-                f" - 기본 실적: 총 판매액 {row.get('total_sales', 0)}원, 총 주문 수 {row.get('total_orders', 0)}건, "
-                f"평균 주문액 {row.get('avg_order_value', 0)}원, 순 방문자 {row.get('unique_visitors', 0)}명\n"
-                f" - 인기 메뉴 Top3: 1위 '{row.get('top_1_menu_id', '없음')}', 2위 '{row.get('top_2_menu_id', '없음')}', "
-                f"3위 '{row.get('top_3_menu_id', '없음')}'\n"
-                f" - 주요 고객 행동: 가장 많은 고객({row.get('top_1_path_users', 0)}명)이 이용한 경로 {row.get('top_1_path', '없음')}"
+    logger.info("ClickHouse 문서 로딩 시작", extra={"host": config.CLICKHOUSE_HOST, "table": config.CLICKHOUSE_TABLE})
+    client = get_clickhouse_client()
+
+    # 테이블에 실제로 있는 컬럼만 조회합니다.
+    table_columns = {row[0] for row in client.query(f"DESCRIBE TABLE {config.CLICKHOUSE_TABLE}").result_rows}
+    columns = [column for column in SUMMARY_COLUMNS if column in table_columns]
+    keyset = ", ".join(KEYSET_COLUMNS)
+    base_query = f"SELECT {', '.join(columns)} FROM {config.CLICKHOUSE_TABLE}"
+    logger.debug("실행할 쿼리", extra={"query": f"{base_query} ORDER BY {keyset}", "page_size": page_size})
+
+    last_key: Optional[tuple] = None
+    total = 0
+    while True:
+        if last_key is None:
+            query = f"{base_query} ORDER BY {keyset} LIMIT {page_size}"
+            parameters = None
+        else:
+            query = (
+                f"{base_query} WHERE ({keyset}) > (%(period_start)s, %(store_id)s, %(period_type)s) "
+                f"ORDER BY {keyset} LIMIT {page_size}"
             )
-            metadata = {key: str(value) for key, value in row.items()}
-            documents.append(Document(page_content=page_content, metadata=metadata))
+            parameters = dict(zip(KEYSET_COLUMNS, last_key))
+
+        with time_stage("load"):
+            rows = list(client.query(query, parameters=parameters).named_results())
+        for row in rows:
+            yield render_summary_document(row)
+        total += len(rows)
 
-        print(f"완료: 총 {len(documents)}개의 레코드를 로드했습니다.")
-        return documents
+        if len(rows) < page_size:
+            break
+        last_key = tuple(rows[-1][column] for column in KEYSET_COLUMNS)
 
+    logger.info("ClickHouse 문서 로딩 완료", extra={"records": total})
+
+def load_documents_from_clickhouse(limit: Optional[int] = None) -> List[Document]:
+    """
+    clickhouse-connect를 사용해 ClickHouse에서 문서를 로드합니다.
+    """
+    try:
+        return list(islice(iter_documents_from_clickhouse(), limit))
     except Exception as e:
-        print(f"오류: ClickHouse 연결 또는 데이터 처리 실패 - {e}")
+        logger.error("ClickHouse 연결 또는 데이터 처리 실패", extra={"error": str(e)})
         return []
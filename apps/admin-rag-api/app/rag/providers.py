@@ -0,0 +1,31 @@
+# app/rag/providers.py
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_google_genai import ChatGoogleGenerativeAI
+from rag_common.providers import FakeChatModel, FakeEmbeddings, GeminiEmbeddings
+
+from app import config
+
+
+def create_llm() -> BaseChatModel:
+    """LLM_PROVIDER 설정에 따라 Gemini 또는 로컬(fake) LLM을 생성합니다."""
+    if config.LLM_PROVIDER == "fake":
+        return FakeChatModel(latency_seconds=config.FAKE_LLM_LATENCY_MS / 1000)
+    return ChatGoogleGenerativeAI(model="gemini-1.5-flash-latest", temperature=0.3, convert_system_message_to_human=True)
+
+
+def create_embedding_provider() -> Embeddings:
+    """EMBEDDING_PROVIDER 설정에 따라 원격(google) 또는 로컬(fake) 임베딩 공급자를 생성합니다."""
+    if config.EMBEDDING_PROVIDER == "fake":
+        return FakeEmbeddings(
+            latency_seconds=config.FAKE_EMBEDDING_LATENCY_MS / 1000,
+            rate_limit_every=config.FAKE_EMBEDDING_RATE_LIMIT_EVERY,
+        )
+    return GeminiEmbeddings(model=config.EMBEDDING_MODEL)
+
+
+def embedding_model_name() -> str:
+    """임베딩 캐시 키에 사용할 모델 이름입니다. fake 공급자의 벡터가 실제 벡터와 섞이지 않도록 구분합니다."""
+    if config.EMBEDDING_PROVIDER == "fake":
+        return f"fake/{config.EMBEDDING_MODEL}"
+    return config.EMBEDDING_MODEL
@@ -0,0 +1,274 @@
+# app/rag/retriever.py
+import re
+from datetime import date, timedelta
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+import faiss
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from pydantic import ConfigDict
+
+from app.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 질문에 나오는 집계 주기 표현 -> summary_stats_by_period.period_type 값
+PERIOD_TYPE_KEYWORDS = {
+    "daily": ("일간", "일별", "일일", "daily"),
+    "weekly": ("주간", "주별", "weekly"),
+    "monthly": ("월간", "월별", "monthly"),
+    "yearly": ("연간", "년간", "연도별", "연별", "yearly", "annual"),
+}
+
+# "12번 매장", "매장 12", "store 12", "store123" 같은 매장 표현
+STORE_PATTERNS = [
+    re.compile(r"(\d+)\s*번\s*매장"),
+    re.compile(r"매장\s*(\d+)\s*번?"),
+    re.compile(r"store[\s_#-]*(\d+)", re.IGNORECASE),
+]
+
+# 메타데이터 인덱스로 관리하는 필드
+INDEXED_FIELDS = ("store_id", "period_type", "period_start")
+
+
+def _month_start(year: int, month: int) -> date:
+    # month가 범위를 벗어나면 연도를 넘깁니다. (예: 13월 -> 다음 해 1월)
+    year += (month - 1) // 12
+    month = (month - 1) % 12 + 1
+    return date(year, month, 1)
+
+
+def parse_time_range(question: str, today: Optional[date] = None) -> Optional[Tuple[date, date]]:
+    """질문의 시간 표현을 [시작일, 종료일) 범위로 바꿉니다. 인식하지 못하거나 없는 날짜이면 None을 반환합니다."""
+    try:
+        return _parse_time_range(question.lower(), today or date.today())
+    except ValueError:
+        # "2024-02-30"처럼 형식은 맞지만 존재하지 않는 날짜는 기간 조건 없이 검색합니다.
+        return None
+
+
+def _parse_time_range(text: str, today: date) -> Optional[Tuple[date, date]]:
+    match = re.search(r"(\d{4})[-./](\d{1,2})[-./](\d{1,2})", text)
+    if match:
+        day = date(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+        return day, day + timedelta(days=1)
+    match = re.search(r"(\d{4})[-./](\d{1,2})(?!\d)", text) or re.search(r"(\d{4})\s*년\s*(\d{1,2})\s*월", text)
+    if match:
+        month = int(match.group(2))
+        if not 1 <= month <= 12:
+            raise ValueError(f"month must be in 1..12: {month}")
+        start = _month_start(int(match.group(1)), month)
+        return start, _month_start(start.year, start.month + 1)
+    match = re.search(r"(\d{4})\s*년", text)
+    if match:
+        year = int(match.group(1))
+        return date(year, 1, 1), date(year + 1, 1, 1)
+
+    if any(word in text for word in ("오늘", "today")):
+        return today, today + timedelta(days=1)
+    if any(word in text for word in ("어제", "yesterday")):
+        return today - timedelta(days=1), today
+    week_start = today - timedelta(days=today.weekday())
+    if any(word in text for word in ("지난주", "지난 주", "저번 주", "저번주", "last week")):
+        return week_start - timedelta(days=7), week_start
+    if any(word in text for word in ("이번주", "이번 주", "this week")):
+        return week_start, week_start + timedelta(days=7)
+    month_start = today.replace(day=1)
+    if any(word in text for word in ("지난달", "지난 달", "저번 달", "저번달", "전월", "last month")):
+        return _month_start(today.year, today.month - 1), month_start
+    if any(word in text for word in ("이번달", "이번 달", "이달", "this month")):
+        return month_start, _month_start(today.year, today.month + 1)
+    if any(word in text for word in ("작년", "지난해", "전년", "last year")):
+        return date(today.year - 1, 1, 1), date(today.year, 1, 1)
+    if any(word in text for word in ("올해", "금년", "this year")):
+        return date(today.year, 1, 1), date(today.year + 1, 1, 1)
+    return None
+
+
+def parse_query_filters(
+    question: str,
+    known_store_ids: Iterable[str] = (),
+    today: Optional[date] = None,
+) -> Dict:
+    """
+    질문에서 매장/집계 주기/기간 조건을 규칙 기반으로 추출합니다. (LLM 호출 없음)
+
+    반환값 예: {"store_id": {"store12"}, "period_type": "weekly", "period_range": (date(2024, 5, 1), date(2024, 6, 1))}
+    """
+    text = question.lower()
+    filters: Dict = {}
+
+    # 인덱스에 있는 매장 ID가 그대로 나오거나, 번호로 언급된 경우 ("12번 매장" -> "12" 또는 "store12")
+    # ID는 앞뒤가 영숫자가 아닐 때만 인정합니다. ("store12"에서 "store1"을 찾지 않도록)
+    known = {store_id.lower(): store_id for store_id in known_store_ids}
+    store_ids: Set[str] = {
+        original for lowered, original in known.items()
+        if lowered and re.search(rf"(?<![0-9a-z]){re.escape(lowered)}(?![0-9a-z])", text)
+    }
+    for pattern in STORE_PATTERNS:
+        for number in pattern.findall(question):
+            for candidate in (number, f"store{number}"):
+                if candidate in known:
+                    store_ids.add(known[candidate])
+    if store_ids:
+        filters["store_id"] = store_ids
+
+    for period_type, keywords in PERIOD_TYPE_KEYWORDS.items():
+        if any(keyword in text for keyword in keywords):
+            filters["period_type"] = period_type
+            break
+
+    period_range = parse_time_range(question, today)
+    if period_range:
+        filters["period_range"] = period_range
+    return filters
+
+
+def freeze_filters(filters: Dict) -> Tuple:
+    """parse_query_filters 결과를 비교/해시할 수 있는 튜플로 바꿉니다. (답변 캐시의 범위 키로 사용)"""
+    return tuple(sorted(
+        (field, tuple(sorted(value)) if isinstance(value, set) else value)
+        for field, value in filters.items()
+    ))
+
+
+class SummaryMetadataIndex:
+    """FAISS 인덱스 위치별 메타데이터(store_id/period_type/period_start)를 필드 -> 값 -> 위치 집합으로 색인합니다."""
+
+    def __init__(self, vector_store: FAISS):
+        self.positions: Dict[str, Dict[str, Set[int]]] = {field: {} for field in INDEXED_FIELDS}
+        # 문서 저장소가 메타데이터만 한 번에 읽을 수 있으면(SqliteDocstore) 본문은 읽지 않습니다.
+        metadata_by_id = getattr(vector_store.docstore, "metadata_by_id", None)
+        if metadata_by_id is not None:
+            all_metadata = metadata_by_id()
+        else:
+            all_metadata = {}
+            for docstore_id in vector_store.index_to_docstore_id.values():
+                document = vector_store.docstore.search(docstore_id)
+                if isinstance(document, Document):
+                    all_metadata[docstore_id] = document.metadata
+        for position, docstore_id in vector_store.index_to_docstore_id.items():
+            metadata = all_metadata.get(docstore_id)
+            if metadata is None:
+                continue
+            for field in INDEXED_FIELDS:
+                value = str(metadata.get(field, ""))
+                if field == "period_start":
+                    value = value[:10]  # Date/DateTime 어느 쪽이든 날짜 부분만 비교합니다.
+                self.positions[field].setdefault(value, set()).add(position)
+
+    def values(self, field: str) -> List[str]:
+        return list(self.positions[field])
+
+    def select(self, filters: Dict) -> Optional[Set[int]]:
+        """조건을 모두 만족하는 인덱스 위치 집합을 반환합니다. 조건이 없으면 None입니다."""
+        candidates: Optional[Set[int]] = None
+
+        def narrow(positions: Set[int]) -> None:
+            nonlocal candidates
+            candidates = positions if candidates is None else candidates & positions
+
+        if "store_id" in filters:
+            narrow(set().union(*(self.positions["store_id"].get(s, set()) for s in filters["store_id"])))
+        if "period_type" in filters:
+            narrow(self.positions["period_type"].get(filters["period_type"], set()))
+        if "period_range" in filters:
+            start, end = (d.isoformat() for d in filters["period_range"])
+            narrow(set().union(*(
+                positions for period_start, positions in self.positions["period_start"].items()
+                if start <= period_start < end
+            )))
+        return candidates
+
+
+class MetadataFilteredRetriever(BaseRetriever):
+    """
+    질문에서 추출한 매장/주기/기간 조건으로 후보 문서를 먼저 좁힌 뒤 그 안에서만 벡터 검색을 합니다.
+
+    - 조건을 만족하는 문서가 k개 이하이면 질문을 임베딩하지 않고 그대로 반환합니다.
+    - 조건이 없거나, 조건에 맞는 문서가 하나도 없으면 전체 대상 유사도 검색으로 돌아갑니다.
+    """
+
+    vector_store: FAISS
+    metadata_index: SummaryMetadataIndex
+    k: int = 4
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        filters = parse_query_filters(query, known_store_ids=self.metadata_index.values("store_id"))
+        candidates = self.metadata_index.select(filters)
+        if not candidates and filters:
+            logger.info("조건에 맞는 문서가 없어 전체 검색을 수행합니다.", extra={"filters": filters})
+        if candidates and len(candidates) <= self.k:
+            return self._documents_at(sorted(candidates))
+
+        # FAISS.similarity_search는 문서 저장소에 없는 청크를 만나면 예외를 던지므로 같은 검색을 직접 수행합니다.
+        vectors = np.array([self.vector_store._embed_query(query)], dtype=np.float32)
+        return self._search(vectors, candidates)[0]
+
+    def query_scope(self, query: str) -> Tuple:
+        """질문에서 추출한 매장/주기/기간 조건입니다. 조건이 같은 질문끼리만 같은 문서 범위를 검색합니다."""
+        return freeze_filters(parse_query_filters(query, known_store_ids=self.metadata_index.values("store_id")))
+
+    def retrieve_batch(self, queries: List[str]) -> List[List[Document]]:
+        """
+        여러 질문의 문서를 한 번에 검색합니다.
+        임베딩이 필요한 질문들은 한 번의 배치 요청으로 임베딩하고, 후보 집합(조건 없음 포함)이 같은 질문끼리
+        묶어 FAISS 행렬 검색 한 번으로 처리합니다.
+        """
+        known_store_ids = self.metadata_index.values("store_id")
+        results: List[Optional[List[Document]]] = [None] * len(queries)
+        groups: Dict[Optional[FrozenSet[int]], List[int]] = {}
+        for i, query in enumerate(queries):
+            candidates = self.metadata_index.select(parse_query_filters(query, known_store_ids=known_store_ids))
+            if candidates and len(candidates) <= self.k:
+                results[i] = self._documents_at(sorted(candidates))
+            else:
+                groups.setdefault(frozenset(candidates) if candidates else None, []).append(i)
+
+        pending = [i for indices in groups.values() for i in indices]
+        if pending:
+            embeddings = self.vector_store.embedding_function
+            embed_queries = getattr(embeddings, "embed_queries", None)
+            pending_queries = [queries[i] for i in pending]
+            if embed_queries is not None:
+                vectors = embed_queries(pending_queries)
+            else:
+                vectors = [self.vector_store._embed_query(query) for query in pending_queries]
+            matrix = dict(zip(pending, np.array(vectors, dtype=np.float32)))
+
+            for candidates, indices in groups.items():
+                found = self._search(np.stack([matrix[i] for i in indices]), candidates)
+                for i, documents in zip(indices, found):
+                    results[i] = documents
+        return results
+
+    def _search(self, vectors: np.ndarray, candidates: Optional[Set[int]]) -> List[List[Document]]:
+        """질문 벡터 행렬을 한 번에 검색합니다. candidates가 있으면 해당 위치의 문서만 대상으로 합니다."""
+        if self.vector_store._normalize_L2:
+            faiss.normalize_L2(vectors)
+        params = None
+        if candidates:
+            selector = faiss.IDSelectorBatch(np.fromiter(candidates, dtype=np.int64, count=len(candidates)))
+            params = faiss.SearchParameters(sel=selector)
+        _, indices = self.vector_store.index.search(vectors, self.k, params=params)
+        return [self._documents_at(int(position) for position in row if position != -1) for row in indices]
+
+    def _documents_at(self, positions: Iterable[int]) -> List[Document]:
+        """
+        인덱스 위치의 문서들을 읽습니다. 이전 버전 인덱스를 읽는 워커는 이미 저장소에서 지워진 청크를 가리킬 수 있으므로,
+        문서 대신 "ID ... not found." 문자열이 돌아온 위치는 건너뜁니다.
+        """
+        documents = []
+        for position in positions:
+            docstore_id = self.vector_store.index_to_docstore_id[position]
+            document = self.vector_store.docstore.search(docstore_id)
+            if isinstance(document, Document):
+                documents.append(document)
+            else:
+                logger.warning("문서 저장소에 없는 청크를 건너뜁니다.", extra={"docstore_id": docstore_id})
+        return documents
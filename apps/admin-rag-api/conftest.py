@@ -0,0 +1,16 @@
+# conftest.py
+import os
+
+# app.config는 필수 설정이 없으면 import 시점에 실패하므로, 단위 테스트용 더미 값을 채웁니다.
+for name, value in {
+    "GEMINI_API_KEY": "test",
+    "MONGO_URI": "mongodb://localhost:27017",
+    "CLICKHOUSE_HOST": "http://localhost:8123",
+    "CLICKHOUSE_USERNAME": "test",
+    "CLICKHOUSE_PASSWORD": "test",
+    "CLICKHOUSE_DATABASE": "test",
+    "CLICKHOUSE_TABLE": "summary_stats_by_period",
+    "EMBEDDING_PROVIDER": "fake",
+    "LLM_PROVIDER": "fake",
+}.items():
+    os.environ.setdefault(name, value)
@@ -0,0 +1,60 @@
+# tests/test_answer_cache.py
+import asyncio
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+from app.rag.answer_cache import AnswerCache
+from app.rag.retriever import freeze_filters, parse_query_filters
+
+STORE_IDS = ["store3", "store4"]
+
+
+class ConstantEmbeddings(Embeddings):
+    """모든 질문을 같은 벡터로 임베딩합니다. (유사도가 항상 1이 되는 최악의 경우)"""
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return [1.0, 0.0, 0.0]
+
+
+def scope_of(question: str):
+    return freeze_filters(parse_query_filters(question, STORE_IDS))
+
+
+def test_semantic_hit_requires_same_scope():
+    async def scenario():
+        cache = AnswerCache(ConstantEmbeddings(), max_entries=10)
+        question = "store3 지난달 매출"
+        await cache.store(question, "v1", {"answer": "store3"}, 1.0, scope_of(question))
+
+        other_store = "store4 지난달 매출"
+        assert await cache.lookup(other_store, "v1", scope_of(other_store)) is None
+        same_scope = "지난달 store3 매출은 얼마야"
+        assert await cache.lookup(same_scope, "v1", scope_of(same_scope)) == {"answer": "store3"}
+        return cache.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["semantic_hits"] == 1
+    assert stats["misses"] == 1
+
+
+def test_exact_hit_requires_same_scope():
+    async def scenario():
+        cache = AnswerCache(ConstantEmbeddings(), max_entries=10, semantic=False)
+        await cache.store("지난달 매출", "v1", {"answer": "april"}, 1.0, scope="april")
+        assert await cache.lookup("지난달 매출", "v1", scope="april") == {"answer": "april"}
+        assert await cache.lookup("지난달 매출", "v1", scope="may") is None
+
+    asyncio.run(scenario())
+
+
+def test_index_version_change_invalidates():
+    async def scenario():
+        cache = AnswerCache(ConstantEmbeddings(), max_entries=10)
+        await cache.store("매출", "v1", {"answer": "old"}, 1.0)
+        assert await cache.lookup("매출", "v2") is None
+
+    asyncio.run(scenario())
@@ -0,0 +1,57 @@
+# tests/test_chain_manager.py
+import asyncio
+from types import SimpleNamespace
+
+from app.rag.chain_manager import RagChainManager
+
+
+def fake_chain(version: str):
+    return SimpleNamespace(metadata={"index_version": version})
+
+
+def test_ready_from_saved_index_before_sync():
+    calls = []
+
+    def build(sync: bool):
+        calls.append(sync)
+        return fake_chain("2" if sync else "1")
+
+    async def scenario():
+        manager = RagChainManager(build, refresh_interval=0, retry_seconds=0)
+        assert await manager.rebuild(sync=False)
+        assert manager.ready and manager.index_version == "1" and manager.synced_at is None
+        await manager.run()
+        return manager
+
+    manager = asyncio.run(scenario())
+    assert manager.index_version == "2"
+    assert manager.synced_at is not None
+    assert calls == [False, False, True]
+
+
+def test_sync_build_when_no_saved_index():
+    attempts = {"sync": 0}
+
+    def build(sync: bool):
+        if not sync:
+            return None
+        attempts["sync"] += 1
+        return fake_chain("1") if attempts["sync"] == 2 else None
+
+    manager = RagChainManager(build, refresh_interval=0, retry_seconds=0)
+    asyncio.run(manager.run())
+    assert manager.index_version == "1"
+    stats = manager.stats()
+    assert stats["failures"] == 1 and stats["builds"] == 1
+
+
+def test_failed_sync_keeps_saved_index_chain():
+    def build(sync: bool):
+        if sync:
+            raise RuntimeError("clickhouse down")
+        return fake_chain("1")
+
+    manager = RagChainManager(build, refresh_interval=0, retry_seconds=0)
+    asyncio.run(manager.run())
+    assert manager.ready and manager.index_version == "1"
+    assert manager.last_error == "clickhouse down"
@@ -0,0 +1,103 @@
+# tests/test_embedding_pipeline.py
+import threading
+import time
+
+import pytest
+from rag_common.providers import FakeEmbeddings
+
+from app.rag.embedding_pipeline import EmbeddingPipeline, TokenBucket, is_rate_limit_error
+
+
+class InFlightEmbeddings(FakeEmbeddings):
+    """동시에 실행 중인 호출 수의 최댓값을 기록하는 fake 공급자입니다."""
+
+    def __init__(self, **kwargs):
+        super().__init__(size=8, **kwargs)
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._in_flight_lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        with self._in_flight_lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            return super().embed_documents(texts)
+        finally:
+            with self._in_flight_lock:
+                self.in_flight -= 1
+
+
+class FailingEmbeddings(FakeEmbeddings):
+    def __init__(self):
+        super().__init__(size=8)
+        self.calls = 0
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        raise ValueError("invalid argument")
+
+
+def make_pipeline(provider, **kwargs):
+    options = {"batch_size": 3, "max_concurrency": 2, "requests_per_minute": 60_000, "base_backoff_seconds": 0.001}
+    options.update(kwargs)
+    return EmbeddingPipeline(provider, **options)
+
+
+def test_preserves_order_across_batches():
+    provider = FakeEmbeddings(size=8)
+    texts = [f"text {i}" for i in range(10)]
+    vectors = make_pipeline(provider).embed_documents(texts)
+    assert vectors == [provider._vector(text) for text in texts]
+
+
+def test_caps_concurrent_calls():
+    provider = InFlightEmbeddings(latency_seconds=0.02)
+    pipeline = make_pipeline(provider, batch_size=1, max_concurrency=3)
+    pipeline.embed_documents([f"text {i}" for i in range(12)])
+    assert 1 < provider.max_in_flight <= 3
+    assert pipeline.stats()["requests"] == 12
+
+
+def test_retries_rate_limit_errors():
+    # 두 번째 호출마다 429가 발생하므로 4개 배치 중 일부는 재시도 후 성공해야 합니다.
+    provider = FakeEmbeddings(size=8, rate_limit_every=2)
+    pipeline = make_pipeline(provider, batch_size=1, max_concurrency=1)
+    texts = [f"text {i}" for i in range(4)]
+    assert pipeline.embed_documents(texts) == [provider._vector(text) for text in texts]
+    stats = pipeline.stats()
+    assert stats["retries"] == stats["rate_limited"] > 0
+    assert stats["requests"] == len(texts) + stats["retries"]
+
+
+def test_gives_up_after_max_retries():
+    pipeline = make_pipeline(FakeEmbeddings(size=8, rate_limit_every=1), max_retries=2)
+    with pytest.raises(Exception) as excinfo:
+        pipeline.embed_documents(["text"])
+    assert is_rate_limit_error(excinfo.value)
+    assert pipeline.stats()["requests"] == 3
+
+
+def test_does_not_retry_other_errors():
+    provider = FailingEmbeddings()
+    pipeline = make_pipeline(provider)
+    with pytest.raises(ValueError):
+        pipeline.embed_documents(["text"])
+    assert provider.calls == 1
+    assert pipeline.stats()["retries"] == 0
+
+
+def test_token_bucket_paces_calls_beyond_burst():
+    # 초당 20개, 버스트 1개: 첫 호출은 바로, 이후 4번은 각각 약 50ms씩 기다려야 합니다.
+    bucket = TokenBucket(rate=20, capacity=1)
+    started_at = time.monotonic()
+    for _ in range(5):
+        bucket.acquire()
+    assert time.monotonic() - started_at >= 0.18
+
+
+def test_pipeline_respects_requests_per_minute():
+    pipeline = make_pipeline(FakeEmbeddings(size=8), batch_size=1, max_concurrency=1, requests_per_minute=1200)
+    started_at = time.monotonic()
+    pipeline.embed_documents([f"text {i}" for i in range(5)])
+    assert time.monotonic() - started_at >= 0.18
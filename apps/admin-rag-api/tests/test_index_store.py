@@ -0,0 +1,94 @@
+# tests/test_index_store.py
+import sqlite3
+
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from app.rag.context import CompactContextRetriever, assemble_context
+from app.rag.index_store import SummaryIndexStore
+from app.rag.retriever import MetadataFilteredRetriever, SummaryMetadataIndex
+
+
+def make_document(store_id, period_start, total_sales):
+    metadata = {"store_id": store_id, "period_type": "daily", "period_start": period_start}
+    return Document(page_content=f"{store_id} {period_start} 매출 {total_sales}", metadata=metadata)
+
+
+@pytest.fixture
+def make_store(tmp_path):
+    def factory():
+        return SummaryIndexStore(
+            str(tmp_path), DeterministicFakeEmbedding(size=16), RecursiveCharacterTextSplitter(chunk_size=1000)
+        )
+    return factory
+
+
+def stored_chunks(store):
+    connection = sqlite3.connect(store.docstore_path)
+    try:
+        return dict(connection.execute("SELECT chunk_id, removed_version FROM chunks").fetchall())
+    finally:
+        connection.close()
+
+
+def test_sync_then_load_reads_documents_from_sqlite(make_store):
+    documents = [make_document("store1", "2024-05-01", 100), make_document("store2", "2024-05-01", 200)]
+    make_store().sync(iter(documents))
+
+    store = make_store()
+    vector_store = store.load(read_only=True)
+    assert store.version == "1"
+    assert vector_store.index.ntotal == 2
+    assert "store2 2024-05-01 매출 200" in [doc.page_content for doc in vector_store.similarity_search("store2", k=2)]
+    assert SummaryMetadataIndex(vector_store).select({"store_id": {"store1"}}) == {0}
+
+
+def test_sync_writes_only_changed_rows(make_store):
+    make_store().sync(iter([make_document("store1", "2024-05-01", 100), make_document("store2", "2024-05-01", 200)]))
+
+    store = make_store()
+    vector_store = store.sync(iter([make_document("store1", "2024-05-01", 150)]))
+    assert store.version == "2"
+    assert vector_store.index.ntotal == 1
+    assert vector_store.docstore.search(vector_store.index_to_docstore_id[0]).page_content.endswith("150")
+    # 이전 버전을 읽는 워커를 위해 빠진 청크는 한 버전 더 남겨 둡니다.
+    assert stored_chunks(store) == {"store1|daily|2024-05-01#0": None, "store2|daily|2024-05-01#0": 2}
+
+    store = make_store()
+    store.sync(iter([make_document("store1", "2024-05-01", 150), make_document("store3", "2024-05-01", 300)]))
+    assert stored_chunks(store) == {"store1|daily|2024-05-01#0": None, "store3|daily|2024-05-01#0": None}
+
+
+def test_sync_without_changes_keeps_version(make_store):
+    documents = [make_document("store1", "2024-05-01", 100)]
+    make_store().sync(iter(documents))
+
+    store = make_store()
+    store.sync(iter(documents))
+    assert store.version == "1"
+
+
+def test_old_reader_skips_chunks_deleted_from_sqlite(make_store):
+    make_store().sync(iter([make_document("store1", "2024-05-01", 100), make_document("store2", "2024-05-01", 200)]))
+    reader = make_store().load(read_only=True)
+    retriever = MetadataFilteredRetriever(vector_store=reader, metadata_index=SummaryMetadataIndex(reader), k=4)
+    compact = CompactContextRetriever(retriever=retriever, token_budget=1000)
+
+    # store2가 빠진 버전 2, 3이 저장되면 버전 1을 읽고 있는 워커의 store2 청크는 SQLite에서 지워집니다.
+    make_store().sync(iter([make_document("store1", "2024-05-01", 100)]))
+    make_store().sync(iter([make_document("store1", "2024-05-01", 100), make_document("store3", "2024-05-01", 300)]))
+    assert "store2|daily|2024-05-01#0" not in stored_chunks(make_store())
+
+    assert retriever.invoke("store2 매출") == []
+    assert [doc.metadata["store_id"] for doc in retriever.invoke("매출")] == ["store1"]
+    assert [[doc.metadata["store_id"] for doc in docs] for docs in compact.retrieve_batch(["store2 매출", "매출"])] == [
+        [], ["store1"],
+    ]
+
+
+def test_assemble_context_skips_missing_documents():
+    document = make_document("store1", "2024-05-01", 100)
+    assembled = assemble_context(["ID store2|daily|2024-05-01#0 not found.", document], token_budget=1000)
+    assert [doc.metadata["store_id"] for doc in assembled] == ["store1"]
@@ -0,0 +1,96 @@
+# tests/test_retriever.py
+from datetime import date
+
+import pytest
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from app.rag.retriever import SummaryMetadataIndex, parse_query_filters, parse_time_range
+
+TODAY = date(2024, 5, 15)  # 수요일
+STORE_IDS = [f"store{i}" for i in range(1, 21)]
+
+
+@pytest.mark.parametrize("question, expected", [
+    ("2024-03-05 매출", (date(2024, 3, 5), date(2024, 3, 6))),
+    ("2024-02 매출", (date(2024, 2, 1), date(2024, 3, 1))),
+    ("2024년 12월 매출", (date(2024, 12, 1), date(2025, 1, 1))),
+    ("2023년 매출", (date(2023, 1, 1), date(2024, 1, 1))),
+    ("오늘 매출", (date(2024, 5, 15), date(2024, 5, 16))),
+    ("어제 매출", (date(2024, 5, 14), date(2024, 5, 15))),
+    ("지난주 매출", (date(2024, 5, 6), date(2024, 5, 13))),
+    ("이번 주 매출", (date(2024, 5, 13), date(2024, 5, 20))),
+    ("지난달 매출", (date(2024, 4, 1), date(2024, 5, 1))),
+    ("이번달 매출", (date(2024, 5, 1), date(2024, 6, 1))),
+    ("작년 매출", (date(2023, 1, 1), date(2024, 1, 1))),
+    ("올해 매출", (date(2024, 1, 1), date(2025, 1, 1))),
+    ("매출이 가장 높은 매장은?", None),
+])
+def test_parse_time_range(question, expected):
+    assert parse_time_range(question, TODAY) == expected
+
+
+def test_parse_time_range_last_month_in_january():
+    assert parse_time_range("지난달 매출", date(2024, 1, 10)) == (date(2023, 12, 1), date(2024, 1, 1))
+
+
+@pytest.mark.parametrize("question", ["2024-02-30 store3 매출", "2024년 13월 매출", "2024-00 매출", "2024-13 매출"])
+def test_parse_time_range_rejects_invalid_dates(question):
+    assert parse_time_range(question, TODAY) is None
+
+
+def test_parse_query_filters_matches_store_ids_on_token_boundaries():
+    assert parse_query_filters("store12 지난달 매출", STORE_IDS, TODAY)["store_id"] == {"store12"}
+    assert parse_query_filters("store1, store2 비교", STORE_IDS, TODAY)["store_id"] == {"store1", "store2"}
+    assert "store_id" not in parse_query_filters("store123 매출", STORE_IDS, TODAY)
+
+
+def test_parse_query_filters_store_number_patterns():
+    assert parse_query_filters("12번 매장 매출", STORE_IDS, TODAY)["store_id"] == {"store12"}
+    assert parse_query_filters("매장 3 매출", STORE_IDS, TODAY)["store_id"] == {"store3"}
+
+
+def test_parse_query_filters_combines_conditions():
+    filters = parse_query_filters("store3 지난달 주간 매출", STORE_IDS, TODAY)
+    assert filters == {
+        "store_id": {"store3"},
+        "period_type": "weekly",
+        "period_range": (date(2024, 4, 1), date(2024, 5, 1)),
+    }
+
+
+def test_parse_query_filters_invalid_date_drops_only_the_range():
+    assert parse_query_filters("2024-02-30 store3 매출", STORE_IDS, TODAY) == {"store_id": {"store3"}}
+
+
+def test_parse_query_filters_without_conditions():
+    assert parse_query_filters("가장 인기 있는 메뉴는?", STORE_IDS, TODAY) == {}
+
+
+@pytest.fixture
+def metadata_index():
+    rows = [
+        ("store1", "daily", "2024-04-01"),
+        ("store1", "daily", "2024-05-02"),
+        ("store1", "monthly", "2024-04-01 00:00:00"),
+        ("store2", "daily", "2024-04-15"),
+        ("store12", "weekly", "2024-04-08"),
+    ]
+    documents = [
+        Document(page_content=f"{store} {period_type} {start}",
+                 metadata={"store_id": store, "period_type": period_type, "period_start": start})
+        for store, period_type, start in rows
+    ]
+    return SummaryMetadataIndex(FAISS.from_documents(documents, DeterministicFakeEmbedding(size=8)))
+
+
+def test_metadata_index_select(metadata_index):
+    assert metadata_index.select({}) is None
+    assert metadata_index.select({"store_id": {"store1"}}) == {0, 1, 2}
+    assert metadata_index.select({"store_id": {"store1", "store2"}, "period_type": "daily"}) == {0, 1, 3}
+    april = (date(2024, 4, 1), date(2024, 5, 1))
+    assert metadata_index.select({"period_range": april}) == {0, 2, 3, 4}
+    assert metadata_index.select({"store_id": {"store1"}, "period_type": "monthly", "period_range": april}) == {2}
+    assert metadata_index.select({"store_id": {"store2"}, "period_type": "weekly"}) == set()
+    assert metadata_index.select({"store_id": {"store99"}}) == set()
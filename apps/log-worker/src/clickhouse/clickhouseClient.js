@@ -229,6 +229,52 @@ const tableSchemas = [
       ORDER BY (period_start, store_id); -- 이 키가 고유 식별자이므로 유지
     `,
   },
+  // --- Spark 집계 작업(spark-scripts/aggregate_summary_stats.py) 결과 테이블 ---
+  {
+    tableName: "summary_stats_by_period",
+    query: `
+      CREATE TABLE IF NOT EXISTS summary_stats_by_period (
+        period_type String, period_start Date, store_id String,
+        total_sales Float64, total_orders UInt64, avg_order_value Float64,
+        unique_visitors UInt64,
+
+        -- 집계된 시간 (재실행 시 같은 기간/매장 행은 최신 행으로 대체됨)
+        created_at DateTime
+      ) ENGINE = ReplacingMergeTree(created_at)
+      -- Spark 작업이 (period_type, 월) 단위로 REPLACE PARTITION 함 (일별 행도 월 단위로 묶어 파티션 수를 제한)
+      -- staging/백업 테이블은 CREATE TABLE ... AS summary_stats_by_period로 만들므로 파티션 키를 바꿔도 함께 따라감
+      PARTITION BY (period_type, toYYYYMM(period_start))
+      ORDER BY (period_start, store_id);
+    `,
+  },
+  {
+    tableName: "summary_stats_daily_base",
+    query: `
+      CREATE TABLE IF NOT EXISTS summary_stats_daily_base (
+        -- 매장/일 단위 기본 집계. 주/월/연 요약은 orders 대신 이 테이블에서 롤업됨
+        store_id String, day Date,
+        total_sales Float64, total_orders UInt64,
+        -- 순 방문자 HyperLogLog 스케치 (Spark hll_sketch_agg 결과를 base64로 저장, 기간별로 병합 가능)
+        visitor_sketch String,
+        created_at DateTime
+      ) ENGINE = ReplacingMergeTree(created_at)
+      -- Spark 작업이 새 주문이 들어온 날이 속한 월 단위로 REPLACE PARTITION 함
+      PARTITION BY toYYYYMM(day)
+      ORDER BY (day, store_id);
+    `,
+  },
+  {
+    tableName: "summary_stats_watermark",
+    query: `
+      CREATE TABLE IF NOT EXISTS summary_stats_watermark (
+        -- 집계 주기별(일 단위 기본 집계는 'daily_base')로 마지막으로 반영된 주문의 ordered_at (incremental 모드)
+        period_type String,
+        high_water_mark DateTime,
+        updated_at DateTime
+      ) ENGINE = ReplacingMergeTree(updated_at)
+      ORDER BY period_type;
+    `,
+  },
 ];
 
 /**
@@ -1,30 +1,63 @@
 # app/agent/chain.py
+import asyncio
+from datetime import datetime
+from typing import Dict, List, Optional
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from langchain_community.vectorstores import FAISS
-from langchain_google_genai import ChatGoogleGenerativeAI
+from langchain_core.documents import Document
+from langchain_core.language_models import BaseChatModel
 from langchain.chains import RetrievalQA
 from langchain.prompts import PromptTemplate
-from app.agent.loader import load_documents_for_user # 새로운 로더를 import
+from app import config
+from app.agent.loader import (  # 새로운 로더를 import
+    find_user_context,
+    find_user_contexts,
+    get_latest_order_time,
+    get_latest_order_times,
+    load_documents_for_user,
+    load_documents_for_users,
+)
+from rag_common.embedding_cache import CachedEmbeddings
+from app.agent.chain_cache import UserChainCache
+from app.agent.retriever import StaticContextRetriever
+from app.agent.providers import create_embedding_provider, create_llm, embedding_model_name
+from app.logger import get_logger
+from rag_common.metrics import time_stage
+from rag_common.tokens import estimate_tokens
 
-def create_user_rag_chain(user_id: str):
-    """특정 사용자의 데이터를 기반으로 RAG 체인을 동적으로 생성합니다."""
-    documents = load_documents_for_user(user_id)
-    if not documents:
-        return None
+logger = get_logger(__name__)
 
-    # 이 경우에는 문서가 하나뿐이므로 TextSplitter가 큰 의미는 없지만,
-    # 만약 사용자 정보가 매우 길어질 경우를 대비해 유지합니다.
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
-    docs = text_splitter.split_documents(documents)
-    if not docs:
-        return None
+_embeddings = None
+
+def get_embeddings() -> CachedEmbeddings:
+    """캐시가 적용된 임베딩 객체를 반환합니다. 프로세스 전체에서 하나만 생성합니다."""
+    global _embeddings
+    if _embeddings is None:
+        _embeddings = CachedEmbeddings(
+            create_embedding_provider(),
+            model_name=embedding_model_name(),
+            db_path=config.EMBEDDING_CACHE_PATH,
+            max_entries=config.EMBEDDING_CACHE_MAX_ENTRIES,
+            lru_size=config.EMBEDDING_CACHE_LRU_SIZE,
+        )
+    return _embeddings
+
+_llm = None
+
+def get_llm() -> BaseChatModel:
+    """LLM 클라이언트를 반환합니다. 요청마다 새로 만들지 않도록 프로세스 전체에서 하나만 생성합니다."""
+    global _llm
+    if _llm is None:
+        _llm = create_llm()
+    return _llm
 
-    embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
-    vector_store = FAISS.from_documents(docs, embeddings)
-    retriever = vector_store.as_retriever()
+# 사용자별 리트리버 상태를 보관하는 캐시 (같은 사용자의 연속 질문은 바로 답변 생성 단계로 넘어갑니다)
+user_chain_cache = UserChainCache(
+    max_bytes=config.USER_CHAIN_CACHE_MAX_BYTES,
+    ttl_seconds=config.USER_CHAIN_CACHE_TTL_SECONDS,
+)
 
-    prompt_template = """
+prompt_template = """
     당신은 사용자 데이터 분석 전문가입니다. 주어진 사용자 정보를 바탕으로 질문에 대해 친절하고 상세하게 답변해주세요.
     정보에 없는 내용은 추측하지 말고 "데이터에서 관련 정보를 찾을 수 없습니다."라고 답변하세요.
 
@@ -36,14 +69,103 @@ def create_user_rag_chain(user_id: str):
 
     [답변]
     """
-    prompt = PromptTemplate(template=prompt_template, input_variables=["context", "question"])
-    llm = ChatGoogleGenerativeAI(model="gemini-1.5-flash-latest", temperature=0.1)
-    
+prompt = PromptTemplate(template=prompt_template, input_variables=["context", "question"])
+
+def _estimate_footprint(docs, vector_store) -> int:
+    """캐시 항목의 메모리 사용량을 문서 텍스트와 벡터 크기로 추정합니다."""
+    text_bytes = sum(len(doc.page_content.encode("utf-8")) for doc in docs)
+    vector_bytes = vector_store.index.ntotal * vector_store.index.d * 4
+    return text_bytes + vector_bytes
+
+async def create_user_rag_chain(user_id: str):
+    """
+    특정 사용자의 데이터를 기반으로 RAG 체인을 동적으로 생성합니다.
+    사용자의 최근 주문 시각이 바뀌지 않았다면 캐시된 체인을 재사용합니다.
+
+    캐시에 항목이 있는 사용자는 최근 주문 시각만 조회(order.email+ordered_at 인덱스 조회 한 번)해 버전을 확인합니다.
+    캐시에 없는 사용자는 user_context도 필요하므로 최근 주문 시각과 동시에 조회해 한 번의 왕복으로 끝냅니다.
+    """
+    cached = user_chain_cache.contains(user_id)
+    if cached:
+        version, context = await get_latest_order_time(user_id), None
+    else:
+        version, context = await asyncio.gather(get_latest_order_time(user_id), find_user_context(user_id))
+    cached_chain = user_chain_cache.get(user_id, version)
+    if cached_chain is not None:
+        return cached_chain
+
+    if cached:
+        # 새 주문으로 캐시 항목이 무효화된 경우에만 user_context를 이어서 조회합니다.
+        context = await find_user_context(user_id)
+    documents = await load_documents_for_user(user_id, version, context)
+    if not documents:
+        return None
+    return await _build_user_chain(user_id, documents, version)
+
+async def create_user_rag_chains(user_ids: List[str]) -> Dict[str, RetrievalQA]:
+    """
+    여러 사용자의 RAG 체인을 한 번에 준비합니다. 캐시 버전 확인과 사용자 데이터 조회는
+    각각 $in 조건 쿼리 한 번으로 처리하고, 캐시에 없는 사용자의 user_context는 버전 확인과 동시에 조회합니다.
+    데이터가 없는 사용자는 결과에 포함되지 않습니다.
+    """
+    uncached = [user_id for user_id in user_ids if not user_chain_cache.contains(user_id)]
+    versions, contexts = await asyncio.gather(get_latest_order_times(user_ids), find_user_contexts(uncached))
+    chains: Dict[str, RetrievalQA] = {}
+    missing = []
+    for user_id in user_ids:
+        cached_chain = user_chain_cache.get(user_id, versions.get(user_id))
+        if cached_chain is not None:
+            chains[user_id] = cached_chain
+        else:
+            missing.append(user_id)
+    if not missing:
+        return chains
+
+    # 새 주문으로 캐시 항목이 무효화된 사용자의 user_context만 이어서 조회합니다.
+    prefetched = set(uncached)
+    contexts.update(await find_user_contexts([user_id for user_id in missing if user_id not in prefetched]))
+    documents = await load_documents_for_users(missing, versions, contexts)
+    found = [user_id for user_id in missing if user_id in documents]
+    built = await asyncio.gather(*(
+        _build_user_chain(user_id, documents[user_id], versions.get(user_id)) for user_id in found
+    ))
+    chains.update({user_id: chain for user_id, chain in zip(found, built) if chain is not None})
+    return chains
+
+async def _build_user_chain(user_id: str, documents: List[Document], version: Optional[datetime]) -> Optional[RetrievalQA]:
+    """사용자 문서로 RAG 체인을 만들고 체인 캐시에 넣습니다."""
+    context_tokens = sum(estimate_tokens(doc.page_content) for doc in documents)
+    if context_tokens <= config.USER_CONTEXT_TOKEN_BUDGET:
+        # 사용자 정보가 프롬프트 예산 안에 들어가면 임베딩과 벡터 검색 없이 그대로 전달합니다.
+        retriever = StaticContextRetriever(documents=documents)
+        footprint = sum(len(doc.page_content.encode("utf-8")) for doc in documents)
+    else:
+        # 사용자 정보가 매우 길어진 경우에만 분할 후 벡터 검색으로 관련 부분을 고릅니다.
+        logger.info("사용자 정보가 길어 벡터 검색을 사용합니다.", extra={"user_id": user_id, "context_tokens": context_tokens})
+        text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
+        with time_stage("split"):
+            docs = text_splitter.split_documents(documents)
+        if not docs:
+            return None
+
+        # 임베딩과 FAISS 인덱스 생성을 나누어 각 단계의 소요 시간을 따로 기록합니다.
+        embeddings = get_embeddings()
+        texts = [doc.page_content for doc in docs]
+        with time_stage("embed"):
+            vectors = await embeddings.aembed_documents(texts)
+        with time_stage("index_build"):
+            vector_store = FAISS.from_embeddings(
+                list(zip(texts, vectors)), embeddings, metadatas=[doc.metadata for doc in docs]
+            )
+        retriever = vector_store.as_retriever()
+        footprint = _estimate_footprint(docs, vector_store)
+
     rag_chain = RetrievalQA.from_chain_type(
-        llm=llm,
+        llm=get_llm(),
         chain_type="stuff",
         retriever=retriever,
         chain_type_kwargs={"prompt": prompt},
         return_source_documents=True
     )
+    user_chain_cache.put(user_id, rag_chain, version, footprint)
     return rag_chain
@@ -0,0 +1,97 @@
+# app/agent/chain_cache.py
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+
+@dataclass
+class _CacheEntry:
+    chain: Any
+    version: Optional[datetime]
+    size_bytes: int
+    created_at: float
+
+
+class UserChainCache:
+    """
+    사용자별 RAG 체인(리트리버 상태 포함)을 보관하는 캐시입니다.
+
+    - 전체 메모리 사용량(추정치)이 max_bytes를 넘으면 가장 오래 쓰지 않은 사용자부터 제거합니다.
+    - ttl_seconds가 지난 항목은 만료됩니다.
+    - version(사용자의 최신 주문 시각)이 바뀌면 해당 사용자의 항목을 무효화합니다.
+    """
+
+    def __init__(self, max_bytes: int, ttl_seconds: float):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "expired": 0, "invalidated": 0, "evictions": 0}
+
+    def contains(self, user_id: str) -> bool:
+        """만료나 버전은 확인하지 않고 해당 사용자의 항목이 있는지만 확인합니다. 통계와 LRU 순서는 바꾸지 않습니다."""
+        with self._lock:
+            return user_id in self._entries
+
+    def get(self, user_id: str, version: Optional[datetime]):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                self._counters["misses"] += 1
+                return None
+            if time.monotonic() - entry.created_at > self.ttl_seconds:
+                self._remove(user_id)
+                self._counters["expired"] += 1
+                self._counters["misses"] += 1
+                return None
+            if entry.version != version:
+                self._remove(user_id)
+                self._counters["invalidated"] += 1
+                self._counters["misses"] += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self._counters["hits"] += 1
+            return entry.chain
+
+    def put(self, user_id: str, chain, version: Optional[datetime], size_bytes: int) -> None:
+        with self._lock:
+            if user_id in self._entries:
+                self._remove(user_id)
+            if size_bytes > self.max_bytes:
+                return
+            self._entries[user_id] = _CacheEntry(chain, version, size_bytes, time.monotonic())
+            self._total_bytes += size_bytes
+            while self._total_bytes > self.max_bytes:
+                oldest_user_id = next(iter(self._entries))
+                self._remove(oldest_user_id)
+                self._counters["evictions"] += 1
+
+    def invalidate(self, user_id: str) -> bool:
+        """해당 사용자의 캐시 항목을 명시적으로 제거합니다."""
+        with self._lock:
+            if user_id not in self._entries:
+                return False
+            self._remove(user_id)
+            self._counters["invalidated"] += 1
+            return True
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            counters = dict(self._counters)
+            lookups = counters["hits"] + counters["misses"]
+            counters.update({
+                "entries": len(self._entries),
+                "total_bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "hit_rate": counters["hits"] / lookups if lookups else 0.0,
+            })
+            return counters
+
+    def _remove(self, user_id: str) -> None:
+        entry = self._entries.pop(user_id)
+        self._total_bytes -= entry.size_bytes
@@ -1,49 +1,239 @@
 # app/agent/loader.py
-from typing import List
+import asyncio
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
 from langchain_core.documents import Document
-from pymongo import MongoClient
 from app import config
+from app.db import get_database
+from app.logger import get_logger
+from rag_common.metrics import time_stage
 
-def load_documents_for_user(user_id: str) -> List[Document]:
+logger = get_logger(__name__)
+
+# 문서 조합에 필요한 필드만 가져옵니다.
+USER_PROJECTION = {"_id": 0, "name": 1, "email": 1, "signup_date": 1}
+ORDER_PROJECTION = {"_id": 0, "order_id": 1, "menu_name": 1, "total_price": 1, "ordered_at": 1}
+# Spark 작업(materialize_user_context)이 미리 계산한 user_context 문서의 필드
+CONTEXT_PROJECTION = {
+    "_id": 0, "name": 1, "email": 1, "signup_date": 1,
+    "recent_orders": 1, "favorite_menus": 1, "order_stats": 1, "updated_at": 1,
+}
+
+def render_user_document(
+    user_id: str,
+    user_profile: dict,
+    recent_orders: List[dict],
+    favorite_menus: Optional[List[dict]] = None,
+    order_stats: Optional[dict] = None,
+) -> Document:
+    """사용자 프로필과 최근 주문(미리 계산된 경우 선호 메뉴와 결제 통계 포함)을 AI가 이해하기 쉬운 하나의 Document로 조합합니다."""
+    order_details = "\n".join([
+        f"  - 주문 ID: {order.get('order_id')}, 메뉴: {order.get('menu_name')}, 가격: {order.get('total_price')}원, 주문 시간: {order.get('ordered_at')}"
+        for order in recent_orders
+    ]) if recent_orders else "  - 최근 주문 내역이 없습니다."
+
+    page_content = (
+        f"사용자 '{user_profile.get('name', 'N/A')}' (ID: {user_id})에 대한 정보입니다.\n"
+        f"- 이메일: {user_profile.get('email', 'N/A')}\n"
+        f"- 가입일: {user_profile.get('signup_date', 'N/A')}\n"
+        f"- 최근 주문 내역 (최대 5건):\n{order_details}"
+    )
+    if order_stats:
+        page_content += (
+            f"\n- 주문 통계: 총 주문 {order_stats.get('total_orders', 0)}건, 총 결제액 {order_stats.get('total_spent', 0)}원, "
+            f"평균 주문액 {round(order_stats.get('avg_order_value') or 0)}원, "
+            f"첫 주문 {order_stats.get('first_ordered_at', 'N/A')}, 마지막 주문 {order_stats.get('last_ordered_at', 'N/A')}"
+        )
+    if favorite_menus:
+        page_content += "\n- 자주 주문한 메뉴: " + ", ".join(
+            f"{menu.get('menu_name')}({menu.get('order_count')}회)" for menu in favorite_menus
+        )
+
+    # 메타데이터에는 user_id를 저장
+    return Document(page_content=page_content, metadata={"email": user_id})
+
+def _render_context_document(context: dict) -> Document:
+    return render_user_document(
+        context["email"], context, context.get("recent_orders") or [],
+        context.get("favorite_menus"), context.get("order_stats"),
+    )
+
+def normalize_time(value) -> Optional[datetime]:
+    """
+    시각 값을 비교할 수 있도록 밀리초 단위의 UTC datetime으로 맞춥니다.
+    MongoDB는 날짜를 밀리초까지, 시간대 없이 UTC로 돌려주므로 문자열, 마이크로초, 시간대가 있는 값과 그대로 비교하면 항상 달라집니다.
+    해석할 수 없는 값은 None을 반환합니다.
+    """
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if not isinstance(value, datetime):
+        return None
+    value = value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+    return value.replace(microsecond=value.microsecond // 1000 * 1000)
+
+def _is_fresh(context: dict, version: Optional[datetime]) -> bool:
+    """
+    미리 계산된 컨텍스트를 그대로 써도 되는지 확인합니다.
+
+    - 사용자의 가장 최근 주문(version)까지 반영되어 있어야 합니다.
+    - 계산된 지 USER_CONTEXT_MAX_AGE_SECONDS가 지나지 않아야 합니다. 증분 실행은 새 주문이 있는 사용자만 다시 계산하므로,
+      프로필만 바뀐 사용자나 주문이 없는 사용자(version이 None)의 컨텍스트는 주기적인 full 실행 전까지 갱신되지 않습니다.
+    """
+    updated_at = normalize_time(context.get("updated_at"))
+    if updated_at is None:
+        return False
+    if (datetime.now(timezone.utc) - updated_at).total_seconds() > config.USER_CONTEXT_MAX_AGE_SECONDS:
+        return False
+
+    last_ordered_at = normalize_time((context.get("order_stats") or {}).get("last_ordered_at"))
+    return last_ordered_at == normalize_time(version)
+
+async def find_user_context(user_id: str) -> Optional[dict]:
+    """미리 계산된 user_context 문서를 email 인덱스로 조회합니다. 없거나 조회에 실패하면 None을 반환합니다."""
+    try:
+        with time_stage("load"):
+            return await get_database().user_context.find_one({"email": user_id}, projection=CONTEXT_PROJECTION)
+    except Exception as e:
+        logger.warning("사용자 컨텍스트 조회 실패, 직접 조회합니다.", extra={"user_id": user_id, "error": str(e)})
+        return None
+
+async def load_documents_for_user(user_id: str, version: Optional[datetime], context: Optional[dict]) -> List[Document]:
+    """
+    특정 사용자의 정보를 Document 객체로 만듭니다.
+
+    find_user_context로 읽은 context가 version(가장 최근 주문 시각)까지 반영하고 있으며 너무 오래되지 않았으면
+    그대로 사용하고, 그렇지 않으면 users/order를 직접 조회합니다.
+    """
+    if context and _is_fresh(context, version):
+        return [_render_context_document(context)]
+    logger.info("미리 계산된 사용자 컨텍스트가 없거나 오래되어 직접 조회합니다.", extra={
+        "user_id": user_id, "materialized": context is not None,
+    })
+    return await _load_live_documents_for_user(user_id)
+
+async def _load_live_documents_for_user(user_id: str) -> List[Document]:
     """MongoDB에서 특정 사용자의 정보를 조회하여 Document 객체로 만듭니다."""
-    print(f"MongoDB에서 user_id '{user_id}'의 데이터 로딩 중...")
-    
+    logger.info("MongoDB에서 사용자 데이터 로딩", extra={"user_id": user_id})
+
     try:
-        client = MongoClient(config.MONGO_URI)
-        db = client[config.MONGO_DATABASE]
-        
-        # 1. 사용자 프로필 조회
-        user_profile = db.users.find_one({"email": user_id})
-        
-        # 2. 사용자의 최근 주문 5개 조회
-        recent_orders = list(db.order.find({"email": user_id}).sort("ordered_at", -1).limit(5))
-        
+        db = get_database()
+
+        # 사용자 프로필과 최근 주문 5개를 동시에 조회 (users.email, order.email+ordered_at 인덱스 사용)
+        with time_stage("load"):
+            user_profile, recent_orders = await asyncio.gather(
+                db.users.find_one({"email": user_id}, projection=USER_PROJECTION),
+                db.order.find({"email": user_id}, projection=ORDER_PROJECTION)
+                    .sort("ordered_at", -1).limit(5).to_list(length=5),
+            )
+
         if not user_profile:
-            print(f"경고: email '{user_id}'에 해당하는 사용자를 찾을 수 없습니다.")
+            logger.warning("email에 해당하는 사용자를 찾을 수 없습니다.", extra={"user_id": user_id})
             return []
 
-        # 3. 조회된 정보를 AI가 이해하기 쉬운 하나의 텍스트로 조합
-        order_details = "\n".join([
-            f"  - 주문 ID: {order.get('order_id')}, 메뉴: {order.get('menu_name')}, 가격: {order.get('total_price')}원, 주문 시간: {order.get('ordered_at')}"
-            for order in recent_orders
-        ]) if recent_orders else "  - 최근 주문 내역이 없습니다."
-
-        page_content = (
-            f"사용자 '{user_profile.get('name', 'N/A')}' (ID: {user_id})에 대한 정보입니다.\n"
-            f"- 이메일: {user_profile.get('email', 'N/A')}\n"
-            f"- 가입일: {user_profile.get('signup_date', 'N/A')}\n"
-            f"- 최근 주문 내역 (최대 5건):\n{order_details}"
-        )
-        
-        # 메타데이터에는 user_id를 저장
-        metadata = {"email": user_id}
-        
         # 단 하나의 종합적인 Document를 생성하여 반환
-        return [Document(page_content=page_content, metadata=metadata)]
+        return [render_user_document(user_id, user_profile, recent_orders)]
 
     except Exception as e:
-        print(f"오류: MongoDB 연결 또는 데이터 처리 중 실패했습니다 - {e}")
+        logger.error("MongoDB 연결 또는 데이터 처리 중 실패했습니다.", extra={"user_id": user_id, "error": str(e)})
         return []
-    finally:
-        if 'client' in locals() and client:
-            client.close()
+
+async def get_latest_order_time(user_id: str) -> Optional[datetime]:
+    """사용자의 가장 최근 주문 시각을 조회합니다. 체인 캐시의 버전으로 사용됩니다."""
+    try:
+        db = get_database()
+        with time_stage("version_lookup"):
+            latest_order = await db.order.find_one(
+                {"email": user_id},
+                projection={"ordered_at": 1, "_id": 0},
+                sort=[("ordered_at", -1)],
+            )
+        return normalize_time(latest_order["ordered_at"]) if latest_order else None
+    except Exception as e:
+        logger.error("최근 주문 시각 조회 중 실패했습니다.", extra={"user_id": user_id, "error": str(e)})
+        return None
+
+async def find_user_contexts(user_ids: List[str]) -> Dict[str, dict]:
+    """여러 사용자의 user_context 문서를 $in 조건 쿼리 한 번으로 조회합니다. 문서가 없는 사용자는 결과에 포함되지 않습니다."""
+    if not user_ids:
+        return {}
+    try:
+        with time_stage("load"):
+            contexts = await get_database().user_context.find(
+                {"email": {"$in": user_ids}}, projection=CONTEXT_PROJECTION
+            ).to_list(length=None)
+        return {context["email"]: context for context in contexts}
+    except Exception as e:
+        logger.warning("사용자 컨텍스트 조회 실패, 직접 조회합니다.", extra={"users": len(user_ids), "error": str(e)})
+        return {}
+
+async def load_documents_for_users(
+    user_ids: List[str], versions: Dict[str, datetime], contexts: Dict[str, dict]
+) -> Dict[str, List[Document]]:
+    """
+    여러 사용자의 Document를 만듭니다. find_user_contexts로 읽은 contexts 중 versions(사용자별 가장 최근 주문 시각)를
+    반영하고 있으며 너무 오래되지 않은 것은 그대로 쓰고, 나머지 사용자만 users/order를 직접 조회합니다.
+    데이터가 없는 사용자는 결과에 포함되지 않습니다.
+    """
+    documents = {
+        user_id: [_render_context_document(contexts[user_id])]
+        for user_id in user_ids if user_id in contexts and _is_fresh(contexts[user_id], versions.get(user_id))
+    }
+
+    missing = [user_id for user_id in user_ids if user_id not in documents]
+    if missing:
+        documents.update(await _load_live_documents_for_users(missing))
+    return documents
+
+async def _load_live_documents_for_users(user_ids: List[str]) -> Dict[str, List[Document]]:
+    """
+    여러 사용자의 프로필과 최근 주문 5건을 $in 조건 쿼리 한 번씩으로 조회하여 사용자별 Document로 만듭니다.
+    데이터가 없는 사용자는 결과에 포함되지 않습니다.
+    """
+    logger.info("MongoDB에서 여러 사용자 데이터 로딩", extra={"users": len(user_ids)})
+
+    try:
+        db = get_database()
+        order_fields = {field: f"${field}" for field in ORDER_PROJECTION if field != "_id"}
+
+        # order.email+ordered_at 인덱스 순서로 읽어 사용자별로 묶은 뒤 최근 5건만 남깁니다.
+        with time_stage("load"):
+            user_profiles, order_groups = await asyncio.gather(
+                db.users.find({"email": {"$in": user_ids}}, projection=USER_PROJECTION).to_list(length=None),
+                db.order.aggregate([
+                    {"$match": {"email": {"$in": user_ids}}},
+                    {"$sort": {"email": 1, "ordered_at": -1}},
+                    {"$group": {"_id": "$email", "orders": {"$push": order_fields}}},
+                    {"$project": {"orders": {"$slice": ["$orders", 5]}}},
+                ]).to_list(length=None),
+            )
+
+        recent_orders = {group["_id"]: group["orders"] for group in order_groups}
+        documents = {
+            profile["email"]: [render_user_document(profile["email"], profile, recent_orders.get(profile["email"], []))]
+            for profile in user_profiles
+        }
+        missing = [user_id for user_id in user_ids if user_id not in documents]
+        if missing:
+            logger.warning("email에 해당하는 사용자를 찾을 수 없습니다.", extra={"user_ids": missing})
+        return documents
+
+    except Exception as e:
+        logger.error("MongoDB 연결 또는 데이터 처리 중 실패했습니다.", extra={"users": len(user_ids), "error": str(e)})
+        return {}
+
+async def get_latest_order_times(user_ids: List[str]) -> Dict[str, datetime]:
+    """여러 사용자의 가장 최근 주문 시각을 한 번의 집계 쿼리로 조회합니다. 주문이 없는 사용자는 포함되지 않습니다."""
+    try:
+        db = get_database()
+        with time_stage("version_lookup"):
+            groups = await db.order.aggregate([
+                {"$match": {"email": {"$in": user_ids}}},
+                {"$group": {"_id": "$email", "latest": {"$max": "$ordered_at"}}},
+            ]).to_list(length=None)
+        return {group["_id"]: normalize_time(group["latest"]) for group in groups}
+    except Exception as e:
+        logger.error("최근 주문 시각 조회 중 실패했습니다.", extra={"users": len(user_ids), "error": str(e)})
+        return {}
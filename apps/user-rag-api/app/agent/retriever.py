@@ -0,0 +1,28 @@
+# app/agent/retriever.py
+from typing import List
+
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForRetrieverRun,
+    CallbackManagerForRetrieverRun,
+)
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+
+class StaticContextRetriever(BaseRetriever):
+    """
+    임베딩이나 벡터 검색 없이 미리 조합된 사용자 문서를 그대로 반환하는 리트리버입니다.
+    사용자 정보가 프롬프트 예산 안에 들어갈 때 사용합니다.
+    """
+
+    documents: List[Document]
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        return self.documents
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        return self.documents
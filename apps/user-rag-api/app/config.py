@@ -15,3 +15,49 @@ MONGO_URI = os.getenv("MONGO_URI")
 if not MONGO_URI:
     raise ValueError("MONGO_URI가 .env 파일에 없습니다.")
 MONGO_DATABASE = os.getenv("MONGO_DATABASE", "test")
+# MONGO_URI가 mongomock:// 이면 메모리 MongoDB를 사용하고, 이 JSON 파일({컬렉션: [문서, ...]})로 데이터를 채웁니다. (테스트/벤치마크용)
+MONGO_SEED_PATH = os.getenv("MONGO_SEED_PATH")
+
+# 임베딩 캐시 설정 (admin-rag-api와 같은 경로를 지정하면 캐시를 공유합니다)
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "models/embedding-001")
+EMBEDDING_CACHE_PATH = os.getenv(
+    "EMBEDDING_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "embedding_cache.sqlite3"),
+)
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+EMBEDDING_CACHE_LRU_SIZE = int(os.getenv("EMBEDDING_CACHE_LRU_SIZE", "4096"))
+
+# 임베딩/LLM 공급자 (google: Gemini / fake: 네트워크 없이 지연 시간만 흉내 내는 로컬 구현, 테스트/벤치마크용)
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "google")
+FAKE_EMBEDDING_LATENCY_MS = float(os.getenv("FAKE_EMBEDDING_LATENCY_MS", "0"))
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "google")
+FAKE_LLM_LATENCY_MS = float(os.getenv("FAKE_LLM_LATENCY_MS", "0"))
+
+# 사용자별 RAG 체인 캐시 설정
+USER_CHAIN_CACHE_MAX_BYTES = int(os.getenv("USER_CHAIN_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+USER_CHAIN_CACHE_TTL_SECONDS = float(os.getenv("USER_CHAIN_CACHE_TTL_SECONDS", "300"))
+
+# 미리 계산된 사용자 컨텍스트(user_context)를 믿을 수 있는 최대 나이 (초). 이보다 오래되면 users/order를 직접 조회합니다.
+# Airflow가 매주 전체 사용자를 다시 계산(full)하므로 기본값은 1주일 + 하루 여유입니다.
+USER_CONTEXT_MAX_AGE_SECONDS = float(os.getenv("USER_CONTEXT_MAX_AGE_SECONDS", str(8 * 24 * 60 * 60)))
+
+# 사용자 정보가 이 토큰 수 이하이면 벡터 검색 없이 그대로 프롬프트에 넣습니다.
+USER_CONTEXT_TOKEN_BUDGET = int(os.getenv("USER_CONTEXT_TOKEN_BUDGET", "3000"))
+
+# LLM 동시 호출 제한 설정 (초과 요청은 대기열에서 기다리고, 대기열이 가득 차면 429를 반환합니다)
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "32"))
+LLM_QUEUE_TIMEOUT_SECONDS = float(os.getenv("LLM_QUEUE_TIMEOUT_SECONDS", "30"))
+
+# MongoDB 커넥션 풀 설정
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "5"))
+# 서버 시작 시 조회에 필요한 인덱스를 생성할지 여부
+MONGO_ENSURE_INDEXES = os.getenv("MONGO_ENSURE_INDEXES", "true").lower() == "true"
+
+# 로그 레벨 (로그는 한 줄에 하나의 JSON 객체로 출력됩니다)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
+# 배치 질의(/query/batch)에서 한 번에 받을 수 있는 최대 질문 수와, 그중 동시에 답변을 생성할 최대 개수
+QUERY_BATCH_MAX_SIZE = int(os.getenv("QUERY_BATCH_MAX_SIZE", "50"))
+QUERY_BATCH_MAX_CONCURRENCY = int(os.getenv("QUERY_BATCH_MAX_CONCURRENCY", str(LLM_MAX_CONCURRENCY)))
@@ -0,0 +1,87 @@
+# app/db.py
+from typing import Optional
+
+from bson import json_util
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+from app import config
+from app.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 사용자 컨텍스트 조회 쿼리가 사용하는 인덱스 정의
+# - users: email로 프로필 조회
+# - order: email로 필터링 후 ordered_at 내림차순으로 최근 주문 조회
+# - user_context: Spark 작업이 미리 계산한 사용자 컨텍스트를 email로 조회 (email마다 문서 하나)
+INDEXES = {
+    "users": [
+        IndexModel([("email", ASCENDING)], name="email_1"),
+    ],
+    "order": [
+        IndexModel([("email", ASCENDING), ("ordered_at", DESCENDING)], name="email_1_ordered_at_-1"),
+    ],
+    "user_context": [
+        IndexModel([("email", ASCENDING)], name="email_1", unique=True),
+    ],
+}
+
+_client: Optional[AsyncIOMotorClient] = None
+
+
+def connect() -> AsyncIOMotorClient:
+    """프로세스 전체에서 공유하는 MongoDB 커넥션 풀을 생성합니다."""
+    global _client
+    if _client is None and is_mock():
+        # 테스트/벤치마크용 메모리 MongoDB (mongomock-motor가 설치되어 있어야 합니다)
+        from mongomock_motor import AsyncMongoMockClient
+        _client = AsyncMongoMockClient()
+        logger.info("메모리 MongoDB(mongomock) 사용")
+    if _client is None:
+        _client = AsyncIOMotorClient(
+            config.MONGO_URI,
+            maxPoolSize=config.MONGO_MAX_POOL_SIZE,
+            minPoolSize=config.MONGO_MIN_POOL_SIZE,
+        )
+        logger.info("MongoDB 커넥션 풀 생성", extra={
+            "max_pool_size": config.MONGO_MAX_POOL_SIZE, "min_pool_size": config.MONGO_MIN_POOL_SIZE,
+        })
+    return _client
+
+
+def is_mock() -> bool:
+    return config.MONGO_URI.startswith("mongomock://")
+
+
+def close() -> None:
+    global _client
+    if _client is not None:
+        _client.close()
+        _client = None
+
+
+def get_database():
+    """공유 커넥션 풀의 데이터베이스 핸들을 반환합니다."""
+    return connect()[config.MONGO_DATABASE]
+
+
+async def ensure_indexes() -> None:
+    """쿼리에 필요한 인덱스를 생성합니다. 이미 있으면 아무 작업도 하지 않습니다."""
+    db = get_database()
+    for collection_name, indexes in INDEXES.items():
+        try:
+            names = await db[collection_name].create_indexes(indexes)
+            logger.info("인덱스 확인 완료", extra={"collection": collection_name, "indexes": names})
+        except Exception as e:
+            logger.warning("인덱스 생성 실패", extra={"collection": collection_name, "error": str(e)})
+
+
+async def seed_from_file(path: str) -> None:
+    """{컬렉션: [문서, ...]} 형식의 Extended JSON 파일로 데이터를 채웁니다. (메모리 MongoDB용)"""
+    with open(path, "r", encoding="utf-8") as f:
+        collections = json_util.loads(f.read())
+    db = get_database()
+    for collection_name, documents in collections.items():
+        if documents:
+            await db[collection_name].insert_many(documents)
+        logger.info("시드 데이터 입력 완료", extra={"collection": collection_name, "documents": len(documents)})
@@ -5,44 +5,179 @@ import os
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(project_root)
 
+import asyncio
+from contextlib import asynccontextmanager
+from typing import List
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 import uvicorn
-from app.agent.chain import create_user_rag_chain
+from app import config, db
+from app.agent.chain import create_user_rag_chain, create_user_rag_chains, user_chain_cache, get_embeddings
+from rag_common.limiter import ConcurrencyLimiter, LimiterSaturatedError
+from rag_common.streaming import SlotReleasingStream, stream_rag_answer
+from app.logger import get_logger
+from rag_common.metrics import metrics_response, observe_http_request, register_stats, stage_metrics_callback
+
+logger = get_logger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 서버 시작 시 MongoDB 커넥션 풀을 만들고, 종료 시 닫습니다.
+    db.connect()
+    if db.is_mock() and config.MONGO_SEED_PATH:
+        await db.seed_from_file(config.MONGO_SEED_PATH)
+    if config.MONGO_ENSURE_INDEXES:
+        await db.ensure_indexes()
+    yield
+    db.close()
 
 app = FastAPI(
     title="User-Centric RAG Agent API",
     description="MongoDB의 특정 사용자 데이터를 기반으로 질문에 답변하는 AI 에이전트",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
+)
+
+# 엔드포인트별 요청 처리 시간을 Prometheus 히스토그램으로 기록합니다.
+app.middleware("http")(observe_http_request)
+
+# Gemini 호출 동시 실행 수 제한 (이벤트 루프는 막지 않고, 초과 요청은 대기열에서 기다립니다)
+llm_limiter = ConcurrencyLimiter(
+    max_concurrency=config.LLM_MAX_CONCURRENCY,
+    max_queue=config.LLM_MAX_QUEUE,
+    queue_timeout=config.LLM_QUEUE_TIMEOUT_SECONDS,
 )
 
+# /metrics 스크레이프 시점에 캐시/리미터 통계(hit_rate 등)를 게이지로 노출합니다.
+register_stats({
+    "user_chain_cache": user_chain_cache.stats,
+    "embedding_cache": lambda: get_embeddings().stats(),
+    "llm_limiter": llm_limiter.stats,
+})
+
 class QueryRequest(BaseModel):
     user_id: str
     question: str
 
+class BatchQueryRequest(BaseModel):
+    queries: List[QueryRequest]
+
 @app.post("/query", summary="특정 사용자에게 대해 질문하기")
 async def process_query(request: QueryRequest):
     if not request.user_id or not request.question:
         raise HTTPException(status_code=400, detail="user_id and question are required")
 
     try:
-        print(f"'{request.user_id}'에 대한 질문 수신: {request.question}")
+        logger.info("질문 수신", extra={"user_id": request.user_id, "question": request.question})
         
         # ⭐️ 요청이 들어올 때마다 해당 유저의 RAG 체인을 동적으로 생성
-        rag_chain = create_user_rag_chain(request.user_id)
+        rag_chain = await create_user_rag_chain(request.user_id)
         
         if not rag_chain:
             raise HTTPException(status_code=404, detail=f"User with id '{request.user_id}' not found or has no data.")
 
-        result = rag_chain.invoke(request.question)
+        async with llm_limiter.slot():
+            result = await rag_chain.ainvoke(request.question, config={"callbacks": [stage_metrics_callback]})
         
         return {
             "answer": result.get("result", "답변을 생성하지 못했습니다."),
             "source_documents": result.get("source_documents", [])
         }
+    except LimiterSaturatedError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("쿼리 처리 중 오류 발생", extra={"user_id": request.user_id})
+        raise HTTPException(status_code=500, detail=f"Error processing the query: {e}")
+
+@app.post("/query/stream", summary="특정 사용자에 대해 질문하고 답변을 스트리밍으로 받기")
+async def process_query_stream(request: QueryRequest):
+    """생성되는 토큰을 Server-Sent Events로 전달하고, 마지막에 참고 문서를 보냅니다."""
+    if not request.user_id or not request.question:
+        raise HTTPException(status_code=400, detail="user_id and question are required")
+
+    logger.info("스트리밍 질문 수신", extra={"user_id": request.user_id, "question": request.question})
+    try:
+        rag_chain = await create_user_rag_chain(request.user_id)
+    except Exception as e:
+        logger.exception("쿼리 처리 중 오류 발생", extra={"user_id": request.user_id})
+        raise HTTPException(status_code=500, detail=f"Error processing the query: {e}")
+    if not rag_chain:
+        raise HTTPException(status_code=404, detail=f"User with id '{request.user_id}' not found or has no data.")
+
+    try:
+        slot = await llm_limiter.lease()
+    except LimiterSaturatedError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+
+    return StreamingResponse(
+        # 응답 본문을 읽기 시작하기 전에 연결이 끊겨도 슬롯이 반납되도록 스트림을 감쌉니다.
+        SlotReleasingStream(stream_rag_answer(rag_chain, request.question), slot),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.post("/query/batch", summary="여러 사용자/질문을 한 번에 보내고 답변 받기")
+async def process_query_batch(request: BatchQueryRequest):
+    """
+    (user_id, question) 여러 개를 한 번의 요청으로 처리하고, 결과를 요청 순서대로 반환합니다.
+    사용자 데이터는 $in 조건 쿼리로 한 번에 불러오고, 답변 생성은 최대 QUERY_BATCH_MAX_CONCURRENCY개씩 동시에 실행합니다.
+    실패한 항목에는 error와 status_code가 담깁니다.
+    """
+    queries = request.queries
+    if not queries or not all(query.user_id and query.question for query in queries):
+        raise HTTPException(status_code=400, detail="user_id and question are required")
+    if len(queries) > config.QUERY_BATCH_MAX_SIZE:
+        raise HTTPException(status_code=400, detail=f"Too many queries (max {config.QUERY_BATCH_MAX_SIZE})")
+
+    logger.info("배치 질문 수신", extra={"queries": len(queries)})
+    try:
+        chains = await create_user_rag_chains(list(dict.fromkeys(query.user_id for query in queries)))
     except Exception as e:
-        print(f"쿼리 처리 중 오류 발생: {e}")
+        logger.exception("배치 체인 준비 중 오류 발생")
         raise HTTPException(status_code=500, detail=f"Error processing the query: {e}")
 
+    semaphore = asyncio.Semaphore(config.QUERY_BATCH_MAX_CONCURRENCY)
+
+    async def answer(query: QueryRequest) -> dict:
+        item = {"user_id": query.user_id, "question": query.question}
+        rag_chain = chains.get(query.user_id)
+        if rag_chain is None:
+            return {**item, "error": f"User with id '{query.user_id}' not found or has no data.", "status_code": 404}
+        async with semaphore:
+            try:
+                async with llm_limiter.slot():
+                    result = await rag_chain.ainvoke(query.question, config={"callbacks": [stage_metrics_callback]})
+            except LimiterSaturatedError as e:
+                return {**item, "error": str(e), "status_code": 429}
+            except Exception as e:
+                logger.exception("배치 답변 생성 중 오류 발생", extra={"user_id": query.user_id})
+                return {**item, "error": f"Error processing the query: {e}", "status_code": 500}
+        return {
+            **item,
+            "answer": result.get("result", "답변을 생성하지 못했습니다."),
+            "source_documents": result.get("source_documents", []),
+        }
+
+    return {"results": await asyncio.gather(*(answer(query) for query in queries))}
+
+@app.get("/cache/stats", summary="사용자별 체인 캐시 및 임베딩 캐시 통계 조회")
+async def cache_stats():
+    return {
+        "user_chain_cache": user_chain_cache.stats(),
+        "embedding_cache": get_embeddings().stats(),
+        "llm_limiter": llm_limiter.stats(),
+    }
+
+@app.delete("/cache/users/{user_id}", summary="특정 사용자의 체인 캐시 무효화")
+async def invalidate_user_cache(user_id: str):
+    return {"user_id": user_id, "invalidated": user_chain_cache.invalidate(user_id)}
+
+@app.get("/metrics", summary="Prometheus 메트릭", include_in_schema=False)
+async def metrics():
+    return metrics_response()
+
 if __name__ == "__main__":
     uvicorn.run("app.main:app", host="0.0.0.0", port=8001, reload=True) # 포트 번호를 8001로 변경
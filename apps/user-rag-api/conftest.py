@@ -0,0 +1,14 @@
+# conftest.py
+import os
+import tempfile
+
+# app.config는 필수 설정이 없으면 import 시점에 실패하므로, 단위 테스트용 더미 값을 채웁니다.
+# MongoDB는 메모리 구현(mongomock)을 사용합니다.
+for name, value in {
+    "GEMINI_API_KEY": "test",
+    "MONGO_URI": "mongomock://test",
+    "EMBEDDING_PROVIDER": "fake",
+    "LLM_PROVIDER": "fake",
+    "EMBEDDING_CACHE_PATH": os.path.join(tempfile.gettempdir(), "user-rag-api-test-embedding-cache.sqlite3"),
+}.items():
+    os.environ.setdefault(name, value)
@@ -0,0 +1,90 @@
+# tests/test_chain_cache.py
+from datetime import datetime
+
+from app.agent import chain_cache
+from app.agent.chain_cache import UserChainCache
+
+V1 = datetime(2024, 5, 1, 12, 0)
+V2 = datetime(2024, 5, 2, 12, 0)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_cache(monkeypatch, max_bytes=100, ttl_seconds=60):
+    clock = FakeClock()
+    monkeypatch.setattr(chain_cache.time, "monotonic", clock)
+    return UserChainCache(max_bytes=max_bytes, ttl_seconds=ttl_seconds), clock
+
+
+def test_hit_returns_cached_chain(monkeypatch):
+    cache, _ = make_cache(monkeypatch)
+    cache.put("a", "chain-a", V1, 10)
+    assert cache.get("a", V1) == "chain-a"
+    assert cache.get("b", V1) is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["total_bytes"]) == (1, 1, 10)
+
+
+def test_evicts_least_recently_used_when_over_max_bytes(monkeypatch):
+    cache, _ = make_cache(monkeypatch, max_bytes=100)
+    cache.put("a", "chain-a", V1, 40)
+    cache.put("b", "chain-b", V1, 40)
+    cache.get("a", V1)  # a를 최근에 사용
+    cache.put("c", "chain-c", V1, 40)
+    assert cache.get("b", V1) is None
+    assert cache.get("a", V1) == "chain-a"
+    assert cache.get("c", V1) == "chain-c"
+    stats = cache.stats()
+    assert (stats["evictions"], stats["entries"], stats["total_bytes"]) == (1, 2, 80)
+
+
+def test_skips_entries_larger_than_max_bytes(monkeypatch):
+    cache, _ = make_cache(monkeypatch, max_bytes=100)
+    cache.put("a", "chain-a", V1, 40)
+    cache.put("big", "chain-big", V1, 101)
+    assert not cache.contains("big")
+    assert cache.get("a", V1) == "chain-a"
+
+
+def test_replacing_entry_updates_total_bytes(monkeypatch):
+    cache, _ = make_cache(monkeypatch)
+    cache.put("a", "chain-a", V1, 40)
+    cache.put("a", "chain-a2", V2, 30)
+    assert cache.stats()["total_bytes"] == 30
+    assert cache.get("a", V2) == "chain-a2"
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    cache, clock = make_cache(monkeypatch, ttl_seconds=60)
+    cache.put("a", "chain-a", V1, 10)
+    clock.now += 60
+    assert cache.get("a", V1) == "chain-a"
+    clock.now += 1
+    assert cache.get("a", V1) is None
+    stats = cache.stats()
+    assert (stats["expired"], stats["entries"], stats["total_bytes"]) == (1, 0, 0)
+
+
+def test_version_change_invalidates_entry(monkeypatch):
+    cache, _ = make_cache(monkeypatch)
+    cache.put("a", "chain-a", V1, 10)
+    assert cache.get("a", V2) is None
+    # 무효화된 항목은 제거되므로 이전 버전으로도 다시 찾을 수 없습니다.
+    assert cache.get("a", V1) is None
+    assert cache.stats()["invalidated"] == 1
+
+
+def test_invalidate_removes_entry(monkeypatch):
+    cache, _ = make_cache(monkeypatch)
+    cache.put("a", "chain-a", V1, 10)
+    assert cache.invalidate("a") is True
+    assert cache.invalidate("a") is False
+    assert not cache.contains("a")
+    stats = cache.stats()
+    assert (stats["invalidated"], stats["total_bytes"]) == (1, 0)
@@ -0,0 +1,82 @@
+# tests/test_loader.py
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app import config
+from app.agent import chain, loader
+from app.db import get_database
+
+LAST_ORDERED_AT = datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=timezone.utc)
+
+
+def make_context(updated_at, last_ordered_at=LAST_ORDERED_AT):
+    return {
+        "email": "user@example.com", "name": "홍길동", "recent_orders": [],
+        "order_stats": {"total_orders": 3, "last_ordered_at": last_ordered_at},
+        "updated_at": updated_at,
+    }
+
+
+@pytest.mark.parametrize("value", [
+    datetime(2024, 5, 1, 12, 30, 15, 123000),  # MongoDB가 돌려주는 값 (밀리초, 시간대 없음)
+    "2024-05-01 12:30:15.123456+00:00",
+    "2024-05-01T12:30:15.123Z",
+    datetime(2024, 5, 1, 21, 30, 15, 123999, tzinfo=timezone(timedelta(hours=9))),
+])
+def test_normalize_time_ignores_type_precision_and_timezone(value):
+    assert loader.normalize_time(value) == datetime(2024, 5, 1, 12, 30, 15, 123000, tzinfo=timezone.utc)
+
+
+def test_normalize_time_rejects_unparseable_values():
+    assert loader.normalize_time(None) is None
+    assert loader.normalize_time("not a date") is None
+
+
+def test_context_is_fresh_when_it_reflects_the_latest_order():
+    context = make_context(datetime.now(timezone.utc).replace(tzinfo=None), str(LAST_ORDERED_AT))
+    assert loader._is_fresh(context, loader.normalize_time(LAST_ORDERED_AT.replace(tzinfo=None)))
+
+
+def test_context_without_orders_is_fresh_without_version():
+    context = make_context(datetime.now(timezone.utc), None)
+    assert loader._is_fresh(context, None)
+
+
+def test_context_is_stale_after_a_newer_order():
+    context = make_context(datetime.now(timezone.utc))
+    assert not loader._is_fresh(context, LAST_ORDERED_AT + timedelta(seconds=1))
+    assert not loader._is_fresh(context, None)
+
+
+def test_context_is_stale_after_max_age():
+    updated_at = datetime.now(timezone.utc) - timedelta(seconds=config.USER_CONTEXT_MAX_AGE_SECONDS + 60)
+    assert not loader._is_fresh(make_context(updated_at), LAST_ORDERED_AT)
+    assert not loader._is_fresh(make_context(None), LAST_ORDERED_AT)
+
+
+def test_cached_user_needs_only_the_version_lookup(monkeypatch):
+    lookups = []
+    find_user_context = loader.find_user_context
+
+    async def counting_find_user_context(user_id):
+        lookups.append(user_id)
+        return await find_user_context(user_id)
+
+    monkeypatch.setattr(chain, "find_user_context", counting_find_user_context)
+    user_id = "cached@example.com"
+
+    async def scenario():
+        db = get_database()
+        await db.order.insert_one({"email": user_id, "order_id": "o1", "ordered_at": LAST_ORDERED_AT.replace(tzinfo=None)})
+        await db.user_context.insert_one({**make_context(datetime.now(timezone.utc), LAST_ORDERED_AT), "email": user_id})
+        first = await chain.create_user_rag_chain(user_id)
+        second = await chain.create_user_rag_chain(user_id)
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first is not None and second is first
+    # 처음에는 버전 조회와 함께 user_context를 읽고, 캐시 적중 시에는 버전만 확인합니다.
+    assert lookups == [user_id]
+    chain.user_chain_cache.invalidate(user_id)
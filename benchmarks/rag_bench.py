@@ -0,0 +1,370 @@
+# benchmarks/rag_bench.py
+"""
+RAG API 부하 테스트/벤치마크 스크립트
+
+외부 네트워크 없이 admin-rag-api / user-rag-api를 각각 별도 프로세스로 띄우고
+/query에 동시 요청을 보내 지연 시간(p50/p95/p99), 처리량, 메모리 사용량을 측정합니다.
+
+- LLM/임베딩: LLM_PROVIDER=fake, EMBEDDING_PROVIDER=fake (지연 시간은 옵션으로 조정)
+- admin-rag-api 데이터: 생성한 요약 테이블 JSONL 픽스처 (CLICKHOUSE_FIXTURE_PATH)
+- user-rag-api 데이터: 메모리 MongoDB(mongomock) + 생성한 시드 파일 (MONGO_SEED_PATH)
+
+사용 예:
+    pip install -r benchmarks/requirements.txt
+    python benchmarks/rag_bench.py --app all --requests 500 --concurrency 16 --llm-latency-ms 300
+    python benchmarks/rag_bench.py --app admin --json bench_admin.json --max-error-rate 0.01
+    python benchmarks/rag_bench.py --app admin --embedding-rate-limit-every 5  # 임베딩 429 재시도 경로 포함
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+import httpx
+from bson import json_util
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_DIRS = {
+    "admin": os.path.join(REPO_ROOT, "apps", "admin-rag-api"),
+    "user": os.path.join(REPO_ROOT, "apps", "user-rag-api"),
+}
+# 요청을 처리할 준비가 되었는지 확인하는 경로 (admin은 인덱스를 백그라운드에서 만듭니다)
+READY_PATHS = {"admin": "/readyz", "user": "/metrics"}
+
+# 벤치마크 중에는 실제 서비스에 접속하지 않도록 필수 설정값을 더미로 채웁니다.
+BASE_ENV = {
+    "GEMINI_API_KEY": "bench",
+    "LLM_PROVIDER": "fake",
+    "EMBEDDING_PROVIDER": "fake",
+    "LOG_LEVEL": "WARNING",
+}
+
+MENUS = ["아메리카노", "카페라떼", "바닐라라떼", "콜드브루", "녹차라떼", "치즈케이크", "크루아상"]
+PATHS = ["home>menu>cart>checkout", "home>menu>checkout", "home>profile>menu>cart>checkout"]
+ADMIN_QUESTIONS = [
+    "{store} 지난달 일간 매출 추이를 알려줘",
+    "{store} 이번 달 주간 주문 수는?",
+    "{store} 매장의 월간 평균 주문액은 얼마야?",
+    "{store} 매장에서 가장 인기 있는 메뉴는?",
+    "{day} {store} 매출 알려줘",
+    "전체 매장 중 매출이 가장 높은 곳은?",
+]
+USER_QUESTIONS = [
+    "최근에 주문한 메뉴가 뭐야?",
+    "가장 최근 주문 금액은 얼마야?",
+    "이 사용자는 언제 가입했어?",
+    "자주 시키는 메뉴를 추천해줘",
+]
+
+
+# -----------------------------
+# 픽스처 데이터 생성
+# -----------------------------
+def write_summary_fixture(path: str, stores: int, days: int, rng: random.Random) -> List[str]:
+    """summary_stats_by_period 형식의 일간/주간/월간 행을 JSONL 파일로 만듭니다."""
+    store_ids = [f"store{i}" for i in range(1, stores + 1)]
+    end = date.today()
+    start = end - timedelta(days=days)
+    with open(path, "w", encoding="utf-8") as f:
+        for store_id in store_ids:
+            periods = [("daily", start + timedelta(days=i)) for i in range(days)]
+            periods += sorted({("weekly", d - timedelta(days=d.weekday())) for _, d in periods})
+            periods += sorted({("monthly", d.replace(day=1)) for _, d in periods})
+            for period_type, period_start in periods:
+                orders = rng.randint(20, 400)
+                sales = orders * rng.randint(4000, 7000)
+                menus = rng.sample(MENUS, 3)
+                row = {
+                    "store_id": store_id,
+                    "period_type": period_type,
+                    "period_start": period_start.isoformat(),
+                    "total_sales": float(sales),
+                    "total_orders": orders,
+                    "avg_order_value": round(sales / orders, 1),
+                    "unique_visitors": rng.randint(orders // 2, orders),
+                    "top_1_menu_id": menus[0],
+                    "top_2_menu_id": menus[1],
+                    "top_3_menu_id": menus[2],
+                    "top_1_path": rng.choice(PATHS),
+                    "top_1_path_users": rng.randint(5, 50),
+                }
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+    return store_ids
+
+
+def write_mongo_seed(path: str, users: int, orders_per_user: int, rng: random.Random) -> List[str]:
+    """users / order 컬렉션 시드 데이터를 Extended JSON 파일로 만듭니다."""
+    emails = [f"user{i}@bench.local" for i in range(1, users + 1)]
+    now = datetime.now()
+    seed = {"users": [], "order": []}
+    for i, email in enumerate(emails):
+        seed["users"].append({
+            "email": email,
+            "name": f"사용자{i + 1}",
+            "signup_date": now - timedelta(days=rng.randint(30, 900)),
+        })
+        for j in range(orders_per_user):
+            seed["order"].append({
+                "order_id": f"order-{i + 1}-{j + 1}",
+                "email": email,
+                "menu_name": rng.choice(MENUS),
+                "total_price": rng.randint(3000, 15000),
+                "ordered_at": now - timedelta(minutes=rng.randint(1, 60 * 24 * 90)),
+            })
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(json_util.dumps(seed, ensure_ascii=False))
+    return emails
+
+
+def build_payloads(app: str, count: int, keys: List[str], distinct: int, rng: random.Random) -> List[dict]:
+    """
+    요청 본문 목록을 만듭니다. distinct는 서로 다른 요청 종류의 수로,
+    작을수록 같은 질문(사용자)이 반복되어 캐시 적중률이 높아집니다.
+    """
+    pool = []
+    for _ in range(distinct):
+        if app == "admin":
+            day = date.today() - timedelta(days=rng.randint(1, 28))
+            question = rng.choice(ADMIN_QUESTIONS).format(store=rng.choice(keys), day=day.isoformat())
+            pool.append({"question": question})
+        else:
+            pool.append({"user_id": rng.choice(keys), "question": rng.choice(USER_QUESTIONS)})
+    return [rng.choice(pool) for _ in range(count)]
+
+
+# -----------------------------
+# 서버 프로세스 실행
+# -----------------------------
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def read_memory_mb(pid: int) -> Dict[str, Optional[float]]:
+    """프로세스의 현재/최대 RSS(MB)를 /proc에서 읽습니다. (Linux 외에서는 None)"""
+    memory = {"rss_mb": None, "peak_rss_mb": None}
+    try:
+        with open(f"/proc/{pid}/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    memory["rss_mb"] = round(int(line.split()[1]) / 1024, 1)
+                elif line.startswith("VmHWM:"):
+                    memory["peak_rss_mb"] = round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return memory
+
+
+@contextmanager
+def run_service(app: str, env: Dict[str, str], workdir: str, startup_timeout: float):
+    """uvicorn으로 앱을 띄우고 준비될 때까지 기다린 뒤 (base_url, process, 준비까지 걸린 시간)을 반환합니다."""
+    port = _free_port()
+    log_path = os.path.join(workdir, f"{app}.log")
+    started_at = time.perf_counter()
+    with open(log_path, "w") as log_file:
+        process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+            cwd=APP_DIRS[app],
+            env={**os.environ, **env},
+            stdout=log_file,
+            stderr=subprocess.STDOUT,
+        )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f"{app} 서버가 종료되었습니다 (exit {process.returncode}).\n{_tail(log_path)}")
+            if time.perf_counter() - started_at > startup_timeout:
+                raise RuntimeError(f"{app} 서버가 {startup_timeout}초 안에 준비되지 않았습니다.\n{_tail(log_path)}")
+            try:
+                if httpx.get(f"{base_url}{READY_PATHS[app]}", timeout=1.0).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.2)
+        yield base_url, process, time.perf_counter() - started_at
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def _tail(path: str, lines: int = 30) -> str:
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        return "".join(f.readlines()[-lines:])
+
+
+# -----------------------------
+# 부하 생성 및 집계
+# -----------------------------
+async def drive_load(base_url: str, payloads: List[dict], concurrency: int, timeout: float) -> tuple:
+    """concurrency개의 작업자가 payloads를 나누어 /query에 보냅니다. (지연 시간 목록, 상태 코드 목록, 총 소요 시간)"""
+    queue: asyncio.Queue = asyncio.Queue()
+    for payload in payloads:
+        queue.put_nowait(payload)
+    latencies: List[float] = []
+    statuses: List[str] = []
+
+    async def worker(client: httpx.AsyncClient):
+        while not queue.empty():
+            payload = queue.get_nowait()
+            started_at = time.perf_counter()
+            try:
+                response = await client.post("/query", json=payload)
+                status = str(response.status_code)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - started_at)
+            statuses.append(status)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        started_at = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started_at
+    return latencies, statuses, elapsed
+
+
+def percentile(values: List[float], p: float) -> float:
+    """nearest-rank 방식의 백분위수입니다."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(p / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def summarize(latencies: List[float], statuses: List[str], elapsed: float) -> dict:
+    ok = [latency for latency, status in zip(latencies, statuses) if status == "200"]
+    status_counts = Counter(statuses)
+    return {
+        "requests": len(statuses),
+        "ok": len(ok),
+        "error_rate": round(1 - len(ok) / len(statuses), 4) if statuses else 0.0,
+        "status_counts": dict(status_counts),
+        "throughput_rps": round(len(ok) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "mean": round(statistics.mean(ok) * 1000, 1) if ok else 0.0,
+            "p50": round(percentile(ok, 50) * 1000, 1),
+            "p95": round(percentile(ok, 95) * 1000, 1),
+            "p99": round(percentile(ok, 99) * 1000, 1),
+            "max": round(max(ok) * 1000, 1) if ok else 0.0,
+        },
+    }
+
+
+def bench_app(app: str, args, workdir: str) -> dict:
+    rng = random.Random(args.seed)
+    env = {
+        **BASE_ENV,
+        "FAKE_LLM_LATENCY_MS": str(args.llm_latency_ms),
+        "FAKE_EMBEDDING_LATENCY_MS": str(args.embedding_latency_ms),
+        "FAKE_EMBEDDING_RATE_LIMIT_EVERY": str(args.embedding_rate_limit_every),
+        "EMBEDDING_RETRY_BACKOFF_SECONDS": str(args.embedding_retry_backoff),
+        "EMBEDDING_CACHE_PATH": os.path.join(workdir, f"{app}_embedding_cache.sqlite3"),
+    }
+    if app == "admin":
+        fixture_path = os.path.join(workdir, "summary_stats.jsonl")
+        keys = write_summary_fixture(fixture_path, args.stores, args.days, rng)
+        env.update({
+            "MONGO_URI": "mongomock://bench",
+            "CLICKHOUSE_HOST": "http://localhost",
+            "CLICKHOUSE_USERNAME": "bench",
+            "CLICKHOUSE_PASSWORD": "bench",
+            "CLICKHOUSE_DATABASE": "bench",
+            "CLICKHOUSE_TABLE": "summary_stats_by_period",
+            "CLICKHOUSE_FIXTURE_PATH": fixture_path,
+            "RAG_INDEX_DIR": os.path.join(workdir, "faiss_index"),
+        })
+    else:
+        seed_path = os.path.join(workdir, "mongo_seed.json")
+        keys = write_mongo_seed(seed_path, args.users, args.orders_per_user, rng)
+        env.update({"MONGO_URI": "mongomock://bench", "MONGO_SEED_PATH": seed_path})
+
+    payloads = build_payloads(app, args.requests, keys, args.distinct, rng)
+    warmup = build_payloads(app, args.warmup, keys, args.distinct, rng)
+
+    with run_service(app, env, workdir, args.startup_timeout) as (base_url, process, startup_seconds):
+        if warmup:
+            asyncio.run(drive_load(base_url, warmup, args.concurrency, args.timeout))
+        latencies, statuses, elapsed = asyncio.run(drive_load(base_url, payloads, args.concurrency, args.timeout))
+        result = {
+            "app": app,
+            "concurrency": args.concurrency,
+            "startup_seconds": round(startup_seconds, 2),
+            **summarize(latencies, statuses, elapsed),
+            **read_memory_mb(process.pid),
+            "cache_stats": httpx.get(f"{base_url}/cache/stats", timeout=5.0).json(),
+        }
+    return result
+
+
+def print_report(result: dict) -> None:
+    latency = result["latency_ms"]
+    print(f"[{result['app']}] 요청 {result['requests']}건 (동시 {result['concurrency']}), 성공 {result['ok']}건, "
+          f"오류율 {result['error_rate']:.2%}, 상태 코드 {result['status_counts']}")
+    print(f"  - 지연 시간(ms): p50 {latency['p50']}, p95 {latency['p95']}, p99 {latency['p99']}, "
+          f"평균 {latency['mean']}, 최대 {latency['max']}")
+    print(f"  - 처리량: {result['throughput_rps']} req/s, 기동 시간: {result['startup_seconds']}초")
+    print(f"  - 메모리(MB): 현재 {result['rss_mb']}, 최대 {result['peak_rss_mb']}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="RAG API 오프라인 부하 테스트")
+    parser.add_argument("--app", choices=["admin", "user", "all"], default="all")
+    parser.add_argument("--requests", type=int, default=200, help="측정할 요청 수")
+    parser.add_argument("--warmup", type=int, default=10, help="측정 전에 보낼 요청 수")
+    parser.add_argument("--concurrency", type=int, default=8, help="동시 요청 수")
+    parser.add_argument("--distinct", type=int, default=50, help="서로 다른 질문(사용자) 수. 작을수록 캐시 적중률이 높아집니다.")
+    parser.add_argument("--llm-latency-ms", type=float, default=200, help="fake LLM 호출 지연 시간")
+    parser.add_argument("--embedding-latency-ms", type=float, default=20, help="fake 임베딩 호출 지연 시간")
+    parser.add_argument("--embedding-rate-limit-every", type=int, default=0,
+                        help="fake 임베딩이 N번째 호출마다 429를 반환합니다. (admin 재시도 경로 확인, 0이면 끔)")
+    parser.add_argument("--embedding-retry-backoff", type=float, default=0.05, help="429 재시도 대기 기준 시간(초)")
+    parser.add_argument("--stores", type=int, default=20, help="admin 픽스처 매장 수")
+    parser.add_argument("--days", type=int, default=60, help="admin 픽스처 일간 데이터 기간(일)")
+    parser.add_argument("--users", type=int, default=200, help="user 시드 사용자 수")
+    parser.add_argument("--orders-per-user", type=int, default=20, help="user 시드 사용자당 주문 수")
+    parser.add_argument("--seed", type=int, default=42, help="데이터/질문 생성 난수 시드")
+    parser.add_argument("--timeout", type=float, default=60, help="요청 타임아웃(초)")
+    parser.add_argument("--startup-timeout", type=float, default=120, help="서버 기동 대기 시간(초)")
+    parser.add_argument("--json", help="결과를 저장할 JSON 파일 경로")
+    parser.add_argument("--max-error-rate", type=float, help="오류율이 이 값을 넘으면 종료 코드 1로 끝냅니다. (CI용)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    apps = ["admin", "user"] if args.app == "all" else [args.app]
+    results = []
+    with tempfile.TemporaryDirectory(prefix="rag-bench-") as workdir:
+        for app in apps:
+            result = bench_app(app, args, workdir)
+            print_report(result)
+            results.append(result)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    if args.max_error_rate is not None and any(r["error_rate"] > args.max_error_rate for r in results):
+        print(f"오류율이 기준({args.max_error_rate:.2%})을 넘었습니다.")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
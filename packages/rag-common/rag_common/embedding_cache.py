@@ -0,0 +1,202 @@
+# rag_common/embedding_cache.py
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    (모델 이름, 텍스트 SHA-256)을 키로 임베딩 결과를 캐싱하는 Embeddings 래퍼입니다.
+
+    프로세스 내 LRU를 먼저 조회하고, 없으면 SQLite 저장소(float32 BLOB)를 조회합니다.
+    둘 다 없는 텍스트만 원격 임베딩 API로 요청합니다.
+    SQLite 파일 경로를 같게 지정하면 여러 서비스가 같은 캐시를 공유할 수 있습니다.
+
+    저장 시마다 COUNT(*)를 하지 않도록 저장된 행 수는 메모리에서 세고(stats() 호출 시 다시 맞춥니다),
+    조회 시 last_used는 touch_interval_seconds보다 오래된 행만 갱신해 캐시 적중이 쓰기로 이어지지 않게 합니다.
+    """
+
+    def __init__(
+        self,
+        underlying: Embeddings,
+        model_name: str,
+        db_path: str,
+        max_entries: int = 200_000,
+        lru_size: int = 4096,
+        touch_interval_seconds: float = 60.0,
+    ):
+        self.underlying = underlying
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.lru_size = lru_size
+        self.touch_interval_seconds = touch_interval_seconds
+        self._lru: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"lru_hits": 0, "store_hits": 0, "misses": 0, "evictions": 0}
+
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                dim INTEGER NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+        self._stored = self._count_stored()
+
+    # -----------------------------
+    # Embeddings 인터페이스
+    # -----------------------------
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(texts, "document", self.underlying.embed_documents)
+
+    def embed_query(self, text: str) -> List[float]:
+        # 질의용 임베딩은 문서용과 task type이 달라 벡터가 다르므로 네임스페이스를 분리합니다.
+        return self._embed([text], "query", lambda batch: [self.underlying.embed_query(batch[0])])[0]
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """여러 질문을 질의용으로 임베딩합니다. 공급자가 embed_queries를 지원하면 캐시에 없는 질문을 한 번에 요청합니다."""
+        embed_queries = getattr(self.underlying, "embed_queries", None)
+        if embed_queries is None:
+            embed_queries = lambda batch: [self.underlying.embed_query(text) for text in batch]
+        return self._embed(texts, "query", embed_queries)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            counters = dict(self._counters)
+            # 같은 파일을 쓰는 다른 프로세스의 변경까지 반영하도록 메모리 행 수를 다시 맞춥니다.
+            stored = self._stored = self._count_stored()
+        lookups = counters["lru_hits"] + counters["store_hits"] + counters["misses"]
+        counters["lru_entries"] = len(self._lru)
+        counters["stored_entries"] = stored
+        counters["hit_rate"] = (counters["lru_hits"] + counters["store_hits"]) / lookups if lookups else 0.0
+        return counters
+
+    # -----------------------------
+    # 내부 구현
+    # -----------------------------
+    def _namespace(self, kind: str) -> str:
+        return f"{self.model_name}:{kind}"
+
+    @staticmethod
+    def _hash(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def _embed(self, texts: List[str], kind: str, embed_fn) -> List[List[float]]:
+        namespace = self._namespace(kind)
+        keys = [self._hash(text) for text in texts]
+        results: List[Optional[List[float]]] = [None] * len(texts)
+
+        with self._lock:
+            pending: Dict[str, List[int]] = {}
+            for i, key in enumerate(keys):
+                vector = self._lru_get(f"{namespace}:{key}")
+                if vector is not None:
+                    results[i] = vector
+                    self._counters["lru_hits"] += 1
+                else:
+                    pending.setdefault(key, []).append(i)
+
+            if pending:
+                for key, vector in self._store_get(namespace, list(pending)).items():
+                    for i in pending.pop(key):
+                        results[i] = vector
+                        self._counters["store_hits"] += 1
+                    self._lru_put(f"{namespace}:{key}", vector)
+
+        if pending:
+            # 같은 텍스트가 여러 번 들어온 경우에도 원격 호출은 한 번만 합니다.
+            miss_keys = list(pending)
+            miss_texts = [texts[pending[key][0]] for key in miss_keys]
+            vectors = embed_fn(miss_texts)
+
+            with self._lock:
+                self._counters["misses"] += len(miss_keys)
+                for key, vector in zip(miss_keys, vectors):
+                    for i in pending[key]:
+                        results[i] = vector
+                    self._lru_put(f"{namespace}:{key}", vector)
+                self._store_put(namespace, dict(zip(miss_keys, vectors)))
+
+        return results
+
+    def _lru_get(self, cache_key: str) -> Optional[List[float]]:
+        vector = self._lru.get(cache_key)
+        if vector is not None:
+            self._lru.move_to_end(cache_key)
+        return vector
+
+    def _lru_put(self, cache_key: str, vector: List[float]) -> None:
+        self._lru[cache_key] = vector
+        self._lru.move_to_end(cache_key)
+        while len(self._lru) > self.lru_size:
+            self._lru.popitem(last=False)
+
+    def _count_stored(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def _store_get(self, namespace: str, keys: List[str]) -> Dict[str, List[float]]:
+        found: Dict[str, List[float]] = {}
+        now = time.time()
+        stale: List[str] = []
+        # SQLite 바인딩 변수 개수 제한을 피하기 위해 나눠서 조회합니다.
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            rows = self._conn.execute(
+                f"SELECT text_hash, vector, last_used FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                [namespace, *batch],
+            ).fetchall()
+            for text_hash, blob, last_used in rows:
+                found[text_hash] = np.frombuffer(blob, dtype=np.float32).tolist()
+                if now - last_used >= self.touch_interval_seconds:
+                    stale.append(text_hash)
+
+        # LRU 순서는 touch_interval_seconds 단위로만 맞추면 충분하므로, 최근에 갱신된 행은 다시 쓰지 않습니다.
+        if stale:
+            self._conn.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                [(now, namespace, key) for key in stale],
+            )
+            self._conn.commit()
+        return found
+
+    def _store_put(self, namespace: str, vectors: Dict[str, List[float]]) -> None:
+        now = time.time()
+        # 다른 스레드/프로세스가 먼저 저장한 키는 같은 벡터이므로 건너뛰고, 새로 들어간 행만 셉니다.
+        inserted = self._conn.executemany(
+            "INSERT OR IGNORE INTO embeddings (model, text_hash, dim, vector, last_used) VALUES (?, ?, ?, ?, ?)",
+            [
+                (namespace, key, len(vector), np.asarray(vector, dtype=np.float32).tobytes(), now)
+                for key, vector in vectors.items()
+            ],
+        ).rowcount
+        self._stored += max(inserted, 0)
+        self._evict()
+        self._conn.commit()
+
+    def _evict(self) -> None:
+        """저장된 항목이 max_entries를 넘으면 가장 오래 사용되지 않은 항목부터 삭제합니다."""
+        overflow = self._stored - self.max_entries
+        if overflow <= 0:
+            return
+        deleted = self._conn.execute(
+            "DELETE FROM embeddings WHERE rowid IN (SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+            (overflow,),
+        ).rowcount
+        self._stored -= deleted
+        self._counters["evictions"] += deleted
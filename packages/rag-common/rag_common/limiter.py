@@ -0,0 +1,89 @@
+# rag_common/limiter.py
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Dict
+
+
+class LimiterSaturatedError(Exception):
+    """동시 실행 슬롯과 대기열이 모두 가득 찼을 때 발생합니다."""
+
+
+class SlotLease:
+    """
+    ConcurrencyLimiter.lease()로 얻은 슬롯입니다. release()를 여러 번 호출해도 슬롯은 한 번만 반납됩니다.
+    release()가 호출되지 않은 채 객체가 사라지면(예: 스트림이 시작되기 전에 연결이 끊긴 경우) 그때 반납합니다.
+    """
+
+    def __init__(self, limiter: "ConcurrencyLimiter"):
+        self._limiter = limiter
+        self._released = False
+
+    def release(self) -> None:
+        if self._released:
+            return
+        self._released = True
+        self._limiter.release()
+
+    def __del__(self):
+        self.release()
+
+
+class ConcurrencyLimiter:
+    """
+    외부 LLM 호출의 동시 실행 수를 제한합니다.
+
+    슬롯이 모두 사용 중이면 최대 max_queue개의 요청까지 대기열에서 기다리고,
+    그 이상이거나 queue_timeout 안에 슬롯을 얻지 못하면 LimiterSaturatedError를 발생시킵니다.
+    (API 레이어에서 429 응답으로 변환합니다.)
+    """
+
+    def __init__(self, max_concurrency: int, max_queue: int, queue_timeout: float):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._active = 0
+        self._waiting = 0
+        self._rejected = 0
+
+    async def acquire(self) -> None:
+        """슬롯을 얻을 때까지 기다립니다. 대기열이 가득 찼거나 대기 시간이 초과되면 예외가 발생합니다."""
+        if self._semaphore.locked() and self._waiting >= self.max_queue:
+            self._rejected += 1
+            raise LimiterSaturatedError("LLM 요청 대기열이 가득 찼습니다.")
+
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._rejected += 1
+            raise LimiterSaturatedError("LLM 요청 대기 시간이 초과되었습니다.")
+        finally:
+            self._waiting -= 1
+        self._active += 1
+
+    def release(self) -> None:
+        self._active -= 1
+        self._semaphore.release()
+
+    async def lease(self) -> SlotLease:
+        """슬롯을 얻어 SlotLease로 돌려줍니다. 요청 핸들러 밖(스트리밍 응답 등)에서 반납해야 할 때 사용합니다."""
+        await self.acquire()
+        return SlotLease(self)
+
+    @asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "active": self._active,
+            "waiting": self._waiting,
+            "rejected": self._rejected,
+        }
@@ -0,0 +1,45 @@
+# rag_common/logger.py
+import json
+import logging
+import sys
+from datetime import datetime, timezone
+from typing import Tuple
+
+# LogRecord 기본 속성. 이 외의 속성(logger.info(..., extra={...}))은 JSON 필드로 출력합니다.
+_RESERVED_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """로그 한 건을 한 줄의 JSON 객체로 만듭니다."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        payload.update({key: value for key, value in vars(record).items() if key not in _RESERVED_ATTRS})
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+def configure_logging(level: str, names: Tuple[str, ...] = ("app", "rag_common")) -> None:
+    """
+    names 하위 로거가 한 줄 JSON으로 stdout에 출력되도록 설정합니다. 이미 설정된 로거는 건너뜁니다.
+    기본값은 각 앱의 'app' 패키지와 이 공통 패키지입니다.
+    """
+    for name in names:
+        root = logging.getLogger(name)
+        if not root.handlers:
+            handler = logging.StreamHandler(sys.stdout)
+            handler.setFormatter(JsonFormatter())
+            root.addHandler(handler)
+            root.setLevel(level)
+            root.propagate = False
+
+
+def get_logger(name: str) -> logging.Logger:
+    """공통 패키지 모듈의 로거를 반환합니다. 출력 형식과 레벨은 앱이 configure_logging으로 정합니다."""
+    return logging.getLogger(name)
@@ -0,0 +1,140 @@
+# rag_common/metrics.py
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+from uuid import UUID
+
+from fastapi import Response
+from langchain_core.callbacks import BaseCallbackHandler
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Histogram, generate_latest
+from prometheus_client.core import GaugeMetricFamily
+
+# 밀리초 단위의 캐시 조회부터 수십 초짜리 인덱스 빌드/생성까지 담을 수 있는 버킷
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+STAGE_SECONDS = Histogram(
+    "rag_stage_duration_seconds",
+    "RAG 단계별 소요 시간(초): load, split, embed, index_build, retrieve, generate 등",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "rag_http_request_duration_seconds",
+    "엔드포인트별 요청 처리 시간(초). 스트리밍 응답은 응답 시작까지의 시간입니다.",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_TOKENS = Counter("rag_llm_tokens_total", "LLM 호출 토큰 수", ["kind"])
+
+
+@contextmanager
+def time_stage(stage: str):
+    """with 블록의 실행 시간을 stage 단계의 소요 시간으로 기록합니다."""
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.labels(stage).observe(time.perf_counter() - started_at)
+
+
+class StageMetricsCallback(BaseCallbackHandler):
+    """
+    체인 실행 중 리트리버(retrieve)와 LLM(generate) 구간의 시간을 기록하고,
+    LLM 응답의 usage_metadata에서 입력/출력 토큰 수를 집계합니다.
+    다른 리트리버를 감싼 리트리버는 가장 바깥 실행만 기록합니다.
+    """
+
+    # 이벤트 루프에서 바로 실행해도 될 만큼 가벼우므로 스레드 풀로 넘기지 않습니다.
+    run_inline = True
+
+    def __init__(self):
+        self._runs: Dict[UUID, tuple] = {}
+        self._lock = threading.Lock()
+
+    def on_retriever_start(self, serialized, query, *, run_id, parent_run_id=None, **kwargs):
+        self._start(run_id, parent_run_id, "retrieve")
+
+    def on_retriever_end(self, documents, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_retriever_error(self, error, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, **kwargs):
+        self._start(run_id, parent_run_id, "generate")
+
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, **kwargs):
+        self._start(run_id, parent_run_id, "generate")
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._end(run_id)
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    LLM_TOKENS.labels("input").inc(usage.get("input_tokens", 0))
+                    LLM_TOKENS.labels("output").inc(usage.get("output_tokens", 0))
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def _start(self, run_id: UUID, parent_run_id: Optional[UUID], stage: str) -> None:
+        with self._lock:
+            parent = self._runs.get(parent_run_id)
+            if parent is not None and parent[0] == stage:
+                return
+            self._runs[run_id] = (stage, time.perf_counter())
+
+    def _end(self, run_id: UUID) -> None:
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        if run is not None:
+            stage, started_at = run
+            STAGE_SECONDS.labels(stage).observe(time.perf_counter() - started_at)
+
+
+# 체인 실행 시 config={"callbacks": [stage_metrics_callback]}로 전달합니다.
+stage_metrics_callback = StageMetricsCallback()
+
+
+class StatsCollector:
+    """캐시/리미터의 stats() 결과 중 숫자 값을 스크레이프 시점에 게이지로 노출합니다. (hit_rate 등)"""
+
+    def __init__(self, sources: Dict[str, Callable[[], dict]]):
+        self.sources = sources
+
+    def collect(self):
+        gauge = GaugeMetricFamily("rag_component_stat", "캐시/리미터 구성요소 통계", labels=["component", "stat"])
+        for component, stats in self.sources.items():
+            try:
+                values = stats()
+            except Exception:
+                continue
+            for stat, value in values.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    gauge.add_metric([component, stat], float(value))
+        yield gauge
+
+
+def register_stats(sources: Dict[str, Callable[[], dict]]) -> None:
+    REGISTRY.register(StatsCollector(sources))
+
+
+async def observe_http_request(request, call_next):
+    """FastAPI http 미들웨어. 경로 변수 대신 라우트 템플릿(/cache/users/{user_id})을 라벨로 사용합니다."""
+    started_at = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        HTTP_REQUEST_SECONDS.labels(
+            request.method, getattr(route, "path", "unmatched"), str(status)
+        ).observe(time.perf_counter() - started_at)
+
+
+def metrics_response() -> Response:
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,110 @@
+# rag_common/providers.py
+import asyncio
+import hashlib
+import threading
+import time
+from typing import AsyncIterator, List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+
+class FakeRateLimitError(Exception):
+    code = 429
+
+
+class FakeEmbeddings(Embeddings):
+    """
+    네트워크 없이 동작하는 로컬 임베딩 공급자입니다. (테스트/벤치마크용)
+    같은 텍스트에는 항상 같은 벡터를 반환하고, 호출마다 latency_seconds만큼 지연됩니다.
+    rate_limit_every가 0보다 크면 해당 횟수마다 429 오류를 발생시켜 재시도 로직을 확인할 수 있습니다.
+    """
+
+    def __init__(self, size: int = 768, latency_seconds: float = 0.0, rate_limit_every: int = 0):
+        self.size = size
+        self.latency_seconds = latency_seconds
+        self.rate_limit_every = rate_limit_every
+        self._calls = 0
+        self._lock = threading.Lock()
+
+    def _vector(self, text: str) -> List[float]:
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:4], "little")
+        return np.random.default_rng(seed).normal(size=self.size).astype(np.float32).tolist()
+
+    def _call(self) -> None:
+        with self._lock:
+            self._calls += 1
+            calls = self._calls
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        if self.rate_limit_every and calls % self.rate_limit_every == 0:
+            raise FakeRateLimitError("429 RESOURCE_EXHAUSTED (fake)")
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self._call()
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        self._call()
+        return self._vector(text)
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        self._call()
+        return [self._vector(text) for text in texts]
+
+
+class GeminiEmbeddings(GoogleGenerativeAIEmbeddings):
+    """여러 질문을 한 번의 배치 요청(task_type=retrieval_query)으로 임베딩할 수 있는 Gemini 임베딩입니다."""
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_documents(texts, task_type="retrieval_query")
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    네트워크 없이 동작하는 로컬 LLM입니다. (테스트/벤치마크용)
+    호출마다 latency_seconds만큼 지연된 뒤 프롬프트 길이를 담은 고정 형식의 답변을 반환하고,
+    토큰 수 추정치를 usage_metadata로 채웁니다. 스트리밍 시에는 지연 시간을 단어 수로 나누어 흘려보냅니다.
+    """
+
+    latency_seconds: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _answer(self, messages) -> AIMessage:
+        prompt = "\n".join(str(message.content) for message in messages)
+        text = f"(fake) 프롬프트 {len(prompt)}자를 참고한 답변입니다."
+        input_tokens = len(prompt.encode("utf-8")) // 4 + 1
+        output_tokens = len(text.encode("utf-8")) // 4 + 1
+        return AIMessage(content=text, usage_metadata={
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        })
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self.latency_seconds)
+        return ChatResult(generations=[ChatGeneration(message=self._answer(messages))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self.latency_seconds)
+        return ChatResult(generations=[ChatGeneration(message=self._answer(messages))])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        answer = self._answer(messages)
+        words = answer.content.split(" ")
+        for i, word in enumerate(words):
+            await asyncio.sleep(self.latency_seconds / len(words))
+            last = i == len(words) - 1
+            chunk = ChatGenerationChunk(message=AIMessageChunk(
+                content=word if last else f"{word} ",
+                usage_metadata=answer.usage_metadata if last else None,
+            ))
+            yield chunk
+
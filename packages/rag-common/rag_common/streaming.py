@@ -0,0 +1,73 @@
+# rag_common/streaming.py
+import json
+from typing import AsyncIterator
+
+from fastapi.encoders import jsonable_encoder
+
+from rag_common.limiter import SlotLease
+from rag_common.logger import get_logger
+from rag_common.metrics import stage_metrics_callback
+
+logger = get_logger(__name__)
+
+
+def sse_event(event: str, data) -> str:
+    """Server-Sent Events 형식의 메시지 하나를 만듭니다."""
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data), ensure_ascii=False)}\n\n"
+
+
+class SlotReleasingStream:
+    """
+    스트림을 감싸 LLM 슬롯의 반납을 보장합니다.
+
+    스트림이 끝나거나 오류가 나거나, 클라이언트 연결이 끊겨 aclose/취소되거나,
+    한 번도 읽히지 않은 채 버려지는 경우(__del__) 모두 슬롯을 반납합니다. (SlotLease가 중복 반납을 막습니다.)
+    """
+
+    def __init__(self, stream: AsyncIterator[str], slot: SlotLease):
+        self._stream = stream
+        self._slot = slot
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> str:
+        try:
+            return await self._stream.__anext__()
+        except BaseException:
+            # StopAsyncIteration(정상 종료)과 CancelledError(연결 끊김)를 포함합니다.
+            self._slot.release()
+            raise
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            self._slot.release()
+
+    def __del__(self):
+        self._slot.release()
+
+
+async def stream_rag_answer(rag_chain, question: str) -> AsyncIterator[str]:
+    """
+    RetrievalQA 체인을 실행하면서 LLM이 생성하는 토큰을 'token' 이벤트로 바로 전달하고,
+    마지막에 참고 문서를 'sources' 이벤트로, 종료를 'done' 이벤트로 보냅니다.
+    LLM 슬롯 반납은 SlotReleasingStream이 담당합니다.
+    """
+    try:
+        async for event in rag_chain.astream_events(
+            question, config={"callbacks": [stage_metrics_callback]}, version="v2"
+        ):
+            kind = event["event"]
+            if kind == "on_chat_model_stream":
+                text = event["data"]["chunk"].content
+                if text:
+                    yield sse_event("token", {"text": text})
+            elif kind == "on_chain_end" and not event.get("parent_ids"):
+                output = event["data"].get("output") or {}
+                yield sse_event("sources", {"source_documents": output.get("source_documents", [])})
+        yield sse_event("done", {})
+    except Exception as e:
+        logger.error("스트리밍 중 오류 발생", extra={"error": str(e)})
+        yield sse_event("error", {"detail": f"Error processing the query: {e}"})
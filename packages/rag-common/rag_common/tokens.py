@@ -0,0 +1,9 @@
+# rag_common/tokens.py
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    토크나이저 호출 없이 토큰 수를 대략 추정합니다.
+    UTF-8 기준 4바이트당 1토큰으로 계산합니다. (영문은 약 4글자, 한글은 약 1.3글자당 1토큰)
+    """
+    return len(text.encode("utf-8")) // 4 + 1
@@ -0,0 +1,119 @@
+# tests/test_embedding_cache.py
+import pytest
+
+from rag_common import embedding_cache
+from rag_common.embedding_cache import CachedEmbeddings
+from rag_common.providers import FakeEmbeddings
+
+
+class CountingEmbeddings(FakeEmbeddings):
+    def __init__(self):
+        super().__init__(size=4)
+        self.embedded = []
+
+    def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        return super().embed_documents(texts)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(embedding_cache.time, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def make_cache(tmp_path):
+    caches = []
+
+    def factory(underlying=None, model_name="model-a", **kwargs):
+        cache = CachedEmbeddings(underlying or CountingEmbeddings(), model_name, str(tmp_path / "cache.sqlite3"), **kwargs)
+        caches.append(cache)
+        return cache
+
+    yield factory
+    for cache in caches:
+        cache._conn.close()
+
+
+def stored_hashes(cache):
+    return {text_hash for (text_hash,) in cache._conn.execute("SELECT text_hash FROM embeddings")}
+
+
+def test_counts_lru_hits_store_hits_and_misses(make_cache):
+    underlying = CountingEmbeddings()
+    cache = make_cache(underlying)
+    assert cache.embed_documents(["a", "b", "a"]) == [underlying._vector(text) for text in ["a", "b", "a"]]
+    cache.embed_documents(["a"])
+    # 같은 파일을 여는 새 인스턴스는 LRU가 비어 있으므로 SQLite에서 읽습니다.
+    reopened = make_cache(underlying)
+    reopened.embed_documents(["b"])
+
+    assert underlying.embedded == ["a", "b"]
+    stats = cache.stats()
+    assert (stats["misses"], stats["lru_hits"], stats["store_hits"], stats["stored_entries"]) == (2, 1, 0, 2)
+    assert stats["hit_rate"] == pytest.approx(1 / 3)
+    assert reopened.stats()["store_hits"] == 1
+
+
+def test_evicts_least_recently_used_rows_at_max_entries(make_cache, clock):
+    cache = make_cache(max_entries=2, lru_size=0, touch_interval_seconds=10)
+    cache.embed_documents(["a"])
+    clock.now += 1
+    cache.embed_documents(["b"])
+    clock.now += 10
+    cache.embed_documents(["a"])  # 저장소 적중으로 a의 last_used 갱신
+    clock.now += 1
+    cache.embed_documents(["c"])
+
+    assert stored_hashes(cache) == {cache._hash("a"), cache._hash("c")}
+    stats = cache.stats()
+    assert (stats["evictions"], stats["stored_entries"]) == (1, 2)
+
+
+def test_recently_used_rows_are_not_touched_again(make_cache, clock):
+    cache = make_cache(lru_size=0, touch_interval_seconds=60)
+    cache.embed_documents(["a"])
+    statements = []
+    cache._conn.set_trace_callback(statements.append)
+
+    clock.now += 30
+    cache.embed_documents(["a"])
+    assert not [sql for sql in statements if sql.startswith(("UPDATE", "SELECT COUNT"))]
+
+    clock.now += 30
+    cache.embed_documents(["a"])
+    assert [sql for sql in statements if sql.startswith("UPDATE")]
+
+
+def test_puts_do_not_count_rows(make_cache):
+    cache = make_cache(max_entries=2)
+    statements = []
+    cache._conn.set_trace_callback(statements.append)
+    cache.embed_documents(["a", "b", "c"])
+    assert not [sql for sql in statements if "COUNT" in sql]
+    assert cache.stats()["stored_entries"] == 2
+
+
+def test_model_names_and_query_embeddings_are_isolated(make_cache):
+    model_a = CountingEmbeddings()
+    model_b = CountingEmbeddings()
+    make_cache(model_a, "model-a").embed_documents(["same text"])
+    cache_b = make_cache(model_b, "model-b")
+    cache_b.embed_documents(["same text"])
+    cache_b.embed_query("same text")
+
+    assert model_a.embedded == ["same text"]
+    assert model_b.embedded == ["same text"]  # 질의 임베딩은 embed_query로 따로 요청됩니다.
+    assert cache_b.stats()["misses"] == 2
+    models = {model for (model,) in cache_b._conn.execute("SELECT model FROM embeddings")}
+    assert models == {"model-a:document", "model-b:document", "model-b:query"}
@@ -0,0 +1,73 @@
+# tests/test_streaming.py
+import asyncio
+import gc
+
+import pytest
+
+from rag_common.limiter import ConcurrencyLimiter
+from rag_common.streaming import SlotReleasingStream
+
+
+async def events(count, fail=False):
+    for i in range(count):
+        yield f"event {i}"
+    if fail:
+        raise RuntimeError("boom")
+
+
+def make_limiter():
+    return ConcurrencyLimiter(max_concurrency=1, max_queue=0, queue_timeout=0.1)
+
+
+def test_lease_releases_once():
+    async def scenario():
+        limiter = make_limiter()
+        slot = await limiter.lease()
+        slot.release()
+        slot.release()
+        assert limiter.stats()["active"] == 0
+        async with limiter.slot():
+            assert limiter.stats()["active"] == 1
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("fail", [False, True])
+def test_stream_releases_slot_when_consumed(fail):
+    async def scenario():
+        limiter = make_limiter()
+        stream = SlotReleasingStream(events(2, fail), await limiter.lease())
+        if fail:
+            with pytest.raises(RuntimeError):
+                [item async for item in stream]
+        else:
+            assert [item async for item in stream] == ["event 0", "event 1"]
+        assert limiter.stats()["active"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_stream_releases_slot_on_aclose():
+    async def scenario():
+        limiter = make_limiter()
+        stream = SlotReleasingStream(events(3), await limiter.lease())
+        assert await stream.__anext__() == "event 0"
+        assert limiter.stats()["active"] == 1
+        await stream.aclose()
+        await stream.aclose()
+        assert limiter.stats()["active"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_stream_releases_slot_when_never_iterated():
+    async def scenario():
+        limiter = make_limiter()
+        stream = SlotReleasingStream(events(1), await limiter.lease())
+        del stream
+        gc.collect()
+        assert limiter.stats()["active"] == 0
+        # 반납된 슬롯을 다시 얻을 수 있어야 합니다.
+        (await limiter.lease()).release()
+
+    asyncio.run(scenario())
@@ -1,47 +1,462 @@
 # spark-scripts/aggregate_summary_stats.py
+import argparse
+import base64
+import io
+import urllib.parse
+import urllib.request
+import uuid
+from datetime import datetime, timedelta
+
 from pyspark.sql import SparkSession
-from pyspark.sql.functions import col, lit, trunc, sum as _sum, count, avg, countDistinct, current_timestamp, expr
+from pyspark.sql.functions import col, lit, trunc, sum as _sum, count, avg, countDistinct, current_timestamp
+from pyspark.sql.functions import hll_sketch_agg, hll_union_agg, hll_sketch_estimate
+from pyspark.sql.functions import base64 as to_base64, unbase64
+from pyspark.sql.types import StructType, StructField, StringType, TimestampType
+
+JDBC_DRIVER = "com.clickhouse.jdbc.ClickHouseDriver"
+JDBC_URL = "jdbc:clickhouse://clickhouse-server:8123/default"
+JDBC_USER = "default"
+JDBC_PASSWORD = ""
+# 요약 결과는 JDBC 대신 ClickHouse HTTP 인터페이스의 INSERT ... FORMAT Parquet로 적재
+CLICKHOUSE_HTTP_URL = "http://clickhouse-server:8123"
+CLICKHOUSE_DATABASE = "default"
+
+ORDERS_TABLE = "orders"
+SUMMARY_TABLE = "summary_stats_by_period"
+WATERMARK_TABLE = "summary_stats_watermark"
+# 매장/일 단위 기본 집계 (순 방문자는 병합 가능한 HLL 스케치로 저장). 주/월/연 요약은 이 테이블에서 롤업합니다.
+DAILY_BASE_TABLE = "summary_stats_daily_base"
+# 일 단위 기본 집계의 high-water mark는 watermark 테이블에 이 period_type으로 기록
+DAILY_BASE_WATERMARK = "daily_base"
+
+# ClickHouse에 Parquet로 적재하는 테이블별 컬럼과 Arrow 타입
+SUMMARY_COLUMNS = [
+    ("period_type", "string"), ("period_start", "date32"), ("store_id", "string"),
+    ("total_sales", "float64"), ("total_orders", "uint64"), ("avg_order_value", "float64"),
+    ("unique_visitors", "uint64"), ("created_at", "timestamp"),
+]
+DAILY_BASE_COLUMNS = [
+    ("store_id", "string"), ("day", "date32"), ("total_sales", "float64"),
+    ("total_orders", "uint64"), ("visitor_sketch", "string"), ("created_at", "timestamp"),
+]
+
+# 집계에 필요한 orders 컬럼 (나머지 컬럼은 ClickHouse에서 읽지 않음)
+ORDER_COLUMNS = ["store_id", "ordered_at", "total_price", "user_id"]
+DEFAULT_READ_PARTITIONS = 8
+# incremental 모드에서 watermark 이전 며칠을 다시 읽을지. orders에는 적재 시각 컬럼이 없어
+# ordered_at이 watermark 이전인 주문이 늦게 들어오면 "ordered_at > watermark" 조건으로는 찾을 수 없으므로,
+# 이 기간 안에 늦게 도착한 주문까지 반영합니다. (그보다 늦은 주문은 full 실행에서 반영)
+DEFAULT_LOOKBACK_DAYS = 2
+
+# period_type별 (trunc 단위, 전체 집계 시 조회 기간(일))
+PERIOD_CONFIG = {
+    "daily": ("DD", 7),
+    # Spark에는 toStartOfWeek가 없으므로 date_trunc로 유사하게 구현
+    "weekly": ("WEEK", 30),
+    "monthly": ("MM", 90),
+    "yearly": ("YEAR", 730),
+}
+
+
+def _jdbc_reader(spark):
+    return spark.read \
+        .format("jdbc") \
+        .option("driver", JDBC_DRIVER) \
+        .option("url", JDBC_URL) \
+        .option("user", JDBC_USER) \
+        .option("password", JDBC_PASSWORD)
+
+
+def _write_jdbc(df, table):
+    df.write \
+        .format("jdbc") \
+        .option("driver", JDBC_DRIVER) \
+        .option("url", JDBC_URL) \
+        .option("user", JDBC_USER) \
+        .option("password", JDBC_PASSWORD) \
+        .option("dbtable", table) \
+        .mode("append") \
+        .save()
+
+
+def clickhouse_http(query, body=None, params=None):
+    """
+    ClickHouse HTTP 인터페이스로 쿼리를 실행합니다. body가 있으면 INSERT 데이터로 전송합니다.
+    값은 쿼리에 직접 넣지 않고 {name:Type} 자리표시자와 params로 전달합니다. (HTTP param_<name>)
+    """
+    query_params = {"query": query, "database": CLICKHOUSE_DATABASE}
+    query_params.update({f"param_{name}": str(value) for name, value in (params or {}).items()})
+    request = urllib.request.Request(
+        f"{CLICKHOUSE_HTTP_URL}/?{urllib.parse.urlencode(query_params)}", data=body or b"", method="POST"
+    )
+    credentials = base64.b64encode(f"{JDBC_USER}:{JDBC_PASSWORD}".encode()).decode()
+    request.add_header("Authorization", f"Basic {credentials}")
+    with urllib.request.urlopen(request, timeout=300) as response:
+        return response.read().decode()
+
+
+def _insert_parquet_partition(table, columns=SUMMARY_COLUMNS):
+    """Spark 파티션 하나를 Parquet 블록으로 만들어 ClickHouse에 한 번의 INSERT로 적재하는 함수를 반환합니다."""
+    def insert(rows):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        records = [row.asDict() for row in rows]
+        if not records:
+            return
+        arrow_types = {
+            "string": pa.string(), "date32": pa.date32(), "float64": pa.float64(),
+            "uint64": pa.uint64(), "timestamp": pa.timestamp("s"),
+        }
+        arrow_schema = pa.schema([(name, arrow_types[type_name]) for name, type_name in columns])
+        buffer = io.BytesIO()
+        pq.write_table(pa.Table.from_pylist(records, schema=arrow_schema), buffer)
+        clickhouse_http(f"INSERT INTO {table} FORMAT Parquet", buffer.getvalue())
+    return insert
+
+
+def month_of(day):
+    """ClickHouse toYYYYMM과 같은 형식(YYYYMM 정수)의 월"""
+    return day.year * 100 + day.month
+
+
+def monthly_partitions(periods):
+    """{period_type: [period_start, ...]}를 summary_stats_by_period의 파티션 {(period_type, YYYYMM): [period_start, ...]}로 묶습니다."""
+    partitions = {}
+    for period_type, starts in periods.items():
+        for start in sorted(starts):
+            partitions.setdefault((period_type, month_of(start)), []).append(start)
+    return partitions
+
+
+def summary_partition(period_type, month):
+    """
+    summary_stats_by_period의 (period_type, YYYYMM) 파티션을 나타내는
+    (ALTER TABLE ... PARTITION 식, 파티션 행을 고르는 WHERE 조건, 조건의 파라미터)입니다.
+    PARTITION 식에는 자리표시자를 쓸 수 없으므로 값을 검증한 뒤 넣습니다.
+    """
+    if period_type not in PERIOD_CONFIG or not isinstance(month, int):
+        raise ValueError(f"Invalid summary partition: ({period_type!r}, {month!r})")
+    return (
+        f"tuple('{period_type}', {month})",
+        "period_type = {period_type:String} AND toYYYYMM(period_start) = {month:UInt32}",
+        {"period_type": period_type, "month": month},
+    )
+
+
+def daily_base_partition(month):
+    """summary_stats_daily_base의 YYYYMM 파티션을 나타내는 (PARTITION 식, WHERE 조건, 파라미터)입니다."""
+    if not isinstance(month, int):
+        raise ValueError(f"Invalid daily base partition: {month!r}")
+    return str(month), "toYYYYMM(day) = {month:UInt32}", {"month": month}
+
+
+def copy_untouched_rows_sql(table, staging_table, partition, date_column, first, last):
+    """
+    partition의 행 중 다시 집계하는 구간(first ~ last, 포함) 밖의 행을 staging 테이블로 복사하는 쿼리와 파라미터입니다.
+    다시 집계하는 날/기간은 항상 연속이므로 목록 대신 범위 조건을 사용합니다. (파티션당 조건 크기가 일정)
+    """
+    _, where, params = partition
+    query = (
+        f"INSERT INTO {staging_table} SELECT * FROM {table} "
+        f"WHERE {where} AND NOT ({date_column} BETWEEN {{first:Date}} AND {{last:Date}})"
+    )
+    return query, {**params, "first": first, "last": last}
+
+
+def partition_key_of(table):
+    """system.tables에 기록된 테이블의 파티션 키 식을 조회합니다."""
+    return clickhouse_http(
+        "SELECT partition_key FROM system.tables WHERE database = {database:String} AND name = {table:String}",
+        params={"database": CLICKHOUSE_DATABASE, "table": table},
+    ).strip()
+
+
+def _replace_or_drop(table, source_table, partition):
+    """source_table의 partition으로 table의 같은 파티션을 교체합니다. source에 행이 없으면 파티션을 비웁니다."""
+    partition_expr, where, params = partition
+    rows = int(clickhouse_http(f"SELECT count() FROM {source_table} WHERE {where}", params=params).strip() or 0)
+    if rows:
+        clickhouse_http(f"ALTER TABLE {table} REPLACE PARTITION {partition_expr} FROM {source_table}")
+    else:
+        clickhouse_http(f"ALTER TABLE {table} DROP PARTITION {partition_expr}")
+
 
-def run_aggregation(period_type="monthly"):
+def swap_partitions(table, staging_table, partitions):
+    """
+    staging 테이블의 파티션으로 대상 테이블의 같은 파티션을 통째로 교체합니다.
+    staging에 행이 없는 파티션(다시 집계한 결과도, 남길 행도 없음)은 DROP PARTITION으로 비웁니다.
+
+    REPLACE PARTITION은 파티션 하나씩만 원자적이므로, 교체 전에 각 파티션을 백업 테이블에 복사해 두고
+    중간에 실패하면 이미 교체한 파티션을 백업으로 되돌린 뒤 예외를 다시 던집니다. (이전 결과와 새 결과가 섞여 남지 않음)
+    """
+    # staging/백업 테이블은 CREATE TABLE ... AS로 만들어 파티션 키가 같아야 REPLACE PARTITION이 같은 파티션을 가리킵니다.
+    expected_key = partition_key_of(table)
+    staging_key = partition_key_of(staging_table)
+    if staging_key != expected_key:
+        raise RuntimeError(
+            f"Partition key mismatch: {staging_table} ({staging_key}) != {table} ({expected_key})"
+        )
+
+    backup_table = f"{table}_backup_{uuid.uuid4().hex[:12]}"
+    clickhouse_http(f"CREATE TABLE {backup_table} AS {table}")
+    swapped = []
+    try:
+        for partition in partitions:
+            _replace_or_drop(backup_table, table, partition)
+            _replace_or_drop(table, staging_table, partition)
+            swapped.append(partition)
+    except Exception:
+        print(f"Swap of {table} failed after {len(swapped)}/{len(partitions)} partitions. Rolling back.")
+        for partition in reversed(swapped):
+            _replace_or_drop(table, backup_table, partition)
+        print(f"Rolled back partitions of {table}: {[partition[0] for partition in swapped]}")
+        raise
+    finally:
+        clickhouse_http(f"DROP TABLE IF EXISTS {backup_table}")
+    print(f"Swapped partitions of {table}: {[partition[0] for partition in swapped]}")
+
+
+def write_summary(final_df, periods=None):
+    """
+    요약 결과를 (period_type, 월) 파티션 단위로 원자적으로 교체합니다.
+
+    1. 대상 테이블과 같은 구조의 임시 staging 테이블을 만들고
+    2. 다시 집계한 기간이 속한 (period_type, 월)마다 나머지 기간의 행은 ClickHouse 안에서 staging 테이블로 복사한 뒤
+    3. 각 executor가 자신의 Spark 파티션을 Parquet 블록으로 HTTP bulk insert 하고
+    4. REPLACE PARTITION으로 대상 테이블의 월 파티션을 통째로 교체합니다.
+    같은 기간을 다시 집계하면 이전 결과가 그대로 대체되므로 재실행해도 중복이 생기지 않습니다.
+    periods({period_type: [period_start, ...]})를 주면 결과 행이 없는 기간의 이전 행도 지웁니다.
+    """
+    staging_table = f"{SUMMARY_TABLE}_staging_{uuid.uuid4().hex[:12]}"
+    clickhouse_http(f"CREATE TABLE {staging_table} AS {SUMMARY_TABLE}")
+    try:
+        typed_df = final_df.select(
+            col("period_type").cast("string"),
+            col("period_start").cast("date"),
+            col("store_id").cast("string"),
+            col("total_sales").cast("double"),
+            col("total_orders").cast("long"),
+            col("avg_order_value").cast("double"),
+            col("unique_visitors").cast("long"),
+            col("created_at").cast("timestamp"),
+        ).repartition("period_type", "period_start").cache()
+
+        if periods is None:
+            periods = {}
+            for row in typed_df.select("period_type", "period_start").distinct().collect():
+                periods.setdefault(row["period_type"], []).append(row["period_start"])
+
+        partitions = []
+        for (period_type, month), starts in monthly_partitions(periods).items():
+            partition = summary_partition(period_type, month)
+            query, params = copy_untouched_rows_sql(
+                SUMMARY_TABLE, staging_table, partition, "period_start", starts[0], starts[-1]
+            )
+            clickhouse_http(query, params=params)
+            partitions.append(partition)
+
+        typed_df.foreachPartition(_insert_parquet_partition(staging_table))
+
+        swap_partitions(SUMMARY_TABLE, staging_table, partitions)
+        typed_df.unpersist()
+        print(f"Replaced {len(partitions)} monthly partitions of {SUMMARY_TABLE}.")
+    finally:
+        clickhouse_http(f"DROP TABLE IF EXISTS {staging_table}")
+
+
+def write_daily_base(base_df, days):
+    """
+    일 단위 기본 집계를 월(toYYYYMM(day)) 파티션 단위로 원자적으로 교체합니다.
+
+    다시 집계한 날(days, 연속된 날짜)이 속한 월마다, 그 달의 나머지 날 행은 ClickHouse 안에서 staging 테이블로 복사하고
+    다시 집계한 날의 행은 Parquet로 적재한 뒤 REPLACE PARTITION으로 통째로 바꿉니다.
+    """
+    first_day, last_day = min(days), max(days)
+    months = sorted({month_of(day) for day in days})
+    staging_table = f"{DAILY_BASE_TABLE}_staging_{uuid.uuid4().hex[:12]}"
+    clickhouse_http(f"CREATE TABLE {staging_table} AS {DAILY_BASE_TABLE}")
+    try:
+        partitions = [daily_base_partition(month) for month in months]
+        for partition in partitions:
+            query, params = copy_untouched_rows_sql(DAILY_BASE_TABLE, staging_table, partition, "day", first_day, last_day)
+            clickhouse_http(query, params=params)
+        base_df.select(
+            col("store_id").cast("string"),
+            col("day").cast("date"),
+            col("total_sales").cast("double"),
+            col("total_orders").cast("long"),
+            to_base64(col("visitor_sketch")).alias("visitor_sketch"),
+            current_timestamp().alias("created_at"),
+        ).foreachPartition(_insert_parquet_partition(staging_table, DAILY_BASE_COLUMNS))
+
+        swap_partitions(DAILY_BASE_TABLE, staging_table, partitions)
+        print(f"Replaced {len(days)} days in {len(months)} monthly partitions of {DAILY_BASE_TABLE}.")
+    finally:
+        clickhouse_http(f"DROP TABLE IF EXISTS {staging_table}")
+
+
+def read_daily_base(spark, start_day, end_day):
+    """start_day ~ end_day(포함)의 일 단위 기본 집계를 읽습니다. 주문 원본이 아니라 매장/일당 한 행만 읽습니다."""
+    query = (
+        f"SELECT store_id, day, total_sales, total_orders, visitor_sketch FROM {DAILY_BASE_TABLE} "
+        f"WHERE day >= '{start_day.isoformat()}' AND day <= '{end_day.isoformat()}'"
+    )
+    return _jdbc_reader(spark) \
+        .option("query", query) \
+        .load() \
+        .withColumn("visitor_sketch", unbase64(col("visitor_sketch")))
+
+
+def days_between(start_day, end_day):
+    """start_day ~ end_day(포함)의 모든 날짜"""
+    return [start_day + timedelta(days=offset) for offset in range((end_day - start_day).days + 1)]
+
+
+def period_start_of(ts, period_type):
+    """Spark의 trunc와 같은 기준으로 ts가 속한 기간의 시작 시각을 계산합니다."""
+    day = datetime(ts.year, ts.month, ts.day)
+    if period_type == "daily":
+        return day
+    if period_type == "weekly":
+        return day - timedelta(days=day.weekday())
+    if period_type == "monthly":
+        return day.replace(day=1)
+    return day.replace(month=1, day=1)
+
+
+def incremental_window_start(watermark, period_type, lookback_days=DEFAULT_LOOKBACK_DAYS):
+    """
+    incremental 모드에서 다시 집계를 시작할 시각입니다.
+    watermark보다 lookback_days일 앞선 시각이 속한 기간의 첫날이므로, watermark 이후의 새 주문과
+    그 기간 안에 늦게 들어온(ordered_at이 watermark 이전인) 주문이 모두 포함됩니다.
+    """
+    return period_start_of(watermark - timedelta(days=lookback_days), period_type)
+
+
+def full_window_start(period_type, today):
+    """full 모드에서 다시 집계를 시작할 시각: 조회 기간(PERIOD_CONFIG)이 시작되는 기간의 첫날"""
+    _, interval_days = PERIOD_CONFIG[period_type]
+    return period_start_of(today - timedelta(days=interval_days), period_type)
+
+
+def _ch_datetime(ts):
+    return ts.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def query_order_bounds(spark, since):
+    """ordered_at이 since 이후(포함)인 주문의 최소/최대 ordered_at을 ClickHouse에서 바로 계산합니다. (한 행만 전송)"""
+    return _jdbc_reader(spark) \
+        .option("query", (
+            f"SELECT minOrNull(ordered_at) AS earliest, maxOrNull(ordered_at) AS latest FROM {ORDERS_TABLE} "
+            f"WHERE ordered_at >= '{_ch_datetime(since)}'"
+        )) \
+        .load() \
+        .first()
+
+
+def read_orders(spark, start_ts, end_ts, num_partitions=DEFAULT_READ_PARTITIONS):
+    """
+    start_ts ~ end_ts 사이의 주문을 읽습니다.
+    기간 조건과 필요한 컬럼은 ClickHouse 쿼리로 내려보내고(pushdown),
+    ordered_at 범위를 num_partitions개로 나눠 여러 JDBC 연결로 병렬로 읽습니다.
+    """
+    subquery = (
+        f"(SELECT {', '.join(ORDER_COLUMNS)} FROM {ORDERS_TABLE} "
+        f"WHERE ordered_at >= '{_ch_datetime(start_ts)}' AND ordered_at <= '{_ch_datetime(end_ts)}') AS orders_subset"
+    )
+    return _jdbc_reader(spark) \
+        .option("dbtable", subquery) \
+        .option("partitionColumn", "ordered_at") \
+        .option("lowerBound", _ch_datetime(start_ts)) \
+        .option("upperBound", _ch_datetime(end_ts)) \
+        .option("numPartitions", num_partitions) \
+        .option("fetchsize", 10000) \
+        .load()
+
+
+def read_watermark(spark, period_type):
+    """마지막으로 집계에 반영된 주문의 ordered_at(high-water mark)을 조회합니다. 없으면 None."""
+    row = _jdbc_reader(spark) \
+        .option("query", f"SELECT maxOrNull(high_water_mark) AS hwm FROM {WATERMARK_TABLE} WHERE period_type = '{period_type}'") \
+        .load() \
+        .first()
+    return row["hwm"] if row else None
+
+
+def write_watermark(spark, period_type, high_water_mark):
+    schema = StructType([
+        StructField("period_type", StringType(), False),
+        StructField("high_water_mark", TimestampType(), False),
+        StructField("updated_at", TimestampType(), False),
+    ])
+    watermark_df = spark.createDataFrame([(period_type, high_water_mark, datetime.now())], schema)
+    _write_jdbc(watermark_df, WATERMARK_TABLE)
+
+
+def resolve_window(spark, period_type, mode, lookback_days=DEFAULT_LOOKBACK_DAYS, now=None):
+    """
+    집계할 주문 범위 (window_start, high_water_mark)를 결정합니다. 집계할 주문이 없으면 None.
+
+    - full: 조회 기간(PERIOD_CONFIG)이 시작되는 기간의 첫날부터
+    - incremental: 마지막 high-water mark보다 lookback_days일 앞선 시각이 속한 기간의 첫날부터
+      (watermark 이후의 새 주문과, 늦게 들어온 lookback 기간 안의 주문을 함께 반영)
+    기간 중간부터 집계하면 기존의 완전한 행이 일부만 집계된 행으로 대체되므로 항상 기간의 첫날부터 읽습니다.
+    """
+    watermark = read_watermark(spark, period_type) if mode == "incremental" else None
+    if watermark is not None:
+        # 새 주문이 속한 기간은 모든 매장을 기간 전체로 다시 집계합니다. (순 방문자 수는 부분 합산이 불가능)
+        window_start = incremental_window_start(watermark, period_type, lookback_days)
+    else:
+        if mode == "incremental":
+            print(f"[{period_type}] No watermark found. Falling back to the full lookback window.")
+        window_start = full_window_start(period_type, now or datetime.now())
+
+    bounds = query_order_bounds(spark, window_start)
+    if bounds["latest"] is None:
+        print(f"[{period_type}] No orders since {window_start}. Nothing to aggregate.")
+        return None
+    print(f"[{period_type}] Window: {window_start} ~ {bounds['latest']} (watermark {watermark})")
+    return window_start, bounds["latest"]
+
+
+def run_aggregation(period_type="monthly", mode="full", num_partitions=DEFAULT_READ_PARTITIONS,
+                    lookback_days=DEFAULT_LOOKBACK_DAYS):
     """
     기간별 요약 통계를 집계하는 PySpark 함수
+
+    - full: 조회 기간(PERIOD_CONFIG) 전체를 다시 집계합니다.
+    - incremental: 마지막 high-water mark(에서 lookback_days일 전) 이후의 주문이 속한 기간만 다시 집계합니다.
+
+    원본은 필요한 컬럼과 기간만 ClickHouse에서 num_partitions개의 병렬 JDBC 읽기로 가져옵니다.
+
+    결과는 (period_type, 월) 파티션 단위로 통째로 교체되므로 재실행해도 중복이 남지 않습니다.
     """
+    if period_type not in PERIOD_CONFIG:
+        raise ValueError(f"Unsupported period_type: {period_type}")
+    if mode not in ("full", "incremental"):
+        raise ValueError(f"Unsupported mode: {mode}")
+
     spark = SparkSession.builder \
-        .appName(f"Aggregate Summary Stats - {period_type}") \
+        .appName(f"Aggregate Summary Stats - {period_type} ({mode})") \
         .getOrCreate()
 
-    print(f"Starting {period_type} summary stats aggregation...")
+    print(f"Starting {period_type} summary stats aggregation ({mode})...")
 
-    # --- 1. ClickHouse에서 원본 데이터 읽기 ---
-    orders_df = spark.read \
-        .format("jdbc") \
-        .option("driver", "com.clickhouse.jdbc.ClickHouseDriver") \
-        .option("url", "jdbc:clickhouse://clickhouse-server:8123/default") \
-        .option("user", "default") \
-        .option("password", "") \
-        .option("dbtable", "orders") \
-        .load()
+    trunc_unit, _ = PERIOD_CONFIG[period_type]
+    date_func = trunc(col("ordered_at"), trunc_unit)
 
-    # --- 2. 데이터 변환 및 집계 ---
-    if period_type == "daily":
-        date_func = trunc(col("ordered_at"), "DD")
-        interval_days = 7
-    elif period_type == "weekly":
-        # Spark에는 toStartOfWeek가 없으므로 date_trunc로 유사하게 구현
-        date_func = trunc(col("ordered_at"), "WEEK")
-        interval_days = 30
-    elif period_type == "monthly":
-        date_func = trunc(col("ordered_at"), "MM")
-        interval_days = 90
-    elif period_type == "yearly":
-        date_func = trunc(col("ordered_at"), "YEAR")
-        interval_days = 730
-    else:
+    # --- 1. 집계 대상 범위 결정 ---
+    window = resolve_window(spark, period_type, mode, lookback_days)
+    if window is None:
         spark.stop()
-        raise ValueError(f"Unsupported period_type: {period_type}")
+        return
+    window_start, high_water_mark = window
 
-    filtered_orders = orders_df.filter(col("ordered_at") >= (current_timestamp() - expr(f"INTERVAL {interval_days} DAYS")))
+    # --- 2. ClickHouse에서 원본 데이터 읽기 ---
+    filtered_orders = read_orders(spark, window_start, high_water_mark, num_partitions)
 
+    # --- 3. 데이터 변환 및 집계 ---
     summary_agg = filtered_orders \
         .withColumn("period_start", date_func) \
         .groupBy("store_id", "period_start") \
@@ -60,20 +475,159 @@ def run_aggregation(period_type="monthly"):
             "total_orders", "avg_order_value", "unique_visitors", "created_at"
         )
 
-    # --- 3. 집계된 결과를 ClickHouse에 다시 쓰기 ---
-    final_df.write \
-        .format("jdbc") \
-        .option("driver", "com.clickhouse.jdbc.ClickHouseDriver") \
-        .option("url", "jdbc:clickhouse://clickhouse-server:8123/default") \
-        .option("user", "default") \
-        .option("password", "") \
-        .option("dbtable", "summary_stats_by_period") \
-        .mode("append") \
-        .save()
+    # --- 4. 집계된 결과를 ClickHouse에 다시 쓰기 ---
+    write_summary(final_df)
+
+    # 결과를 모두 쓴 뒤에 watermark를 갱신해야 실패 시 다음 실행에서 다시 집계됩니다.
+    write_watermark(spark, period_type, high_water_mark)
 
     spark.stop()
     print(f"{period_type} summary stats aggregation completed successfully.")
 
+
+def resolve_daily_base_window(spark, mode, lookback_days=DEFAULT_LOOKBACK_DAYS, now=None):
+    """
+    일 단위 기본 집계를 다시 만들 날짜 범위 (첫날 00:00, high-water mark)를 결정합니다. 집계할 주문이 없으면 None.
+
+    - full: 가장 긴 조회 기간(yearly)이 시작되는 해의 첫날부터
+    - incremental: 마지막 high-water mark보다 lookback_days일 앞선 날의 00:00부터
+      (ordered_at이 watermark 이전인데 늦게 들어온 주문도 그날을 다시 집계하면서 반영됨)
+    하루 중간부터 집계하면 그날의 행이 일부만 집계되므로 항상 날의 시작부터 읽습니다.
+    """
+    watermark = read_watermark(spark, DAILY_BASE_WATERMARK) if mode == "incremental" else None
+    if watermark is not None:
+        window_start = incremental_window_start(watermark, "daily", lookback_days)
+    else:
+        if mode == "incremental":
+            print("[daily_base] No watermark found. Falling back to the full lookback window.")
+        window_start = full_window_start("yearly", now or datetime.now())
+
+    bounds = query_order_bounds(spark, window_start)
+    if bounds["latest"] is None:
+        print(f"[daily_base] No orders since {window_start}. Nothing to aggregate.")
+        return None
+    print(f"[daily_base] Window: {window_start} ~ {bounds['latest']} (watermark {watermark})")
+    return window_start, bounds["latest"]
+
+
+def affected_period_starts(period_type, mode, days, latest_day, today=None):
+    """
+    다시 롤업할 기간의 시작일 목록을 구합니다.
+
+    - incremental: 다시 집계한 날(days)이 속한 기간만
+    - full: 조회 기간(PERIOD_CONFIG)이 시작되는 기간부터 latest_day가 속한 기간까지
+    """
+    if mode == "full":
+        days = days_between(full_window_start(period_type, today or datetime.now()).date(), latest_day)
+    return sorted({period_start_of(day, period_type).date() for day in days})
+
+
+def build_daily_base(orders):
+    """주문을 매장/일 단위 기본 집계(매출, 주문 수, 순 방문자 HLL 스케치)로 만듭니다."""
+    return orders \
+        .withColumn("day", trunc(col("ordered_at"), "DD")) \
+        .groupBy("store_id", "day") \
+        .agg(
+            _sum("total_price").alias("total_sales"),
+            count("*").alias("total_orders"),
+            hll_sketch_agg("user_id").alias("visitor_sketch")
+        )
+
+
+def rollup_period(stored_base, period_type, starts):
+    """
+    일 단위 기본 집계를 period_type 기간(시작일이 starts에 속하는 기간)으로 롤업합니다.
+    순 방문자 수는 일별 HLL 스케치를 합친 뒤 추정하므로 주문 원본을 다시 읽지 않습니다.
+    """
+    trunc_unit, _ = PERIOD_CONFIG[period_type]
+    return stored_base \
+        .filter(col("day") >= lit(starts[0])) \
+        .withColumn("period_start", trunc(col("day"), trunc_unit)) \
+        .filter(col("period_start").isin(starts)) \
+        .groupBy("store_id", "period_start") \
+        .agg(
+            _sum("total_sales").alias("total_sales"),
+            _sum("total_orders").alias("total_orders"),
+            hll_union_agg("visitor_sketch").alias("visitor_sketch")
+        ) \
+        .withColumn("avg_order_value", col("total_sales") / col("total_orders")) \
+        .withColumn("unique_visitors", hll_sketch_estimate("visitor_sketch")) \
+        .withColumn("period_type", lit(period_type)) \
+        .withColumn("created_at", current_timestamp()) \
+        .select(
+            "period_type", "period_start", "store_id", "total_sales",
+            "total_orders", "avg_order_value", "unique_visitors", "created_at"
+        )
+
+
+def run_all_aggregations(mode="full", num_partitions=DEFAULT_READ_PARTITIONS, lookback_days=DEFAULT_LOOKBACK_DAYS):
+    """
+    daily/weekly/monthly/yearly 요약 통계를 한 번의 작업으로 집계합니다.
+
+    1. orders에서 새 주문이 들어온 날(과 늦게 도착한 주문을 위한 lookback_days일)만 다시 읽어 매장/일 단위 기본 집계(매출, 주문 수, 순 방문자 HLL 스케치)를
+       만들고 summary_stats_daily_base에 저장합니다. (incremental이면 하루 실행 비용이 하루치 주문에 비례)
+    2. 그날들이 속한 일/주/월/연 기간은 orders가 아니라 저장된 기본 집계에서 롤업합니다.
+       순 방문자 수는 스케치를 합쳐 계산하므로 기간 전체의 주문을 다시 읽지 않습니다. (근사값)
+    """
+    if mode not in ("full", "incremental"):
+        raise ValueError(f"Unsupported mode: {mode}")
+
+    spark = SparkSession.builder \
+        .appName(f"Aggregate Summary Stats - all periods ({mode})") \
+        .getOrCreate()
+
+    print(f"Starting summary stats aggregation for all periods ({mode})...")
+
+    # --- 1. 다시 집계할 날짜 범위 결정 ---
+    window = resolve_daily_base_window(spark, mode, lookback_days)
+    if window is None:
+        spark.stop()
+        return
+    window_start, high_water_mark = window
+    days = days_between(window_start.date(), high_water_mark.date())
+
+    # --- 2. 해당 날짜의 주문만 읽어 일 단위 기본 집계를 만들고 저장 ---
+    daily_base = build_daily_base(read_orders(spark, window_start, high_water_mark, num_partitions))
+    write_daily_base(daily_base, days)
+
+    # --- 3. 영향을 받은 기간을 저장된 기본 집계에서 롤업 ---
+    period_starts = {}
+    for period_type in PERIOD_CONFIG:
+        starts = affected_period_starts(period_type, mode, days, high_water_mark.date())
+        if starts:
+            period_starts[period_type] = starts
+    read_start = min(starts[0] for starts in period_starts.values())
+    stored_base = read_daily_base(spark, read_start, high_water_mark.date()).cache()
+
+    period_dfs = [rollup_period(stored_base, period_type, starts) for period_type, starts in period_starts.items()]
+
+    final_df = period_dfs[0]
+    for period_df in period_dfs[1:]:
+        final_df = final_df.unionByName(period_df)
+
+    # --- 4. 모든 기간의 결과를 한 번에 ClickHouse에 쓰기 ---
+    write_summary(final_df, period_starts)
+    # 기본 집계와 요약을 모두 쓴 뒤에 watermark를 갱신해야 실패 시 다음 실행에서 다시 집계됩니다.
+    write_watermark(spark, DAILY_BASE_WATERMARK, high_water_mark)
+
+    stored_base.unpersist()
+    spark.stop()
+    print(f"Summary stats aggregation for {len(days)} days completed successfully.")
+
+
 if __name__ == "__main__":
-    # 이 스크립트를 직접 실행할 때 월간 집계를 기본으로 수행
-    run_aggregation("monthly")
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="기간별 요약 통계 집계")
+    parser.add_argument("--period-type", default="monthly", choices=sorted(PERIOD_CONFIG) + ["all"],
+                        help="'all'이면 모든 기간을 한 번의 읽기로 집계")
+    parser.add_argument("--mode", default="full", choices=["full", "incremental"])
+    parser.add_argument("--read-partitions", type=int, default=DEFAULT_READ_PARTITIONS,
+                        help="orders를 병렬로 읽을 JDBC 파티션 수")
+    parser.add_argument("--lookback-days", type=int, default=DEFAULT_LOOKBACK_DAYS,
+                        help="incremental 모드에서 늦게 도착한 주문을 위해 watermark 이전 며칠을 다시 집계할지")
+    args = parser.parse_args()
+
+    # 인자 없이 실행하면 기존처럼 월간 전체 집계를 수행
+    if args.period_type == "all":
+        run_all_aggregations(args.mode, args.read_partitions, args.lookback_days)
+    else:
+        run_aggregation(args.period_type, args.mode, args.read_partitions, args.lookback_days)
@@ -0,0 +1,3 @@
+# conftest.py
+# 이 파일이 있는 디렉토리(spark-scripts)가 sys.path에 추가되어 테스트에서 집계 스크립트를 모듈로 import 할 수 있습니다.
+# 순수 함수 테스트는 pyspark만 설치되어 있으면 되고, 로컬 SparkSession이 필요한 테스트는 Java가 없으면 건너뜁니다.
@@ -0,0 +1,186 @@
+# spark-scripts/materialize_user_context.py
+import argparse
+import json
+import os
+
+from pyspark.sql import SparkSession, Window
+from pyspark.sql.functions import col, expr, struct, sort_array, collect_list, row_number, current_timestamp
+from pyspark.sql.functions import sum as _sum, count, avg, min as _min, max as _max
+
+# user-rag-api와 같은 MongoDB를 읽고 씁니다. (mongo-spark-connector 10.x 필요)
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://mongo:27017")
+MONGO_DATABASE = os.getenv("MONGO_DATABASE", "test")
+
+USERS_COLLECTION = "users"
+ORDERS_COLLECTION = "order"
+CONTEXT_COLLECTION = "user_context"
+
+# 컨텍스트 문서에 필요한 필드 (나머지 필드는 MongoDB에서 읽지 않음)
+USER_FIELDS = ["email", "name", "signup_date"]
+ORDER_FIELDS = ["email", "order_id", "menu_name", "total_price", "ordered_at"]
+
+RECENT_ORDER_LIMIT = 5
+FAVORITE_MENU_LIMIT = 3
+
+
+def _mongo_reader(spark, collection, pipeline=None):
+    reader = spark.read \
+        .format("mongodb") \
+        .option("connection.uri", MONGO_URI) \
+        .option("database", MONGO_DATABASE) \
+        .option("collection", collection)
+    if pipeline:
+        reader = reader.option("aggregation.pipeline", json.dumps(pipeline))
+    return reader.load()
+
+
+def read_users(spark):
+    return _mongo_reader(spark, USERS_COLLECTION).select(*USER_FIELDS)
+
+
+def read_orders(spark):
+    return _mongo_reader(spark, ORDERS_COLLECTION).select(*ORDER_FIELDS)
+
+
+def read_watermark(spark):
+    """user_context에 반영된 가장 최근 주문 시각(high-water mark)을 조회합니다. 없으면 None."""
+    rows = _mongo_reader(spark, CONTEXT_COLLECTION, [
+        {"$group": {"_id": None, "hwm": {"$max": "$order_stats.last_ordered_at"}}},
+    ]).collect()
+    return rows[0]["hwm"] if rows and "hwm" in rows[0].asDict() else None
+
+
+def resolve_changed_emails(spark, users, orders, watermark):
+    """
+    마지막 실행 이후 컨텍스트가 바뀐 사용자를 찾습니다.
+    - watermark 이후 새 주문이 있는 사용자
+    - 아직 user_context 문서가 없는 사용자 (신규 가입)
+    프로필만 바뀐 사용자는 주기적인 full 실행(Airflow DAG, 매주)에서 반영됩니다.
+    """
+    existing = _mongo_reader(spark, CONTEXT_COLLECTION).select("email")
+    ordered = orders.filter(col("ordered_at") > watermark).select("email")
+    new_users = users.join(existing, "email", "left_anti").select("email")
+    return ordered.union(new_users).distinct()
+
+
+def build_user_context(users, orders):
+    """
+    사용자별 컨텍스트 문서를 만듭니다.
+
+    - recent_orders: 최근 주문 RECENT_ORDER_LIMIT건 (최신순)
+    - favorite_menus: 주문 횟수가 많은 메뉴 FAVORITE_MENU_LIMIT개
+    - order_stats: 총 주문 수/총 결제액/평균 주문액/첫·마지막 주문 시각
+    주문이 없는 사용자는 프로필만 담깁니다.
+    """
+    recent_window = Window.partitionBy("email").orderBy(col("ordered_at").desc(), col("order_id").desc())
+    recent_orders = orders \
+        .withColumn("rank", row_number().over(recent_window)) \
+        .filter(col("rank") <= RECENT_ORDER_LIMIT) \
+        .groupBy("email") \
+        .agg(sort_array(
+            collect_list(struct("ordered_at", "order_id", "menu_name", "total_price")), asc=False
+        ).alias("recent_orders"))
+
+    favorite_window = Window.partitionBy("email").orderBy(col("order_count").desc(), col("menu_name"))
+    favorite_menus = orders \
+        .groupBy("email", "menu_name") \
+        .agg(count("*").alias("order_count")) \
+        .withColumn("rank", row_number().over(favorite_window)) \
+        .filter(col("rank") <= FAVORITE_MENU_LIMIT) \
+        .groupBy("email") \
+        .agg(sort_array(collect_list(struct("rank", "menu_name", "order_count"))).alias("ranked")) \
+        .select("email", expr(
+            "transform(ranked, m -> named_struct('menu_name', m.menu_name, 'order_count', m.order_count))"
+        ).alias("favorite_menus"))
+
+    order_stats = orders \
+        .groupBy("email") \
+        .agg(
+            count("*").alias("total_orders"),
+            _sum("total_price").alias("total_spent"),
+            avg("total_price").alias("avg_order_value"),
+            _min("ordered_at").alias("first_ordered_at"),
+            _max("ordered_at").alias("last_ordered_at"),
+        ) \
+        .select("email", struct(
+            "total_orders", "total_spent", "avg_order_value", "first_ordered_at", "last_ordered_at"
+        ).alias("order_stats"))
+
+    return users \
+        .join(order_stats, "email", "left") \
+        .join(recent_orders, "email", "left") \
+        .join(favorite_menus, "email", "left") \
+        .withColumn("updated_at", current_timestamp())
+
+
+def write_user_context(context_df):
+    """
+    email을 키로 user_context 문서를 통째로 교체(upsert)합니다.
+    같은 사용자를 다시 계산하면 이전 문서가 그대로 대체되므로 재실행해도 중복이 생기지 않습니다.
+    """
+    context_df.write \
+        .format("mongodb") \
+        .option("connection.uri", MONGO_URI) \
+        .option("database", MONGO_DATABASE) \
+        .option("collection", CONTEXT_COLLECTION) \
+        .option("operationType", "replace") \
+        .option("idFieldList", "email") \
+        .option("upsertDocument", "true") \
+        .mode("append") \
+        .save()
+
+
+def run_materialization(mode="full"):
+    """
+    user-rag-api가 질문마다 조합하던 사용자 컨텍스트(프로필, 최근 주문, 선호 메뉴, 결제 통계)를
+    미리 계산해 user_context 컬렉션에 저장하는 PySpark 함수
+
+    - full: 모든 사용자의 컨텍스트를 다시 계산합니다.
+    - incremental: 마지막 실행 이후 새 주문이 있거나 컨텍스트가 없는 사용자만 다시 계산합니다.
+    """
+    if mode not in ("full", "incremental"):
+        raise ValueError(f"Unsupported mode: {mode}")
+
+    spark = SparkSession.builder \
+        .appName(f"Materialize User Context ({mode})") \
+        .getOrCreate()
+
+    print(f"Starting user context materialization ({mode})...")
+
+    # --- 1. MongoDB에서 원본 데이터 읽기 ---
+    users = read_users(spark)
+    orders = read_orders(spark)
+
+    # --- 2. 다시 계산할 사용자 결정 ---
+    if mode == "incremental":
+        watermark = read_watermark(spark)
+        if watermark is None:
+            print("No watermark found. Falling back to all users.")
+        else:
+            changed = resolve_changed_emails(spark, users, orders, watermark).cache()
+            if changed.isEmpty():
+                print(f"No new orders or users since {watermark}. Nothing to materialize.")
+                spark.stop()
+                return
+            print(f"Incremental run since {watermark}: {changed.count()} users changed.")
+            users = users.join(changed, "email", "left_semi")
+            orders = orders.join(changed, "email", "left_semi")
+
+    # --- 3. 사용자별 컨텍스트 계산 ---
+    orders = orders.cache()
+    context_df = build_user_context(users, orders)
+
+    # --- 4. user_context 컬렉션에 쓰기 ---
+    write_user_context(context_df)
+
+    orders.unpersist()
+    spark.stop()
+    print("User context materialization completed successfully.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="사용자 컨텍스트 사전 계산")
+    parser.add_argument("--mode", default="full", choices=["full", "incremental"])
+    args = parser.parse_args()
+
+    run_materialization(args.mode)
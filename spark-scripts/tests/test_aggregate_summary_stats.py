@@ -0,0 +1,235 @@
+# tests/test_aggregate_summary_stats.py
+import os
+import shutil
+from datetime import date, datetime
+
+import pytest
+
+import aggregate_summary_stats as job
+
+
+@pytest.mark.parametrize("period_type, expected", [
+    ("daily", datetime(2024, 5, 15)),
+    ("weekly", datetime(2024, 5, 13)),  # 월요일
+    ("monthly", datetime(2024, 5, 1)),
+    ("yearly", datetime(2024, 1, 1)),
+])
+def test_period_start_of(period_type, expected):
+    assert job.period_start_of(datetime(2024, 5, 15, 13, 45), period_type) == expected
+
+
+def test_days_between_is_inclusive():
+    assert job.days_between(date(2024, 2, 28), date(2024, 3, 1)) == [date(2024, 2, 28), date(2024, 2, 29), date(2024, 3, 1)]
+    assert job.days_between(date(2024, 3, 1), date(2024, 3, 1)) == [date(2024, 3, 1)]
+
+
+def test_affected_period_starts_incremental():
+    days = [date(2024, 4, 30), date(2024, 5, 1)]
+    assert job.affected_period_starts("daily", "incremental", days, date(2024, 5, 1)) == days
+    assert job.affected_period_starts("weekly", "incremental", days, date(2024, 5, 1)) == [date(2024, 4, 29)]
+    assert job.affected_period_starts("monthly", "incremental", days, date(2024, 5, 1)) == [date(2024, 4, 1), date(2024, 5, 1)]
+    assert job.affected_period_starts("yearly", "incremental", days, date(2024, 5, 1)) == [date(2024, 1, 1)]
+
+
+def test_affected_period_starts_full_covers_lookback():
+    starts = job.affected_period_starts("monthly", "full", [], date(2024, 5, 15), today=datetime(2024, 5, 15))
+    # 90일 전(2024-02-15)이 속한 달부터 이번 달까지
+    assert starts == [date(2024, 2, 1), date(2024, 3, 1), date(2024, 4, 1), date(2024, 5, 1)]
+
+
+def test_monthly_partitions_groups_starts_by_period_type_and_month():
+    periods = {
+        "daily": [date(2024, 5, 2), date(2024, 4, 30), date(2024, 5, 1)],
+        "weekly": [date(2024, 4, 29)],
+    }
+    assert job.monthly_partitions(periods) == {
+        ("daily", 202404): [date(2024, 4, 30)],
+        ("daily", 202405): [date(2024, 5, 1), date(2024, 5, 2)],
+        ("weekly", 202404): [date(2024, 4, 29)],
+    }
+
+
+class FakeOrders:
+    """read_watermark/query_order_bounds를 대신하는 메모리 주문 목록입니다."""
+
+    def __init__(self, watermark, ordered_at):
+        self.watermark = watermark
+        self.ordered_at = ordered_at
+
+    def read_watermark(self, spark, period_type):
+        return self.watermark
+
+    def query_order_bounds(self, spark, since):
+        selected = [ts for ts in self.ordered_at if ts >= since]
+        return {"earliest": min(selected, default=None), "latest": max(selected, default=None)}
+
+
+@pytest.fixture
+def fake_orders(monkeypatch):
+    def install(watermark, ordered_at):
+        orders = FakeOrders(watermark, ordered_at)
+        monkeypatch.setattr(job, "read_watermark", orders.read_watermark)
+        monkeypatch.setattr(job, "query_order_bounds", orders.query_order_bounds)
+        return orders
+    return install
+
+
+def test_incremental_window_includes_late_arrivals(fake_orders):
+    watermark = datetime(2024, 5, 10, 12, 0)
+    # 이전 실행 이후에 적재됐지만 ordered_at은 watermark 이전인 주문과, watermark 이후의 새 주문
+    late_order = datetime(2024, 5, 9, 23, 30)
+    new_order = datetime(2024, 5, 11, 9, 0)
+    fake_orders(watermark, [datetime(2024, 5, 1, 10, 0), late_order, new_order])
+
+    window_start, high_water_mark = job.resolve_daily_base_window(None, "incremental", lookback_days=2)
+    assert window_start == datetime(2024, 5, 8)
+    assert high_water_mark == new_order
+    days = job.days_between(window_start.date(), high_water_mark.date())
+    assert late_order.date() in days
+
+
+def test_incremental_window_rescans_lookback_without_new_orders(fake_orders):
+    # watermark 이후 새 주문이 없어도 lookback 기간 안에 늦게 들어온 주문은 반영되어야 합니다.
+    late_order = datetime(2024, 5, 10, 8, 0)
+    fake_orders(datetime(2024, 5, 10, 12, 0), [late_order])
+    window_start, high_water_mark = job.resolve_daily_base_window(None, "incremental", lookback_days=1)
+    assert window_start <= late_order <= high_water_mark
+
+
+def test_incremental_window_for_period_starts_at_period_boundary(fake_orders):
+    fake_orders(datetime(2024, 5, 2, 12, 0), [datetime(2024, 5, 3, 9, 0)])
+    window_start, _ = job.resolve_window(None, "monthly", "incremental", lookback_days=2)
+    # 2일 전(4/30)이 속한 4월 전체를 다시 집계합니다.
+    assert window_start == datetime(2024, 4, 1)
+
+
+def test_window_is_none_without_orders(fake_orders):
+    fake_orders(datetime(2024, 5, 10, 12, 0), [datetime(2024, 4, 1)])
+    assert job.resolve_daily_base_window(None, "incremental", lookback_days=2) is None
+
+
+def test_full_window_ignores_watermark(fake_orders):
+    fake_orders(datetime(2024, 5, 10, 12, 0), [datetime(2024, 5, 11)])
+    window_start, _ = job.resolve_daily_base_window(None, "full", now=datetime(2024, 5, 15))
+    assert window_start == datetime(2022, 1, 1)  # 730일 전이 속한 해의 첫날
+
+
+def test_copy_untouched_rows_sql_uses_bounded_range_and_parameters():
+    partition = job.daily_base_partition(202405)
+    query, params = job.copy_untouched_rows_sql(
+        job.DAILY_BASE_TABLE, "staging", partition, "day", date(2024, 5, 3), date(2024, 5, 31)
+    )
+    assert query == (
+        "INSERT INTO staging SELECT * FROM summary_stats_daily_base "
+        "WHERE toYYYYMM(day) = {month:UInt32} AND NOT (day BETWEEN {first:Date} AND {last:Date})"
+    )
+    assert params == {"month": 202405, "first": date(2024, 5, 3), "last": date(2024, 5, 31)}
+
+
+def test_summary_partition_validates_values():
+    partition_expr, where, params = job.summary_partition("weekly", 202405)
+    assert partition_expr == "tuple('weekly', 202405)"
+    assert where == "period_type = {period_type:String} AND toYYYYMM(period_start) = {month:UInt32}"
+    assert params == {"period_type": "weekly", "month": 202405}
+    with pytest.raises(ValueError):
+        job.summary_partition("daily'); DROP TABLE orders; --", 202405)
+    with pytest.raises(ValueError):
+        job.daily_base_partition("202405")
+
+
+class FakeClickHouse:
+    """
+    swap_partitions가 보내는 쿼리를 기록하는 ClickHouse HTTP 대역입니다.
+    rows[(table 접두어, month)]로 파티션 행 수를, partition_keys로 테이블별 파티션 키를 흉내 냅니다.
+    """
+
+    def __init__(self, rows, fail_on=None, partition_keys=None):
+        self.rows = rows
+        self.fail_on = fail_on
+        self.partition_keys = partition_keys or {}
+        self.executed = []
+
+    def __call__(self, query, body=None, params=None):
+        self.executed.append(query)
+        if query == self.fail_on:
+            raise RuntimeError("ALTER failed")
+        if query.startswith("SELECT partition_key"):
+            return self.partition_keys.get(params["table"], "toYYYYMM(day)") + "\n"
+        if query.startswith("SELECT count()"):
+            table = query.split()[3]
+            prefix = "backup" if "_backup_" in table else table
+            return f"{self.rows.get((prefix, params['month']), 0)}\n"
+        return ""
+
+    def alters(self):
+        return [" ".join("backup" if "_backup_" in word else word for word in query.split())
+                for query in self.executed if query.startswith("ALTER")]
+
+
+def test_swap_partitions_backs_up_then_replaces_or_drops(monkeypatch):
+    clickhouse = FakeClickHouse({("t", 202404): 5, ("t", 202405): 7, ("staging", 202405): 12})
+    monkeypatch.setattr(job, "clickhouse_http", clickhouse)
+    job.swap_partitions("t", "staging", [job.daily_base_partition(202404), job.daily_base_partition(202405)])
+    assert clickhouse.alters() == [
+        "ALTER TABLE backup REPLACE PARTITION 202404 FROM t",
+        "ALTER TABLE t DROP PARTITION 202404",
+        "ALTER TABLE backup REPLACE PARTITION 202405 FROM t",
+        "ALTER TABLE t REPLACE PARTITION 202405 FROM staging",
+    ]
+    assert clickhouse.executed[-1].startswith("DROP TABLE IF EXISTS t_backup_")
+
+
+def test_swap_partitions_rolls_back_on_failure(monkeypatch):
+    clickhouse = FakeClickHouse(
+        {("t", 202404): 5, ("backup", 202404): 5, ("staging", 202404): 3, ("staging", 202405): 4},
+        fail_on="ALTER TABLE t REPLACE PARTITION 202405 FROM staging",
+    )
+    monkeypatch.setattr(job, "clickhouse_http", clickhouse)
+    with pytest.raises(RuntimeError):
+        job.swap_partitions("t", "staging", [job.daily_base_partition(202404), job.daily_base_partition(202405)])
+    # 이미 교체한 202404는 백업으로 되돌리고, 백업 테이블은 지웁니다.
+    assert clickhouse.alters()[-1] == "ALTER TABLE t REPLACE PARTITION 202404 FROM backup"
+    assert clickhouse.executed[-1].startswith("DROP TABLE IF EXISTS t_backup_")
+
+
+def test_swap_partitions_rejects_mismatched_partition_key(monkeypatch):
+    clickhouse = FakeClickHouse({}, partition_keys={"staging": "day"})
+    monkeypatch.setattr(job, "clickhouse_http", clickhouse)
+    with pytest.raises(RuntimeError, match="Partition key mismatch"):
+        job.swap_partitions("t", "staging", [job.daily_base_partition(202405)])
+    assert clickhouse.alters() == []
+
+
+@pytest.fixture(scope="module")
+def spark():
+    if not (shutil.which("java") or os.environ.get("JAVA_HOME")):
+        pytest.skip("로컬 SparkSession에는 Java가 필요합니다.")
+    from pyspark.sql import SparkSession
+
+    session = SparkSession.builder.master("local[1]").appName("aggregate-summary-stats-test") \
+        .config("spark.ui.enabled", "false").getOrCreate()
+    yield session
+    session.stop()
+
+
+def test_rollup_merges_daily_visitor_sketches(spark):
+    from pyspark.sql.functions import base64 as to_base64, col, unbase64
+
+    orders = spark.createDataFrame([
+        ("s1", datetime(2024, 5, 13, 9), 1000, "u1"),
+        ("s1", datetime(2024, 5, 13, 10), 2000, "u2"),
+        ("s1", datetime(2024, 5, 14, 9), 3000, "u1"),  # 다른 날 같은 방문자
+        ("s1", datetime(2024, 5, 15, 9), 4000, "u3"),
+        ("s2", datetime(2024, 5, 14, 9), 5000, "u1"),
+    ], ["store_id", "ordered_at", "total_price", "user_id"])
+
+    # ClickHouse에 base64로 저장했다가 읽는 과정을 거칩니다.
+    stored_base = job.build_daily_base(orders) \
+        .withColumn("visitor_sketch", unbase64(to_base64(col("visitor_sketch"))))
+    weekly = {row["store_id"]: row for row in job.rollup_period(stored_base, "weekly", [date(2024, 5, 13)]).collect()}
+
+    assert weekly["s1"]["total_orders"] == 4
+    assert weekly["s1"]["total_sales"] == 10000
+    assert weekly["s1"]["avg_order_value"] == 2500
+    assert weekly["s1"]["unique_visitors"] == 3
+    assert weekly["s2"]["unique_visitors"] == 1